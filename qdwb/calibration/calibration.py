@@ -0,0 +1,488 @@
+"""
+Parallel Calibration Of The Water Balance.
+
+The forcing and the stages that do not read a calibrated parameter (radiation,
+reference evapotranspiration, precipitation phase, ...) are prepared once and
+put in shared memory. Worker processes attach to it and run batches of
+candidates as a parameter ensemble, chunk by chunk, with the goodness of fit
+accumulated on the way. A batch stops as soon as all of its candidates are
+hopeless.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Mapping, Iterable
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, util
+import pickle
+import numpy as np
+import pandas as pd
+from ..model.driver import Driver
+from ..model.stages import Stage, default_stages, PARAMETER_DEFAULTS
+from ..model.dtype import DtypePolicy, get_dtype_policy
+from ..model.ensemble import ensemble_parameters
+from .objective import StreamingObjective, zone_matrix, OBJECTIVES
+from .strategy import SearchStrategy
+
+
+
+class CalibrationParameter :
+
+    def __init__(self,
+        name : str,
+        low : float,
+        high : float,
+        multiplier : bool = False
+    ):
+        """
+        Description
+        -----------
+        Bounds of a calibrated parameter.
+
+        Parameters
+        ----------
+        name : str
+            parameter name of the stages
+        low : float
+            lower bound
+        high : float
+            upper bound
+        multiplier : bool
+            True if the calibrated value multiplies the map of the parameter (such as the curve
+            number) instead of replacing it
+        """
+
+        if not low < high:
+            raise ValueError(f"low must be less than high for {name}!")
+
+        self.name = name
+        self.low = float(low)
+        self.high = float(high)
+        self.multiplier = multiplier
+
+
+    def scale(
+        self,
+        unit : np.ndarray
+    ) -> np.ndarray:
+        """
+        Description
+        -----------
+        Value of the parameter from a point of [0, 1].
+        """
+
+        return self.low + np.asarray(unit) * (self.high - self.low)
+
+
+    def __repr__(self) -> str:
+        kind = 'multiplier' if self.multiplier else 'value'
+        return f"CalibrationParameter({self.name!r}, {self.low}, {self.high}, {kind})"
+
+
+
+# Bounds of the QDWB parameters usually calibrated
+DEFAULT_BOUNDS = {
+    'curve_number' : CalibrationParameter('curve_number', 0.8, 1.2, multiplier = True),
+    'geology_permeability' : CalibrationParameter('geology_permeability', 0.0, 1.0),
+    'stress_coefficient' : CalibrationParameter('stress_coefficient', 0.1, 1.0),
+    'MAD' : CalibrationParameter('MAD', 0.0, 0.8),
+    'degree_day_factor' : CalibrationParameter('degree_day_factor', 1.0, 6.0),
+    'crop_coefficient' : CalibrationParameter('crop_coefficient', 0.8, 1.2, multiplier = True),
+    'fc_transpiration_layer' : CalibrationParameter('fc_transpiration_layer', 0.8, 1.2, multiplier = True),
+    'pwp_transpiration_layer' : CalibrationParameter('pwp_transpiration_layer', 0.8, 1.2, multiplier = True)
+}
+
+
+
+def read_observed(
+    path : str,
+    column : str,
+    time : str = 'time'
+) -> Tuple[pd.DatetimeIndex, np.ndarray, np.ndarray]:
+
+    """
+    Description
+    -----------
+    Read a reference series in long format (one row per point and day, such as
+    assets/ET_pyet_hargreaves.csv or assets/mo_check.csv) as a (T, points) array.
+
+    Parameters
+    ----------
+    path : str
+        path of the csv file
+    column : str
+        column of the values
+    time : str
+        column of the dates
+
+    Returns
+    -------
+    times : pd.DatetimeIndex
+        dates of the rows
+    points : np.ndarray
+        coordinates of the columns, shape (points, 2) - (x, y) or (lon, lat)
+    values : np.ndarray
+        values of shape (T, points), NaN where a point has no value
+    """
+
+    df = pd.read_csv(path, parse_dates = [time])
+    coordinates = ['x', 'y'] if {'x', 'y'} <= set(df.columns) else ['lon', 'lat']
+    if not set(coordinates) <= set(df.columns):
+        raise ValueError(f"{path} must have x, y or lon, lat columns!")
+
+    table = df.pivot_table(index = time, columns = coordinates, values = column, aggfunc = 'mean').sort_index()
+
+    return table.index, np.array(table.columns.tolist(), dtype = np.float64), table.to_numpy(dtype = np.float64)
+
+
+
+class Calibration :
+
+    def __init__(self,
+        parameters : Mapping[str, Any],
+        forcing : Mapping[str, Any],
+        observed : Mapping[str, np.ndarray],
+        calibrated : Iterable[Union[str, CalibrationParameter]],
+        state : Optional[Mapping[str, Any]] = None,
+        objective : str = 'nse',
+        zones : Optional[np.ndarray] = None,
+        stages : Optional[List[Stage]] = None,
+        policy : Optional[DtypePolicy] = None,
+        chunk_days : int = 365,
+        n_workers : int = 0,
+        batch : Optional[int] = None,
+        history : Optional[int] = 100
+    ):
+        """
+        Description
+        -----------
+        Calibration of stage parameters against observed series.
+
+        Parameters
+        ----------
+        parameters : Mapping[str, Any]
+            base parameters - scalars or arrays with cells on the last axis
+        forcing : Mapping[str, Any]
+            forcing of the whole period as in ``Driver.run_block``
+        observed : Mapping[str, np.ndarray]
+            {stage output: observed series of shape (T, cells) or (T, zones)} - NaN where missing
+        calibrated : Iterable[Union[str, CalibrationParameter]]
+            calibrated parameters - names are looked up in DEFAULT_BOUNDS
+        state : Mapping[str, Any]
+            initial state
+        objective : str
+            'rmse', 'nse' or 'kge' - the loss is averaged over the locations and the observed outputs
+        zones : np.ndarray
+            zone index of every cell - simulated outputs are averaged over the zones before comparison
+        stages : List[Stage]
+            stages in execution order - None for ``default_stages()``
+        policy : DtypePolicy
+            precision policy - None for the global policy
+        chunk_days : int
+            days run between two checks of the early termination
+        n_workers : int
+            number of worker processes - 0 to evaluate in this process
+        batch : int
+            candidates run together as one ensemble - None to split each ask evenly between the workers
+        history : int
+            number of the last evaluations kept in ``history`` as (values, losses) - 0 to keep none,
+            None to keep all
+        """
+
+        if objective not in OBJECTIVES:
+            raise ValueError(f"objective must be one of {OBJECTIVES}: {objective}")
+
+        self.calibrated = [DEFAULT_BOUNDS[c] if isinstance(c, str) else c for c in calibrated]
+        if not self.calibrated:
+            raise ValueError("at least one parameter must be calibrated!")
+        self.stages = default_stages() if stages is None else list(stages)
+        self.policy = get_dtype_policy() if policy is None else policy
+        self.n_workers = n_workers
+        self.batch = batch
+
+        if n_workers > 0:
+            try:
+                pickle.dumps((parameters, state, self.stages, self.policy, self.calibrated))
+            except (pickle.PicklingError, AttributeError, TypeError) as error:
+                raise ValueError(
+                    "stages and parameters can not be sent to the worker processes (stages built from "
+                    f"closures such as free_water_stages can not be pickled) - use n_workers = 0: {error}"
+                ) from error
+
+        outputs = {name for stage in self.stages for name in stage.outputs}
+        unknown = set(observed) - outputs
+        if unknown:
+            raise ValueError(f"observed variables are not stage outputs: {sorted(unknown)}")
+
+        parameters = {**PARAMETER_DEFAULTS, **parameters}
+        driver = Driver(parameters, state = state, stages = self.stages, policy = self.policy)
+        prepared = driver.prepare_block(forcing, exclude = [c.name for c in self.calibrated])
+
+        self._shared = []
+        arrays = dict(prepared)
+        arrays.update({f"observed:{name}": np.asarray(values, dtype = np.float64) for name, values in observed.items()})
+        specs = {name: self._share(values) for name, values in arrays.items()}
+
+        self._context = {
+            'parameters': parameters,
+            'state': state,
+            'stages': self.stages,
+            'policy': self.policy,
+            'calibrated': self.calibrated,
+            'objective': objective,
+            'weights': None if zones is None else zone_matrix(zones),
+            'chunk_days': chunk_days,
+            'specs': specs
+        }
+
+        self._pool = None
+        if n_workers > 0:
+            self._pool = ProcessPoolExecutor(max_workers = n_workers, initializer = _init_worker, initargs = (self._context,))
+        else:
+            _init_worker(self._context)
+
+        self.history = deque(maxlen = history)
+        self.stopped_early = 0
+
+
+    def _share(
+        self,
+        values : np.ndarray
+    ) -> Tuple[str, Tuple[int, ...], str]:
+        """
+        Description
+        -----------
+        Copy an array to shared memory and return (name, shape, dtype).
+        """
+
+        values = np.ascontiguousarray(values)
+        block = shared_memory.SharedMemory(create = True, size = max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype = values.dtype, buffer = block.buf)[...] = values
+        self._shared.append(block)
+
+        return block.name, values.shape, values.dtype.str
+
+
+    def evaluate(
+        self,
+        candidates : np.ndarray,
+        threshold : Any = np.inf
+    ) -> np.ndarray:
+        """
+        Description
+        -----------
+        Loss of candidates given as points of the unit hypercube.
+
+        Parameters
+        ----------
+        candidates : np.ndarray
+            array of shape (n, calibrated parameters) in [0, 1]
+        threshold : Any
+            loss each candidate has to beat - candidates that can not beat it get an infinite loss
+
+        Returns
+        -------
+        losses : np.ndarray
+            array of shape (n,)
+        """
+
+        candidates = np.atleast_2d(candidates)
+        values = np.column_stack([c.scale(candidates[:, i]) for i, c in enumerate(self.calibrated)])
+        threshold = np.broadcast_to(np.asarray(threshold, dtype = np.float64), (len(values),))
+
+        workers = max(self.n_workers, 1)
+        size = self.batch or -(-len(values) // workers)
+        batches = [slice(i, i + size) for i in range(0, len(values), size)]
+
+        if self._pool is None:
+            results = [_evaluate(values[b], threshold[b]) for b in batches]
+        else:
+            results = list(self._pool.map(_evaluate, [values[b] for b in batches], [threshold[b] for b in batches]))
+
+        losses = np.concatenate([r[0] for r in results])
+        self.stopped_early += sum(r[1] for r in results)
+        self.history.append((values, losses))
+
+        return losses
+
+
+    def run(
+        self,
+        strategy : SearchStrategy,
+        max_evaluations : int = 1000
+    ) -> Dict[str, Any]:
+        """
+        Description
+        -----------
+        Search the parameters with a strategy.
+
+        Parameters
+        ----------
+        strategy : SearchStrategy
+            search strategy over the calibrated parameters
+        max_evaluations : int
+            number of candidates evaluated at most
+
+        Returns
+        -------
+        result : Dict[str, Any]
+            'parameters' {name: best value}, 'loss', 'evaluations' and 'stopped_early'
+            (candidates stopped before the end of the period)
+        """
+
+        if strategy.n_parameters != len(self.calibrated):
+            raise ValueError(f"strategy must have {len(self.calibrated)} parameters!")
+
+        while strategy.evaluations < max_evaluations and not strategy.done():
+            candidates = strategy.ask()
+            threshold = np.broadcast_to(strategy.threshold(), (len(candidates),))
+            # the last ask is cut to max_evaluations - the strategy gets the rest as hopeless
+            n = min(len(candidates), max_evaluations - strategy.evaluations)
+            losses = np.full(len(candidates), np.inf)
+            losses[:n] = self.evaluate(candidates[:n], threshold[:n])
+            strategy.tell(candidates, losses)
+            strategy.evaluations -= len(candidates) - n
+
+        if strategy.best is None:
+            raise ValueError("no candidate was evaluated!")
+
+        return {
+            'parameters': {c.name: float(c.scale(u)) for c, u in zip(self.calibrated, strategy.best)},
+            'loss': strategy.best_loss,
+            'evaluations': strategy.evaluations,
+            'stopped_early': self.stopped_early
+        }
+
+
+    def close(self) -> NoReturn:
+        """
+        Description
+        -----------
+        Stop the workers and free the shared memory.
+        """
+
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        elif _CONTEXT is not None and _CONTEXT['specs'] is self._context['specs']:
+            _release_worker()
+        for block in self._shared:
+            block.close()
+            block.unlink()
+        self._shared = []
+
+
+    def __enter__(self) -> 'Calibration':
+        return self
+
+
+    def __exit__(self, *args) -> NoReturn:
+        self.close()
+
+
+
+# Context of a worker process (set by _init_worker)
+_CONTEXT = None
+
+
+
+def _init_worker(
+    context : Dict[str, Any]
+) -> NoReturn:
+
+    """
+    Description
+    -----------
+    Attach a worker process to the shared arrays of a calibration.
+    """
+
+    global _CONTEXT
+    _release_worker()
+    context = dict(context)
+    blocks = {}
+    arrays = {}
+    for name, (block_name, shape, dtype) in context['specs'].items():
+        block = shared_memory.SharedMemory(name = block_name)
+        blocks[name] = block
+        arrays[name] = np.ndarray(shape, dtype = dtype, buffer = block.buf)
+
+    context['blocks'] = blocks
+    context['prepared'] = {name: v for name, v in arrays.items() if not name.startswith('observed:')}
+    context['observed'] = {name[len('observed:'):]: v for name, v in arrays.items() if name.startswith('observed:')}
+    _CONTEXT = context
+
+    # worker processes exit without atexit - the finalizers of multiprocessing still run
+    util.Finalize(None, _release_worker, exitpriority = 0)
+
+
+
+def _release_worker() -> NoReturn:
+
+    """
+    Description
+    -----------
+    Detach the process from the shared arrays attached by _init_worker.
+    """
+
+    global _CONTEXT
+    if _CONTEXT is None:
+        return
+
+    blocks = _CONTEXT['blocks']
+    _CONTEXT = None
+    for block in blocks.values():
+        block.close()
+
+
+
+def _evaluate(
+    values : np.ndarray,
+    threshold : np.ndarray
+) -> Tuple[np.ndarray, int]:
+
+    """
+    Description
+    -----------
+    Run a batch of candidates as one ensemble and return their losses and the number
+    of candidates stopped early.
+    """
+
+    context = _CONTEXT
+    calibrated = context['calibrated']
+    parameters, n_members = ensemble_parameters(
+        context['parameters'],
+        values = {c.name: values[:, i] for i, c in enumerate(calibrated) if not c.multiplier},
+        multipliers = {c.name: values[:, i] for i, c in enumerate(calibrated) if c.multiplier}
+    )
+    driver = Driver(
+        parameters,
+        state = context['state'],
+        stages = context['stages'],
+        policy = context['policy'],
+        n_members = n_members
+    )
+
+    prepared = context['prepared']
+    weights = context['weights']
+    objectives = {
+        name: StreamingObjective(observed, objective = context['objective'], n_members = n_members)
+        for name, observed in context['observed'].items()
+    }
+
+    n_days = next(iter(prepared.values())).shape[0]
+    alive = np.ones(n_members, dtype = bool)
+    for start in range(0, n_days, context['chunk_days']):
+        chunk = {name: v[start:start + context['chunk_days']] for name, v in prepared.items()}
+        outputs = driver.run_block(chunk, prepared = True)
+        for name, objective in objectives.items():
+            simulated = outputs[name]
+            objective.update(simulated if weights is None else simulated @ weights)
+
+        bound = np.mean([objective.lower_bound() for objective in objectives.values()], axis = 0)
+        alive &= ~(bound > threshold)
+        if not np.any(alive):
+            break
+
+    losses = np.mean([objective.loss() for objective in objectives.values()], axis = 0)
+    losses = np.where(alive, losses, np.inf)
+
+    return losses, int(np.sum(~alive))
@@ -0,0 +1,246 @@
+"""
+Streaming Goodness Of Fit.
+
+Simulated values arrive in chunks of days and only running sums are kept, so
+RMSE, NSE and KGE of every member and location are available at any time
+without storing the simulated series.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn
+import warnings
+import numpy as np
+
+
+OBJECTIVES = ('rmse', 'nse', 'kge')
+
+
+
+def zone_matrix(
+    zones : np.ndarray
+) -> np.ndarray:
+
+    """
+    Description
+    -----------
+    Matrix averaging cell values over zones.
+
+    Parameters
+    ----------
+    zones : np.ndarray
+        zone index (0 ... n_zones - 1) of every cell - negative for cells outside all zones
+
+    Returns
+    -------
+    weights : np.ndarray
+        array of shape (cells, n_zones) - values @ weights is the zone mean
+    """
+
+    zones = np.asarray(zones, dtype = np.intp)
+    inside = zones >= 0
+    n_zones = int(zones.max()) + 1 if np.any(inside) else 0
+
+    weights = np.zeros((zones.size, n_zones))
+    weights[np.nonzero(inside)[0], zones[inside]] = 1
+    counts = weights.sum(axis = 0)
+    if np.any(counts == 0):
+        raise ValueError("every zone must have at least one cell!")
+
+    return weights / counts
+
+
+
+class StreamingObjective :
+
+    def __init__(self,
+        observed : np.ndarray,
+        objective : str = 'nse',
+        n_members : int = 1
+    ):
+        """
+        Description
+        -----------
+        Running sums of the simulated and observed values for RMSE, NSE and KGE.
+
+        Parameters
+        ----------
+        observed : np.ndarray
+            observed series of shape (T, locations) - NaN where there is no observation
+        objective : str
+            'rmse', 'nse' or 'kge' - the objective used by ``loss``
+        n_members : int
+            number of simulated members compared with the observations
+        """
+
+        if objective not in OBJECTIVES:
+            raise ValueError(f"objective must be one of {OBJECTIVES}: {objective}")
+
+        self.observed = np.asarray(observed, dtype = np.float64)
+        if self.observed.ndim != 2:
+            raise ValueError(f"observed must have shape (T, locations): {self.observed.shape}")
+        self.objective = objective
+        self.n_members = n_members
+
+        valid = ~np.isnan(self.observed)
+        obs = np.where(valid, self.observed, 0)
+        n = valid.sum(axis = 0)
+        mean = np.divide(obs.sum(axis = 0), n, out = np.zeros(n.shape), where = n > 0)
+        # totals over the whole period, known before the run (bounds of the loss)
+        self.n_total = n
+        self.ss_total = (np.where(valid, self.observed - mean, 0) ** 2).sum(axis = 0)
+
+        shape = (n_members, self.observed.shape[1])
+        self.n = np.zeros(shape)
+        self.sum_sim = np.zeros(shape)
+        self.sum_obs = np.zeros(shape)
+        self.sum_sim2 = np.zeros(shape)
+        self.sum_obs2 = np.zeros(shape)
+        self.sum_sim_obs = np.zeros(shape)
+        self.sse = np.zeros(shape)
+        self.days = 0
+
+
+    def update(
+        self,
+        simulated : np.ndarray
+    ) -> NoReturn:
+        """
+        Description
+        -----------
+        Add the next chunk of days.
+
+        Parameters
+        ----------
+        simulated : np.ndarray
+            simulated values of shape (t, members, locations) or (t, locations) for values
+            shared by all members
+        """
+
+        simulated = np.asarray(simulated, dtype = np.float64)
+        if simulated.ndim == 2:
+            simulated = simulated[:, np.newaxis]
+        t = simulated.shape[0]
+        if self.days + t > self.observed.shape[0]:
+            raise ValueError("simulated series is longer than the observed series!")
+
+        observed = self.observed[self.days:self.days + t, np.newaxis]
+        valid = ~np.isnan(observed) & ~np.isnan(simulated)
+        sim = np.where(valid, simulated, 0)
+        obs = np.where(valid, observed, 0)
+
+        self.n += valid.sum(axis = 0)
+        self.sum_sim += sim.sum(axis = 0)
+        self.sum_obs += obs.sum(axis = 0)
+        self.sum_sim2 += (sim ** 2).sum(axis = 0)
+        self.sum_obs2 += (obs ** 2).sum(axis = 0)
+        self.sum_sim_obs += (sim * obs).sum(axis = 0)
+        self.sse += ((sim - obs) ** 2).sum(axis = 0)
+        self.days += t
+
+
+    def rmse(self) -> np.ndarray:
+        """
+        Description
+        -----------
+        Root mean square error of every member and location, shape (members, locations).
+        """
+
+        return np.sqrt(_divide(self.sse, self.n))
+
+
+    def nse(self) -> np.ndarray:
+        """
+        Description
+        -----------
+        Nash-Sutcliffe efficiency of every member and location, shape (members, locations).
+        """
+
+        ss_obs = self.sum_obs2 - _divide(self.sum_obs ** 2, self.n)
+
+        return 1 - _divide(self.sse, ss_obs)
+
+
+    def kge(self) -> np.ndarray:
+        """
+        Description
+        -----------
+        Kling-Gupta efficiency of every member and location, shape (members, locations).
+        """
+
+        mean_sim = _divide(self.sum_sim, self.n)
+        mean_obs = _divide(self.sum_obs, self.n)
+        var_sim = np.maximum(_divide(self.sum_sim2, self.n) - mean_sim ** 2, 0)
+        var_obs = np.maximum(_divide(self.sum_obs2, self.n) - mean_obs ** 2, 0)
+        cov = _divide(self.sum_sim_obs, self.n) - mean_sim * mean_obs
+
+        r = _divide(cov, np.sqrt(var_sim * var_obs))
+        alpha = _divide(np.sqrt(var_sim), np.sqrt(var_obs))
+        beta = _divide(mean_sim, mean_obs)
+
+        return 1 - np.sqrt((r - 1) ** 2 + (alpha - 1) ** 2 + (beta - 1) ** 2)
+
+
+    def loss(self) -> np.ndarray:
+        """
+        Description
+        -----------
+        Loss of every member (smaller is better): the mean RMSE, or 1 - the mean NSE / KGE
+        over the locations.
+        """
+
+        if self.objective == 'rmse':
+            return _nanmean(self.rmse())
+
+        return 1 - _nanmean(getattr(self, self.objective)())
+
+
+    def lower_bound(self) -> np.ndarray:
+        """
+        Description
+        -----------
+        Smallest loss every member can still reach at the end of the period. The squared
+        error only grows, so for RMSE and NSE a member whose bound is above the loss of a
+        better candidate can be stopped. KGE has no such bound (returns -inf).
+        """
+
+        if self.objective == 'kge':
+            return np.full(self.n_members, -np.inf)
+
+        located = self.n_total > 0
+        if self.objective == 'rmse':
+            return _nanmean(np.sqrt(_divide(self.sse, self.n_total))[:, located])
+
+        return _nanmean(_divide(self.sse, self.ss_total)[:, located])
+
+
+
+def _nanmean(
+    values : np.ndarray
+) -> np.ndarray:
+
+    """
+    Description
+    -----------
+    Mean over the locations (last axis) without the NaN - NaN for a member without any
+    value (such as NSE where no location has variance), without a warning.
+    """
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message = 'Mean of empty slice', category = RuntimeWarning)
+        return np.nanmean(values, axis = -1)
+
+
+
+def _divide(
+    a : np.ndarray,
+    b : np.ndarray
+) -> np.ndarray:
+
+    """
+    Description
+    -----------
+    a / b with NaN where b is zero.
+    """
+
+    b = np.broadcast_to(b, np.broadcast_shapes(np.shape(a), np.shape(b)))
+
+    return np.divide(a, b, out = np.full(b.shape, np.nan), where = b != 0)
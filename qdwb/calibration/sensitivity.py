@@ -0,0 +1,413 @@
+"""
+Global Sensitivity Analysis.
+
+Designs are generated and evaluated batch by batch. Only running sums of the
+estimators are kept, so a design of any size runs in bounded memory, and the
+analysis stops once the confidence intervals of the indices are narrow enough.
+
+The model is any function mapping points of the unit hypercube (n, parameters)
+to one value per point, such as ``Calibration.evaluate`` for the sensitivity
+of the goodness of fit.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Callable, Iterable
+import numpy as np
+from scipy.stats import qmc
+from .calibration import CalibrationParameter, DEFAULT_BOUNDS
+
+
+# z value of the 95% confidence intervals
+Z_95 = 1.959964
+
+
+
+class RunningMoments :
+
+    def __init__(self,
+        shape : Tuple[int, ...] = ()
+    ):
+        """
+        Description
+        -----------
+        Running mean and variance of samples (Welford), updated with whole batches.
+
+        Parameters
+        ----------
+        shape : Tuple[int, ...]
+            shape of one sample
+        """
+
+        self.n = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+
+    def update(
+        self,
+        samples : np.ndarray
+    ) -> NoReturn:
+        """
+        Description
+        -----------
+        Add a batch of samples with the samples on the first axis.
+        """
+
+        samples = np.asarray(samples, dtype = np.float64)
+        n = samples.shape[0]
+        if n == 0:
+            return
+
+        mean = samples.mean(axis = 0)
+        m2 = ((samples - mean) ** 2).sum(axis = 0)
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.n * n / total
+        self.n = total
+
+
+    @property
+    def variance(self) -> np.ndarray:
+        return self.m2 / (self.n - 1) if self.n > 1 else np.full(np.shape(self.mean), np.nan)
+
+
+    @property
+    def standard_error(self) -> np.ndarray:
+        return np.sqrt(self.variance / self.n) if self.n > 1 else np.full(np.shape(self.mean), np.inf)
+
+
+
+def _names(
+    parameters : Iterable[Union[str, CalibrationParameter]]
+) -> List[str]:
+
+    return [p if isinstance(p, str) else p.name for p in parameters]
+
+
+
+class SobolAnalysis :
+
+    def __init__(self,
+        parameters : Iterable[Union[str, CalibrationParameter]],
+        seed : Optional[int] = None
+    ):
+        """
+        Description
+        -----------
+        First order and total Sobol indices with the Saltelli design and the Saltelli (2010)
+        first order and Jansen total effect estimators.
+
+        Parameters
+        ----------
+        parameters : Iterable[Union[str, CalibrationParameter]]
+            parameters in the order of the columns of the design
+        seed : int
+            seed of the scrambled Sobol sequence
+        """
+
+        self.names = _names(parameters)
+        self.n_parameters = len(self.names)
+        self.sequence = qmc.Sobol(2 * self.n_parameters, scramble = True, seed = seed)
+        self.output = RunningMoments()
+        self.first = RunningMoments((self.n_parameters,))
+        self.total = RunningMoments((self.n_parameters,))
+        self.evaluations = 0
+
+
+    def design(
+        self,
+        n : int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Description
+        -----------
+        Next n base samples: matrices A and B of shape (n, parameters) and the
+        matrices AB of shape (parameters, n, parameters) where column i comes from B.
+        """
+
+        points = self.sequence.random(n)
+        a = points[:, :self.n_parameters]
+        b = points[:, self.n_parameters:]
+        ab = np.repeat(a[np.newaxis], self.n_parameters, axis = 0)
+        index = np.arange(self.n_parameters)
+        ab[index, :, index] = b.T
+
+        return a, b, ab
+
+
+    def update(
+        self,
+        f_a : np.ndarray,
+        f_b : np.ndarray,
+        f_ab : np.ndarray
+    ) -> NoReturn:
+        """
+        Description
+        -----------
+        Add the model values of a batch of the design.
+
+        Parameters
+        ----------
+        f_a, f_b : np.ndarray
+            values at A and B, shape (n,)
+        f_ab : np.ndarray
+            values at AB, shape (parameters, n)
+        """
+
+        f_a = np.asarray(f_a, dtype = np.float64)
+        f_b = np.asarray(f_b, dtype = np.float64)
+        f_ab = np.asarray(f_ab, dtype = np.float64)
+
+        self.output.update(np.concatenate([f_a, f_b]))
+        self.first.update((f_b * (f_ab - f_a)).T)
+        self.total.update((0.5 * (f_a - f_ab) ** 2).T)
+        self.evaluations += f_a.size * (self.n_parameters + 2)
+
+
+    def indices(self) -> Dict[str, Dict[str, float]]:
+        """
+        Description
+        -----------
+        Current indices and the half width of their 95% confidence intervals.
+
+        Returns
+        -------
+        indices : Dict[str, Dict[str, float]]
+            {parameter: {'S1', 'S1_conf', 'ST', 'ST_conf'}}
+        """
+
+        variance = self.output.variance
+        s1 = self.first.mean / variance
+        st = self.total.mean / variance
+        s1_conf = Z_95 * self.first.standard_error / variance
+        st_conf = Z_95 * self.total.standard_error / variance
+
+        return {
+            name: {'S1': float(s1[i]), 'S1_conf': float(s1_conf[i]), 'ST': float(st[i]), 'ST_conf': float(st_conf[i])}
+            for i, name in enumerate(self.names)
+        }
+
+
+    def run(
+        self,
+        evaluate : Callable[[np.ndarray], np.ndarray],
+        batch : int = 64,
+        max_evaluations : int = 100000,
+        tolerance : float = 0.05
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        Description
+        -----------
+        Evaluate the design batch by batch until the confidence intervals converge.
+
+        Parameters
+        ----------
+        evaluate : Callable[[np.ndarray], np.ndarray]
+            model - points of shape (n, parameters) in [0, 1] to values of shape (n,)
+        batch : int
+            base samples of each batch (a power of 2) - each costs parameters + 2 evaluations
+        max_evaluations : int
+            stop after this number of model evaluations
+        tolerance : float
+            stop when every confidence half width is below this value
+
+        Returns
+        -------
+        indices : Dict[str, Dict[str, float]]
+            as ``indices``
+        """
+
+        while self.evaluations < max_evaluations:
+            a, b, ab = self.design(batch)
+            values = np.asarray(evaluate(np.concatenate([a, b, ab.reshape(-1, self.n_parameters)])))
+            self.update(values[:batch], values[batch:2 * batch], values[2 * batch:].reshape(self.n_parameters, batch))
+
+            if self.first.n > 1 and self._converged(tolerance):
+                break
+
+        return self.indices()
+
+
+    def _converged(
+        self,
+        tolerance : float
+    ) -> bool:
+
+        conf = [max(v['S1_conf'], v['ST_conf']) for v in self.indices().values()]
+
+        return bool(np.all(np.array(conf) < tolerance))
+
+
+
+class MorrisAnalysis :
+
+    def __init__(self,
+        parameters : Iterable[Union[str, CalibrationParameter]],
+        levels : int = 4,
+        seed : Optional[int] = None
+    ):
+        """
+        Description
+        -----------
+        Elementary effects screening (Morris, 1991) with the mu* of Campolongo et al. (2007).
+
+        Parameters
+        ----------
+        parameters : Iterable[Union[str, CalibrationParameter]]
+            parameters in the order of the columns of the design
+        levels : int
+            number of grid levels p (even)
+        seed : int
+            seed of the random generator
+        """
+
+        if levels < 2 or levels % 2:
+            raise ValueError("levels must be an even number greater than or equal to 2!")
+
+        self.names = _names(parameters)
+        self.n_parameters = len(self.names)
+        self.levels = levels
+        self.delta = levels / (2 * (levels - 1))
+        self.rng = np.random.default_rng(seed)
+        self.effects = RunningMoments((self.n_parameters,))
+        self.absolute = RunningMoments((self.n_parameters,))
+        self.evaluations = 0
+
+
+    def design(
+        self,
+        r : int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Description
+        -----------
+        r random trajectories.
+
+        Returns
+        -------
+        points : np.ndarray
+            array of shape (r, parameters + 1, parameters)
+        order : np.ndarray
+            parameter moved at each step, shape (r, parameters)
+        sign : np.ndarray
+            direction of each step (+1 or -1), shape (r, parameters)
+        """
+
+        d = self.n_parameters
+        grid = np.arange(self.levels // 2) / (self.levels - 1)
+        start = self.rng.choice(grid, (r, d))
+        sign = self.rng.choice([-1.0, 1.0], (r, d))
+        order = np.argsort(self.rng.random((r, d)), axis = 1)
+
+        # start on the side of the step, so every point stays in [0, 1]
+        start = np.where(sign < 0, start + self.delta, start)
+        steps = np.zeros((r, d + 1, d))
+        rows = np.arange(r)
+        for k in range(d):
+            steps[:, k + 1] = steps[:, k]
+            steps[rows, k + 1, order[:, k]] = sign[rows, order[:, k]] * self.delta
+
+        return start[:, np.newaxis] + steps, order, sign
+
+
+    def update(
+        self,
+        values : np.ndarray,
+        order : np.ndarray,
+        sign : np.ndarray
+    ) -> NoReturn:
+        """
+        Description
+        -----------
+        Add the model values of a batch of trajectories, shape (r, parameters + 1).
+        """
+
+        values = np.asarray(values, dtype = np.float64)
+        r = values.shape[0]
+        effects = np.empty((r, self.n_parameters))
+        rows = np.arange(r)
+        step = np.diff(values, axis = 1) / self.delta
+        for k in range(self.n_parameters):
+            effects[rows, order[:, k]] = step[:, k] * sign[rows, order[:, k]]
+
+        self.effects.update(effects)
+        self.absolute.update(np.abs(effects))
+        self.evaluations += values.size
+
+
+    def indices(self) -> Dict[str, Dict[str, float]]:
+        """
+        Description
+        -----------
+        Current statistics of the elementary effects.
+
+        Returns
+        -------
+        indices : Dict[str, Dict[str, float]]
+            {parameter: {'mu', 'mu_star', 'mu_star_conf', 'sigma'}}
+        """
+
+        sigma = np.sqrt(self.effects.variance)
+        conf = Z_95 * self.absolute.standard_error
+
+        return {
+            name: {
+                'mu': float(self.effects.mean[i]),
+                'mu_star': float(self.absolute.mean[i]),
+                'mu_star_conf': float(conf[i]),
+                'sigma': float(sigma[i])
+            }
+            for i, name in enumerate(self.names)
+        }
+
+
+    def run(
+        self,
+        evaluate : Callable[[np.ndarray], np.ndarray],
+        batch : int = 16,
+        max_evaluations : int = 10000,
+        tolerance : float = 0.1
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        Description
+        -----------
+        Evaluate trajectories batch by batch until the ranking of mu* is reliable.
+
+        Parameters
+        ----------
+        evaluate : Callable[[np.ndarray], np.ndarray]
+            model - points of shape (n, parameters) in [0, 1] to values of shape (n,)
+        batch : int
+            trajectories of each batch - each costs parameters + 1 evaluations
+        max_evaluations : int
+            stop after this number of model evaluations
+        tolerance : float
+            stop when every confidence half width of mu* is below this share of the largest mu*
+
+        Returns
+        -------
+        indices : Dict[str, Dict[str, float]]
+            as ``indices``
+        """
+
+        while self.evaluations < max_evaluations:
+            points, order, sign = self.design(batch)
+            values = np.asarray(evaluate(points.reshape(-1, self.n_parameters)))
+            self.update(values.reshape(batch, self.n_parameters + 1), order, sign)
+
+            if self.absolute.n > 1:
+                conf = Z_95 * self.absolute.standard_error
+                if np.all(conf <= tolerance * np.max(self.absolute.mean)):
+                    break
+
+        return self.indices()
+
+
+
+# Parameters screened before a calibration
+SCREENED_PARAMETERS = [
+    DEFAULT_BOUNDS[name] for name in (
+        'curve_number', 'fc_transpiration_layer', 'pwp_transpiration_layer', 'MAD',
+        'stress_coefficient', 'geology_permeability', 'degree_day_factor'
+    )
+]
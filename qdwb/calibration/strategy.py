@@ -0,0 +1,401 @@
+"""
+Search Strategies Of The Calibration.
+
+A strategy proposes candidates in the unit hypercube with ``ask`` and learns
+their losses with ``tell`` (smaller is better). ``threshold`` gives, for each
+candidate of the last ask, the loss it has to beat to be of any use, so the
+engine can stop hopeless candidates early.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn
+import numpy as np
+
+
+
+def latin_hypercube(
+    n : int,
+    n_parameters : int,
+    rng : np.random.Generator
+) -> np.ndarray:
+
+    """
+    Description
+    -----------
+    Latin hypercube sample of the unit hypercube.
+
+    Parameters
+    ----------
+    n : int
+        number of points
+    n_parameters : int
+        number of dimensions
+    rng : np.random.Generator
+        random generator
+
+    Returns
+    -------
+    points : np.ndarray
+        array of shape (n, n_parameters)
+    """
+
+    strata = np.argsort(rng.random((n_parameters, n)), axis = 1).T
+
+    return (strata + rng.random((n, n_parameters))) / n
+
+
+
+class SearchStrategy :
+
+    def __init__(self,
+        n_parameters : int,
+        seed : Optional[int] = None
+    ):
+        """
+        Description
+        -----------
+        Base class of the strategies - keeps the best candidate found so far.
+
+        Parameters
+        ----------
+        n_parameters : int
+            number of calibrated parameters
+        seed : int
+            seed of the random generator
+        """
+
+        self.n_parameters = n_parameters
+        self.rng = np.random.default_rng(seed)
+        self.best = None
+        self.best_loss = np.inf
+        self.evaluations = 0
+
+
+    def ask(self) -> np.ndarray:
+        """
+        Description
+        -----------
+        Next candidates, array of shape (n, n_parameters) in [0, 1].
+        """
+
+        raise NotImplementedError
+
+
+    def tell(
+        self,
+        candidates : np.ndarray,
+        losses : np.ndarray
+    ) -> NoReturn:
+        """
+        Description
+        -----------
+        Losses of the candidates of the last ask.
+        """
+
+        losses = np.asarray(losses, dtype = np.float64)
+        self.evaluations += len(losses)
+        i = int(np.argmin(losses))
+        if losses[i] < self.best_loss:
+            self.best_loss = float(losses[i])
+            self.best = np.array(candidates[i])
+
+
+    def threshold(self) -> np.ndarray:
+        """
+        Description
+        -----------
+        Loss each candidate of the last ask has to beat (inf if it can not be stopped early).
+        """
+
+        return np.asarray(self.best_loss)
+
+
+    def done(self) -> bool:
+        """
+        Description
+        -----------
+        True if the strategy has converged.
+        """
+
+        return False
+
+
+
+class RandomSearch(SearchStrategy) :
+
+    def __init__(self,
+        n_parameters : int,
+        batch : int = 32,
+        latin : bool = True,
+        seed : Optional[int] = None
+    ):
+        """
+        Description
+        -----------
+        Independent samples of the hypercube.
+
+        Parameters
+        ----------
+        n_parameters : int
+            number of calibrated parameters
+        batch : int
+            number of candidates of each ask
+        latin : bool
+            True for a latin hypercube sample in each batch, False for uniform random points
+        seed : int
+            seed of the random generator
+        """
+
+        super().__init__(n_parameters, seed)
+        self.batch = batch
+        self.latin = latin
+
+
+    def ask(self) -> np.ndarray:
+
+        if self.latin:
+            return latin_hypercube(self.batch, self.n_parameters, self.rng)
+
+        return self.rng.random((self.batch, self.n_parameters))
+
+
+
+class DifferentialEvolution(SearchStrategy) :
+
+    def __init__(self,
+        n_parameters : int,
+        population : Optional[int] = None,
+        mutation : float = 0.8,
+        crossover : float = 0.9,
+        tolerance : float = 1e-6,
+        seed : Optional[int] = None
+    ):
+        """
+        Description
+        -----------
+        DE/rand/1/bin differential evolution (Storn and Price, 1997).
+
+        Parameters
+        ----------
+        n_parameters : int
+            number of calibrated parameters
+        population : int
+            population size - None for 10 times the number of parameters
+        mutation : float
+            differential weight F
+        crossover : float
+            crossover probability CR
+        tolerance : float
+            converged when the spread of the population losses is below this value
+        seed : int
+            seed of the random generator
+        """
+
+        super().__init__(n_parameters, seed)
+        self.size = max(population or 10 * n_parameters, 4)
+        self.mutation = mutation
+        self.crossover = crossover
+        self.tolerance = tolerance
+        self.population = None
+        self.losses = None
+
+
+    def ask(self) -> np.ndarray:
+
+        if self.population is None:
+            return latin_hypercube(self.size, self.n_parameters, self.rng)
+
+        n, d = self.population.shape
+        others = np.array([self.rng.choice(np.delete(np.arange(n), i), 3, replace = False) for i in range(n)])
+        a, b, c = (self.population[others[:, k]] for k in range(3))
+        mutant = np.clip(a + self.mutation * (b - c), 0, 1)
+
+        cross = self.rng.random((n, d)) < self.crossover
+        cross[np.arange(n), self.rng.integers(0, d, n)] = True
+
+        return np.where(cross, mutant, self.population)
+
+
+    def tell(
+        self,
+        candidates : np.ndarray,
+        losses : np.ndarray
+    ) -> NoReturn:
+
+        super().tell(candidates, losses)
+        losses = np.asarray(losses, dtype = np.float64)
+        if self.population is None:
+            self.population = np.array(candidates)
+            self.losses = losses
+            return
+
+        better = losses <= self.losses
+        self.population[better] = candidates[better]
+        self.losses[better] = losses[better]
+
+
+    def threshold(self) -> np.ndarray:
+
+        if self.losses is None:
+            return np.asarray(np.inf)
+
+        # a trial only replaces its own target
+        return self.losses.copy()
+
+
+    def done(self) -> bool:
+
+        return self.losses is not None and bool(np.ptp(self.losses) < self.tolerance)
+
+
+
+class SCEUA(SearchStrategy) :
+
+    def __init__(self,
+        n_parameters : int,
+        complexes : int = 2,
+        points_per_complex : Optional[int] = None,
+        evolution_steps : Optional[int] = None,
+        tolerance : float = 1e-6,
+        seed : Optional[int] = None
+    ):
+        """
+        Description
+        -----------
+        Shuffled complex evolution (Duan et al., 1992). The competitive complex evolution
+        step runs in all complexes at once, so each ask proposes one point per complex.
+
+        Parameters
+        ----------
+        n_parameters : int
+            number of calibrated parameters
+        complexes : int
+            number of complexes p
+        points_per_complex : int
+            points in each complex m - None for 2 * n_parameters + 1
+        evolution_steps : int
+            evolution steps of each complex between two shuffles - None for points_per_complex
+        tolerance : float
+            converged when the spread of the population losses is below this value
+        seed : int
+            seed of the random generator
+        """
+
+        super().__init__(n_parameters, seed)
+        self.complexes = complexes
+        self.m = points_per_complex or 2 * n_parameters + 1
+        self.q = n_parameters + 1
+        self.evolution_steps = evolution_steps or self.m
+        self.tolerance = tolerance
+
+        self.population = None
+        self.losses = None
+        self.members = None
+        self.step = 0
+        # trial of each complex: 0 reflection, 1 contraction, 2 random point
+        self.trial = np.zeros(complexes, dtype = int)
+        self._sub = None
+        self._pending = None
+
+
+    def _shuffle(self) -> NoReturn:
+
+        order = np.argsort(self.losses)
+        self.population = self.population[order]
+        self.losses = self.losses[order]
+        # point k of the sorted population goes to complex k mod p
+        self.members = [np.arange(c, len(order), self.complexes) for c in range(self.complexes)]
+        self.step = 0
+
+
+    def _sub_complex(
+        self,
+        members : np.ndarray
+    ) -> np.ndarray:
+
+        # trapezoidal probability, better points are chosen more often
+        ranks = np.argsort(np.argsort(self.losses[members]))
+        weights = 2 * (self.m + 1 - (ranks + 1)) / (self.m * (self.m + 1))
+        chosen = self.rng.choice(len(members), self.q, replace = False, p = weights / weights.sum())
+
+        return members[chosen]
+
+
+    def ask(self) -> np.ndarray:
+
+        if self.population is None:
+            return latin_hypercube(self.complexes * self.m, self.n_parameters, self.rng)
+
+        candidates = []
+        self._pending = []
+        for c, members in enumerate(self.members):
+            if self.trial[c] == 0 or self._sub is None:
+                sub = self._sub_complex(members)
+            else:
+                sub = self._sub[c]
+            sub = sub[np.argsort(self.losses[sub])]
+            worst = sub[-1]
+            centroid = self.population[sub[:-1]].mean(axis = 0)
+
+            if self.trial[c] == 0:
+                point = 2 * centroid - self.population[worst]
+            elif self.trial[c] == 1:
+                point = (centroid + self.population[worst]) / 2
+            else:
+                point = None
+            if point is None or np.any(point < 0) or np.any(point > 1):
+                low = self.population[members].min(axis = 0)
+                high = self.population[members].max(axis = 0)
+                point = low + self.rng.random(self.n_parameters) * (high - low)
+                self.trial[c] = 2
+
+            candidates.append(point)
+            self._pending.append(sub)
+
+        self._sub = list(self._pending)
+
+        return np.array(candidates)
+
+
+    def tell(
+        self,
+        candidates : np.ndarray,
+        losses : np.ndarray
+    ) -> NoReturn:
+
+        super().tell(candidates, losses)
+        losses = np.asarray(losses, dtype = np.float64)
+        if self.population is None:
+            self.population = np.array(candidates)
+            self.losses = losses
+            self._shuffle()
+            return
+
+        for c, sub in enumerate(self._pending):
+            worst = sub[np.argmax(self.losses[sub])]
+            if losses[c] < self.losses[worst] or self.trial[c] == 2:
+                self.population[worst] = candidates[c]
+                self.losses[worst] = losses[c]
+                self.trial[c] = 0
+            else:
+                self.trial[c] += 1
+
+        if np.all(self.trial == 0):
+            self.step += 1
+            if self.step >= self.evolution_steps:
+                self._shuffle()
+
+
+    def threshold(self) -> np.ndarray:
+
+        if self._pending is None:
+            return np.asarray(np.inf)
+
+        # a random point always replaces the worst point, it can not be stopped
+        worst = np.array([self.losses[sub].max() for sub in self._pending])
+
+        return np.where(self.trial == 2, np.inf, worst)
+
+
+    def done(self) -> bool:
+
+        return self.losses is not None and bool(np.ptp(self.losses) < self.tolerance)
@@ -0,0 +1,365 @@
+"""
+Compressed Active Cell Layout.
+
+Cells inside the basin mask are stored as one 1-D axis (row major order of the
+2-D grid). State, parameter and forcing arrays only hold active cells, and
+values are mapped back to the 2-D lat/lon grid on output.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Mapping
+import numpy as np
+
+
+
+class ActiveCellGrid :
+
+    def __init__(self,
+        mask : np.ndarray,
+        lat : Optional[np.ndarray] = None,
+        lon : Optional[np.ndarray] = None
+    ):
+        """
+        Description
+        -----------
+        1-D layout of the active cells of a 2-D grid.
+
+        Parameters
+        ----------
+        mask : np.ndarray
+            2-D boolean array, True inside the basin
+        lat : np.ndarray
+            1-D latitude of the grid rows (optional)
+        lon : np.ndarray
+            1-D longitude of the grid columns (optional)
+        """
+
+        mask = np.asarray(mask, dtype = bool)
+        if mask.ndim != 2:
+            raise ValueError("mask must be a 2-D array!")
+        if lat is not None and len(lat) != mask.shape[0]:
+            raise ValueError("lat must have one value per row of the mask!")
+        if lon is not None and len(lon) != mask.shape[1]:
+            raise ValueError("lon must have one value per column of the mask!")
+
+        self.mask = mask
+        self.shape = mask.shape
+        self.index = np.flatnonzero(mask)
+        self.rows, self.cols = np.unravel_index(self.index, self.shape)
+        self.lat = None if lat is None else np.asarray(lat)
+        self.lon = None if lon is None else np.asarray(lon)
+
+
+    @classmethod
+    def from_raster(
+        cls,
+        raster : np.ndarray,
+        lat : Optional[np.ndarray] = None,
+        lon : Optional[np.ndarray] = None
+    ) -> 'ActiveCellGrid':
+        """
+        Description
+        -----------
+        Layout of the cells of a raster that are not NaN, such as the output of ``extract.rasterize``.
+
+        Parameters
+        ----------
+        raster : np.ndarray
+            2-D array with NaN outside the basin
+        lat, lon : np.ndarray
+            1-D coordinates of the rows and columns (optional)
+
+        Returns
+        -------
+        grid : ActiveCellGrid
+        """
+
+        return cls(~np.isnan(np.asarray(raster, dtype = float)), lat = lat, lon = lon)
+
+
+    @classmethod
+    def from_data_array(
+        cls,
+        data_array : Any,
+        latitude : str = 'lat',
+        longitude : str = 'lon'
+    ) -> 'ActiveCellGrid':
+        """
+        Description
+        -----------
+        Layout of the cells of a 2-D xarray.DataArray that are not NaN.
+
+        Parameters
+        ----------
+        data_array : xarray.DataArray
+            2-D array with NaN outside the basin and dims (latitude, longitude)
+        latitude : str
+            name of the latitude coordinate
+        longitude : str
+            name of the longitude coordinate
+
+        Returns
+        -------
+        grid : ActiveCellGrid
+        """
+
+        data_array = data_array.transpose(latitude, longitude)
+
+        return cls.from_raster(
+            data_array.values,
+            lat = data_array[latitude].values,
+            lon = data_array[longitude].values
+        )
+
+
+    @classmethod
+    def from_shapefile(
+        cls,
+        shp_path : str,
+        coords : Mapping[str, Any],
+        latitude : str = 'lat',
+        longitude : str = 'lon'
+    ) -> 'ActiveCellGrid':
+        """
+        Description
+        -----------
+        Layout of the cells of a lat/lon grid that are inside the polygons of a shapefile.
+
+        Parameters
+        ----------
+        shp_path : str
+            path of the shapefile of the basin
+        coords : Mapping[str, Any]
+            coordinates of the grid (1-D latitude and longitude)
+        latitude : str
+            name of the latitude coordinate
+        longitude : str
+            name of the longitude coordinate
+
+        Returns
+        -------
+        grid : ActiveCellGrid
+        """
+
+        import geopandas as gpd
+        from .extract import rasterize
+
+        shp_gpd = gpd.read_file(shp_path)
+        shapes = [(shape, n) for n, shape in enumerate(shp_gpd.geometry)]
+
+        return cls.from_data_array(
+            rasterize(shapes, coords, latitude = latitude, longitude = longitude),
+            latitude = latitude,
+            longitude = longitude
+        )
+
+
+    @property
+    def n_cells(self) -> int:
+        return len(self.index)
+
+
+    @property
+    def fraction(self) -> float:
+        """
+        Description
+        -----------
+        Share of the bounding box covered by active cells.
+        """
+
+        return self.n_cells / self.mask.size
+
+
+    def is_grid(
+        self,
+        values : Any,
+        layout : Optional[str] = None
+    ) -> bool:
+        """
+        Description
+        -----------
+        True if values is a 2-D (or stacked 2-D) grid, False if it has cells (or nothing of the
+        grid) on its last axis.
+
+        Parameters
+        ----------
+        values : Any
+            array or scalar
+        layout : str
+            'grid' or 'cells' to state the layout - None to find it from the shape, which raises
+            a ValueError when the last two axes have the grid shape and the last one is n_cells
+            (such as a (T, n_cells) block with T rows and n_cells columns)
+        """
+
+        if layout not in (None, 'grid', 'cells'):
+            raise ValueError(f"layout must be 'grid', 'cells' or None: {layout}")
+        if layout == 'cells':
+            return False
+
+        shape = np.shape(values)
+        grid = len(shape) >= 2 and shape[-2:] == self.shape
+        if layout == 'grid':
+            if not grid:
+                raise ValueError(f"values must end with the grid shape {self.shape}: {shape}")
+            return True
+        if grid and shape[-1] == self.n_cells:
+            raise ValueError(f"values of shape {shape} can be a grid or cells - give layout 'grid' or 'cells'!")
+
+        return grid
+
+
+    def gather(
+        self,
+        values : np.ndarray
+    ) -> np.ndarray:
+        """
+        Description
+        -----------
+        Extract the active cells of a 2-D (or stacked 2-D) array.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            array of shape (..., rows, cols)
+
+        Returns
+        -------
+        values : np.ndarray
+            array of shape (..., n_cells)
+        """
+
+        values = np.asarray(values)
+        self.is_grid(values, layout = 'grid')
+
+        return values.reshape(values.shape[:-2] + (-1,))[..., self.index]
+
+
+    def gather_all(
+        self,
+        values : Mapping[str, Any],
+        layout : Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Description
+        -----------
+        Gather every 2-D grid of a dict, other values (scalars, 1-D arrays) are kept as they are.
+
+        Parameters
+        ----------
+        values : Mapping[str, Any]
+            named arrays
+        layout : str
+            layout of every array of 2 or more axes, as in ``is_grid`` - None to find it from the shapes
+
+        Returns
+        -------
+        values : Dict[str, Any]
+        """
+
+        return {
+            name: self.gather(v) if np.ndim(v) >= 2 and self.is_grid(v, layout) else v
+            for name, v in values.items()
+        }
+
+
+    def scatter(
+        self,
+        values : np.ndarray,
+        fill : float = np.nan,
+        out : Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Description
+        -----------
+        Map active cell values back to the 2-D grid.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            array of shape (..., n_cells)
+        fill : float
+            value of the cells outside the basin
+        out : np.ndarray
+            array of shape (..., rows, cols) to write into - only active cells are written
+
+        Returns
+        -------
+        grid : np.ndarray
+            array of shape (..., rows, cols)
+        """
+
+        values = np.asarray(values)
+        if values.shape[-1:] != (self.n_cells,):
+            raise ValueError(f"values must have {self.n_cells} cells on the last axis: {values.shape}")
+
+        if out is None:
+            dtype = np.result_type(values.dtype, np.min_scalar_type(fill)) if values.dtype.kind != 'b' else values.dtype
+            out = np.full(values.shape[:-1] + self.shape, fill, dtype = dtype)
+        flat = out.reshape(out.shape[:-2] + (-1,))
+        flat[..., self.index] = values
+
+        return out
+
+
+    def coordinates(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Description
+        -----------
+        Latitude and longitude of every active cell.
+
+        Returns
+        -------
+        lat : np.ndarray
+            latitude of the active cells
+        lon : np.ndarray
+            longitude of the active cells
+        """
+
+        if self.lat is None or self.lon is None:
+            raise ValueError("grid has no lat/lon coordinates!")
+
+        return self.lat[self.rows], self.lon[self.cols]
+
+
+    def to_data_array(
+        self,
+        values : np.ndarray,
+        name : Optional[str] = None,
+        latitude : str = 'lat',
+        longitude : str = 'lon'
+    ) -> Any:
+        """
+        Description
+        -----------
+        Scatter the active cell values of one variable to a 2-D xarray.DataArray.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            array of shape (n_cells,)
+        name : str
+            name of the variable
+        latitude : str
+            name of the latitude dimension
+        longitude : str
+            name of the longitude dimension
+
+        Returns
+        -------
+        data_array : xarray.DataArray
+        """
+
+        import xarray as xr
+
+        if self.lat is None or self.lon is None:
+            raise ValueError("grid has no lat/lon coordinates!")
+
+        return xr.DataArray(
+            self.scatter(values),
+            coords = {latitude: self.lat, longitude: self.lon},
+            dims = (latitude, longitude),
+            name = name
+        )
+
+
+    def __repr__(self) -> str:
+        return f"ActiveCellGrid(shape={self.shape}, n_cells={self.n_cells}, fraction={self.fraction:.3f})"
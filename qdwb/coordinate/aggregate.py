@@ -0,0 +1,276 @@
+"""
+Sparse Aggregation Of Cell Values To Gauges, Reservoirs And Aquifers.
+
+Cell outputs are depths (mm) while the reservoir and groundwater balances
+work with volumes (m^3) of whole objects. An Aggregation is a sparse matrix
+(targets x cells) holding area / 1000 times the share of every cell in every
+target, so one sparse product per day (or per block of days) gives the
+volume of every target.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Sequence
+import numpy as np
+from scipy import sparse
+from .active_cell import ActiveCellGrid
+
+
+# Mean radius of the earth [m]
+EARTH_RADIUS = 6371008.8
+
+
+
+def cell_area(
+    grid : ActiveCellGrid,
+    radius : float = EARTH_RADIUS
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Area of the active cells of a regular lat/lon grid on a sphere.
+
+    Parameters
+    ----------
+    grid : ActiveCellGrid
+        grid with lat/lon coordinates of the cell centres
+    radius : float
+        radius of the sphere [m]
+
+    Returns
+    -------
+    area : np.ndarray
+        area of every active cell [m^2]
+    """
+
+    if grid.lat is None or grid.lon is None:
+        raise ValueError("grid has no lat/lon coordinates!")
+    if len(grid.lat) < 2 or len(grid.lon) < 2:
+        raise ValueError("grid needs at least two rows and two columns to know its resolution!")
+
+    dlat = np.abs(np.diff(grid.lat)).mean()
+    dlon = np.abs(np.diff(grid.lon)).mean()
+    lat = np.radians(grid.lat[grid.rows])
+    half = np.radians(dlat) / 2
+
+    return radius ** 2 * np.radians(dlon) * np.abs(np.sin(np.minimum(lat + half, np.pi / 2)) - np.sin(np.maximum(lat - half, -np.pi / 2)))
+
+
+
+class Aggregation :
+
+    def __init__(self,
+        shares : Any,
+        area : Union[float, np.ndarray] = 1.0,
+        names : Optional[Sequence[Any]] = None
+    ):
+        """
+        Description
+        -----------
+        Operator from depths per cell (mm) to volumes per target (m^3).
+
+        Parameters
+        ----------
+        shares : Any
+            sparse matrix or 2-D array of shape (targets, cells) - share of every cell in
+            every target (1 inside, 0 outside, or fractions for partial cells)
+        area : Union[float, np.ndarray]
+            area of every cell [m^2]
+        names : Sequence[Any]
+            names of the targets (such as reservoir or gauge ids)
+        """
+
+        shares = sparse.csr_matrix(shares, dtype = np.float64)
+        area = np.broadcast_to(np.asarray(area, dtype = np.float64), (shares.shape[1],))
+
+        self.n_targets, self.n_cells = shares.shape
+        self.names = list(range(self.n_targets)) if names is None else list(names)
+        if len(self.names) != self.n_targets:
+            raise ValueError(f"names must have one name per target: {len(self.names)} != {self.n_targets}")
+
+        # mm * m^2 / 1000 = m^3
+        self.matrix = sparse.csr_matrix(shares.multiply(area[np.newaxis] / 1000))
+        self.matrix.eliminate_zeros()
+        self.area = np.asarray(shares @ area).ravel()
+
+
+    @classmethod
+    def from_labels(
+        cls,
+        labels : np.ndarray,
+        area : Union[float, np.ndarray] = 1.0,
+        names : Optional[Sequence[Any]] = None
+    ) -> 'Aggregation':
+        """
+        Description
+        -----------
+        Aggregation of disjoint targets (aquifers, sub-basins) given as a label per cell.
+
+        Parameters
+        ----------
+        labels : np.ndarray
+            target (0 ... n_targets - 1) of every cell - negative for cells outside all targets
+        area : Union[float, np.ndarray]
+            area of every cell [m^2]
+        names : Sequence[Any]
+            names of the targets
+        """
+
+        labels = np.asarray(labels, dtype = np.intp)
+        inside = np.flatnonzero(labels >= 0)
+        n_targets = len(names) if names is not None else int(labels.max(initial = -1)) + 1
+        shares = sparse.csr_matrix(
+            (np.ones(inside.size), (labels[inside], inside)), shape = (n_targets, labels.size)
+        )
+
+        return cls(shares, area, names)
+
+
+    @classmethod
+    def from_masks(
+        cls,
+        masks : np.ndarray,
+        grid : Optional[ActiveCellGrid] = None,
+        area : Union[float, np.ndarray] = 1.0,
+        names : Optional[Sequence[Any]] = None,
+        layout : Optional[str] = None
+    ) -> 'Aggregation':
+        """
+        Description
+        -----------
+        Aggregation of (possibly overlapping) targets given as masks.
+
+        Parameters
+        ----------
+        masks : np.ndarray
+            boolean or fraction masks of shape (targets, cells), or (targets, rows, cols) with grid
+        grid : ActiveCellGrid
+            active cells of 2-D masks
+        area : Union[float, np.ndarray]
+            area of every cell [m^2]
+        names : Sequence[Any]
+            names of the targets
+        layout : str
+            'grid' or 'cells' layout of the masks (see ``ActiveCellGrid.is_grid``) - None to find
+            it from their shape
+        """
+
+        masks = np.asarray(masks, dtype = np.float64)
+        if grid is not None and grid.is_grid(masks, layout):
+            masks = grid.gather(masks)
+
+        return cls(sparse.csr_matrix(masks), area, names)
+
+
+    @classmethod
+    def from_network(
+        cls,
+        network : Any,
+        cells : Sequence[int],
+        area : Union[float, np.ndarray] = 1.0,
+        names : Optional[Sequence[Any]] = None,
+        batch : int = 256
+    ) -> 'Aggregation':
+        """
+        Description
+        -----------
+        Contributing areas of gauges or reservoir inlets on a flow network: the share of
+        the water of every cell that passes through each target cell (0 or 1 for D8).
+        Nested targets each get their whole contributing area.
+
+        Parameters
+        ----------
+        network : routing.flow.FlowNetwork
+            flow network of the cells
+        cells : Sequence[int]
+            cell of every target
+        area : Union[float, np.ndarray]
+            area of every cell [m^2]
+        names : Sequence[Any]
+            names of the targets
+        batch : int
+            targets swept together (memory of batch x cells floats)
+        """
+
+        cells = np.asarray(cells, dtype = np.intp)
+        levels = []
+        for _, source, weight, targets, starts in network.levels:
+            target = np.repeat(targets, np.diff(np.r_[starts, source.size]))
+            order = np.argsort(source, kind = 'stable')
+            sources, first = np.unique(source[order], return_index = True)
+            levels.append((target[order], weight[order], sources, first))
+
+        blocks = []
+        for offset in range(0, cells.size, batch):
+            group = cells[offset:offset + batch]
+            share = np.zeros((group.size, network.n_cells))
+            share[np.arange(group.size), group] = 1
+            # from the outlets upstream: a cell sends its water where its targets send theirs
+            for target, weight, sources, first in reversed(levels):
+                if sources.size:
+                    share[:, sources] += np.add.reduceat(share[:, target] * weight, first, axis = 1)
+            blocks.append(sparse.csr_matrix(share))
+
+        shares = sparse.vstack(blocks, format = 'csr') if blocks else sparse.csr_matrix((0, network.n_cells))
+
+        return cls(shares, area, names)
+
+
+    def volume(
+        self,
+        values : np.ndarray
+    ) -> np.ndarray:
+        """
+        Description
+        -----------
+        Volume of every target from depths per cell.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            depths [mm] of shape (..., cells), such as (days, cells)
+
+        Returns
+        -------
+        volume : np.ndarray
+            volumes [m^3] of shape (..., targets)
+        """
+
+        values = np.asarray(values, dtype = np.float64)
+        if values.shape[-1] != self.n_cells:
+            raise ValueError(f"values must have {self.n_cells} cells on the last axis: {values.shape}")
+
+        flat = values.reshape(-1, self.n_cells)
+
+        return np.asarray(self.matrix @ flat.T).T.reshape(values.shape[:-1] + (self.n_targets,))
+
+
+    def mean(
+        self,
+        values : np.ndarray
+    ) -> np.ndarray:
+        """
+        Description
+        -----------
+        Area weighted mean depth [mm] of every target, shape (..., targets).
+        """
+
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            return self.volume(values) * 1000 / self.area
+
+
+    def to_dict(
+        self,
+        volume : np.ndarray
+    ) -> Dict[Any, np.ndarray]:
+        """
+        Description
+        -----------
+        Volumes of shape (..., targets) by target name.
+        """
+
+        volume = np.asarray(volume)
+
+        return {name: volume[..., i] for i, name in enumerate(self.names)}
+
+
+    def __repr__(self) -> str:
+        return f"Aggregation(n_targets={self.n_targets}, n_cells={self.n_cells}, nnz={self.matrix.nnz})"
@@ -0,0 +1,226 @@
+"""
+Batched Raster Sampling.
+
+Point coordinates are converted to pixel indices with one affine transform for
+all points, and window means are taken from a summed area table, so the cost
+of a point does not depend on the size of its window. Rasters on disk are read
+tile by tile, only where there are points.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Callable, Sequence
+import numpy as np
+
+
+
+def points_to_pixels(
+    x : np.ndarray,
+    y : np.ndarray,
+    transform : Any,
+    op : Callable[[np.ndarray], np.ndarray] = np.floor
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Description
+    -----------
+    Pixel indices of points, as ``rasterio.transform.rowcol`` for arrays of points.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        x coordinates (longitude)
+    y : np.ndarray
+        y coordinates (latitude)
+    transform : affine.Affine
+        pixel to coordinate transform, such as the one of ``extract.transform_from_latlon``
+        or of a rasterio dataset
+    op : Callable
+        rounding of the fractional pixel indices - np.floor for the pixel containing the point,
+        np.round when the transform maps pixel corners to cell centres (``transform_from_latlon``)
+
+    Returns
+    -------
+    rows : np.ndarray
+        row of every point
+    cols : np.ndarray
+        column of every point
+    """
+
+    inverse = ~transform
+    x = np.asarray(x, dtype = np.float64)
+    y = np.asarray(y, dtype = np.float64)
+    cols = inverse.a * x + inverse.b * y + inverse.c
+    rows = inverse.d * x + inverse.e * y + inverse.f
+
+    return op(rows).astype(np.intp), op(cols).astype(np.intp)
+
+
+
+def grid_points(
+    lon : np.ndarray,
+    lat : np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Description
+    -----------
+    Coordinates of every point of a lon/lat grid (replaces ``itertools.product`` of the axes).
+
+    Parameters
+    ----------
+    lon : np.ndarray
+        1-D longitude of the columns
+    lat : np.ndarray
+        1-D latitude of the rows
+
+    Returns
+    -------
+    x : np.ndarray
+        longitude of the points, row major order
+    y : np.ndarray
+        latitude of the points, row major order
+    """
+
+    x, y = np.meshgrid(np.asarray(lon), np.asarray(lat))
+
+    return x.ravel(), y.ravel()
+
+
+
+def sample_array(
+    values : np.ndarray,
+    rows : np.ndarray,
+    cols : np.ndarray,
+    buffer : int = 0,
+    nodata : Optional[float] = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Values of a (multi band) array at pixels, or their mean over a square window.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        array of shape (rows, cols) or (bands, rows, cols)
+    rows : np.ndarray
+        row of every point
+    cols : np.ndarray
+        column of every point
+    buffer : int
+        half size of the window in pixels - 0 for the pixel value, k for the mean of
+        the (2k + 1) x (2k + 1) pixels around the point
+    nodata : float
+        value ignored in the mean (NaN is always ignored)
+
+    Returns
+    -------
+    samples : np.ndarray
+        array of shape (points,) or (bands, points) - NaN for points outside the array
+        or with no valid pixel in their window
+    """
+
+    values = np.asarray(values)
+    single = values.ndim == 2
+    if single:
+        values = values[np.newaxis]
+    if values.ndim != 3:
+        raise ValueError(f"values must have shape (rows, cols) or (bands, rows, cols): {values.shape}")
+    if buffer < 0:
+        raise ValueError("buffer must be greater than or equal to zero!")
+
+    n_rows, n_cols = values.shape[1:]
+    rows = np.asarray(rows, dtype = np.intp)
+    cols = np.asarray(cols, dtype = np.intp)
+    inside = (rows >= 0) & (rows < n_rows) & (cols >= 0) & (cols < n_cols)
+
+    data = values.astype(np.float64)
+    if nodata is not None:
+        data[data == nodata] = np.nan
+
+    samples = np.full((values.shape[0], rows.size), np.nan)
+    r, c = rows[inside], cols[inside]
+    if buffer == 0:
+        samples[:, inside] = data[:, r, c]
+    else:
+        valid = ~np.isnan(data)
+        # summed area tables with a leading row and column of zeros
+        total = np.zeros((data.shape[0], n_rows + 1, n_cols + 1))
+        count = np.zeros_like(total)
+        total[:, 1:, 1:] = np.where(valid, data, 0).cumsum(axis = 1).cumsum(axis = 2)
+        count[:, 1:, 1:] = valid.cumsum(axis = 1).cumsum(axis = 2)
+
+        r0, r1 = np.clip(r - buffer, 0, n_rows), np.clip(r + buffer + 1, 0, n_rows)
+        c0, c1 = np.clip(c - buffer, 0, n_cols), np.clip(c + buffer + 1, 0, n_cols)
+        window_total = total[:, r1, c1] - total[:, r0, c1] - total[:, r1, c0] + total[:, r0, c0]
+        window_count = count[:, r1, c1] - count[:, r0, c1] - count[:, r1, c0] + count[:, r0, c0]
+        samples[:, inside] = np.divide(
+            window_total, window_count, out = np.full(window_total.shape, np.nan), where = window_count > 0
+        )
+
+    return samples[0] if single else samples
+
+
+
+def sample_raster(
+    path : str,
+    x : np.ndarray,
+    y : np.ndarray,
+    bands : Optional[Sequence[int]] = None,
+    buffer : int = 0,
+    tile : int = 512,
+    op : Callable[[np.ndarray], np.ndarray] = np.floor
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Sample a local raster (such as a GeoTIFF of soil properties with one band per depth)
+    at many points. Only the tiles holding points are read.
+
+    Parameters
+    ----------
+    path : str
+        path of the raster
+    x : np.ndarray
+        x coordinates of the points in the raster CRS
+    y : np.ndarray
+        y coordinates of the points in the raster CRS
+    bands : Sequence[int]
+        bands to read (1-based as in rasterio) - None for all bands
+    buffer : int
+        half size of the mean window in pixels (see ``sample_array``)
+    tile : int
+        size in pixels of the tiles read from the raster
+    op : Callable
+        rounding of the pixel indices (see ``points_to_pixels``)
+
+    Returns
+    -------
+    samples : np.ndarray
+        array of shape (bands, points)
+    """
+
+    import rasterio
+    from rasterio.windows import Window
+
+    with rasterio.open(path) as src:
+        bands = list(range(1, src.count + 1)) if bands is None else list(bands)
+        rows, cols = points_to_pixels(x, y, src.transform, op = op)
+        samples = np.full((len(bands), rows.size), np.nan)
+
+        inside = (rows >= 0) & (rows < src.height) & (cols >= 0) & (cols < src.width)
+        points = np.flatnonzero(inside)
+        tiles = (rows[points] // tile) * (src.width // tile + 1) + cols[points] // tile
+        order = np.argsort(tiles, kind = 'stable')
+        points, tiles = points[order], tiles[order]
+        starts = np.flatnonzero(np.r_[True, tiles[1:] != tiles[:-1]])
+
+        for group in np.split(points, starts[1:]):
+            if group.size == 0:
+                continue
+            row0 = max(int(rows[group].min()) - buffer, 0)
+            col0 = max(int(cols[group].min()) - buffer, 0)
+            row1 = min(int(rows[group].max()) + buffer + 1, src.height)
+            col1 = min(int(cols[group].max()) + buffer + 1, src.width)
+            window = src.read(bands, window = Window(col0, row0, col1 - col0, row1 - row0), masked = True)
+            window = np.ma.filled(window.astype(np.float64), np.nan)
+            samples[:, group] = sample_array(window, rows[group] - row0, cols[group] - col0, buffer = buffer)
+
+    return samples
@@ -0,0 +1,98 @@
+"""
+Array Versions Of The Deep Percolation Functions.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn
+import numpy as np
+from ..model.dtype import resolve_dtype, as_float_array
+from ..model.check import check_not_negative, check_between
+
+
+
+def inital_deep_perculation(
+    feild_capacity : np.ndarray,
+    soil_water : np.ndarray,
+    depth_soil : np.ndarray,
+    dtype : Any = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Description
+    -----------
+    Deep percolation (mm) of the transitional layer for all cells: the moisture above
+    field capacity percolates and the layer is left at field capacity.
+
+    Parameters
+    ----------
+    feild_capacity : np.ndarray
+        Field capacity of the transitional layer of soil (% valume)
+    soil_water : np.ndarray
+        Moisture of the transitional layer of soil in mm
+    depth_soil : np.ndarray
+        Depth of transitional layer soil in cm
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    inital_deep_perculation : np.ndarray
+        Deep penetration of the transitional layer of soil in mm
+    soil_water : np.ndarray
+        Moisture of the transitional layer of soil in mm
+    """
+
+    dtype = resolve_dtype(feild_capacity, soil_water, depth_soil, dtype = dtype)
+    soil_water = as_float_array(soil_water, dtype)
+
+    check_not_negative(soil_water, 'soil_water')
+    check_between(feild_capacity, 0, 100, 'feild_capacity')
+    check_not_negative(depth_soil, 'depth_soil')
+
+    feild_capacity = (as_float_array(feild_capacity, dtype) / 100) * as_float_array(depth_soil, dtype) * 10
+
+    above_fc = soil_water >= feild_capacity
+    initial_deep_perculation = np.where(above_fc, soil_water - feild_capacity, 0).astype(dtype, copy = False)
+    soil_water = np.where(above_fc, feild_capacity, soil_water).astype(dtype, copy = False)
+
+    return initial_deep_perculation, soil_water
+
+
+
+def partition_deep_percolation(
+    deep_percolation : np.ndarray,
+    geology_permeability : np.ndarray,
+    dtype : Any = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Description
+    -----------
+    Split deep percolation into the corrected deep percolation that recharges groundwater
+    (``DeepPerculatoin.correction_deep_perculation``) and the late runoff
+    (``DeepPerculatoin.late_runoff``).
+
+    Parameters
+    ----------
+    deep_percolation : np.ndarray
+        Deep percolation out of the transitional layer in mm
+    geology_permeability : np.ndarray
+        Permeability coefficient which is a number between 0 and 1
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    corrected_deep_perculation : np.ndarray
+        modified deep penetration in mm
+    later_runoff : np.ndarray
+        later_runoff in mm
+    """
+
+    dtype = resolve_dtype(deep_percolation, geology_permeability, dtype = dtype)
+    deep_percolation = as_float_array(deep_percolation, dtype)
+    geology_permeability = as_float_array(geology_permeability, dtype)
+
+    check_between(geology_permeability, 0, 1, 'geology_permeability')
+
+    later_runoff = (deep_percolation * geology_permeability).astype(dtype, copy = False)
+    corrected_deep_perculation = (deep_percolation * (1 - geology_permeability)).astype(dtype, copy = False)
+
+    return corrected_deep_perculation, later_runoff
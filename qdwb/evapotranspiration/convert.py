@@ -1,12 +1,47 @@
 
-from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Mapping
 import math
 import datetime
 from calendar import monthrange
+import numpy as np
+
+
+# Linear conversions between units: (source, target) -> (scale, offset), target = source * scale + offset
+UNIT_CONVERSIONS = {
+    ('celsius', 'kelvin'): (1.0, 273.15),
+    ('kelvin', 'celsius'): (1.0, -273.15),
+    ('degrees', 'radians'): (math.pi / 180.0, 0.0),
+    ('radians', 'degrees'): (180.0 / math.pi, 0.0),
+    ('MJ/m2/day', 'mm/day'): (0.408, 0.0),
+    ('mm/day', 'MJ/m2/day'): (1 / 0.408, 0.0),
+    ('J/m2', 'MJ/m2'): (1e-6, 0.0),
+    ('W/m2', 'MJ/m2/day'): (0.0864, 0.0),
+    ('W/m2', 'MJ/m2/hour'): (0.0036, 0.0),
+    ('m', 'mm'): (1000.0, 0.0),
+    ('mm', 'm'): (0.001, 0.0),
+    ('kg/m2/s', 'mm/day'): (86400.0, 0.0),
+    ('Pa', 'kPa'): (0.001, 0.0),
+    ('hPa', 'kPa'): (0.1, 0.0),
+    ('km/h', 'm/s'): (1 / 3.6, 0.0),
+    ('l/s', 'm3/day'): (86.4, 0.0),
+    ('m3/s', 'm3/day'): (86400.0, 0.0),
+    ('fraction', 'percent'): (100.0, 0.0),
+    ('percent', 'fraction'): (0.01, 0.0)
+}
+
+# Units of the forcing of the driver
+FORCING_UNITS = {
+    'precipitation': 'mm',
+    'tmin': 'celsius',
+    'tmax': 'celsius',
+    'tmean': 'celsius',
+    'reference_evapotranspiration': 'mm/day'
+}
 
 
 def convert_celsius2kelvin(
-    celsius : float
+    celsius : float,
+    out : Optional[np.ndarray] = None
 ) -> float:
     
     """
@@ -18,6 +53,8 @@ def convert_celsius2kelvin(
     ----------
     celsius : float
         Temperature in Degrees Celsius
+    out : np.ndarray
+        array written with the result (arrays only) - None for a new array
     
     Returns
     -------
@@ -25,12 +62,16 @@ def convert_celsius2kelvin(
         Temperature in Degrees Kelvin
     """
     
+    if out is not None:
+        return np.add(celsius, 273.15, out = out)
+
     return celsius + 273.15
 
 
 
 def convert_kelvin2celsius(
-    kelvin : float
+    kelvin : float,
+    out : Optional[np.ndarray] = None
 ) -> float:
     
     """
@@ -42,6 +83,8 @@ def convert_kelvin2celsius(
     ----------
     kelvin : float
         Temperature in Degrees Kelvin
+    out : np.ndarray
+        array written with the result (arrays only) - None for a new array
     
     Returns
     -------
@@ -49,12 +92,16 @@ def convert_kelvin2celsius(
         Temperature in Degrees Celsius
     """
     
+    if out is not None:
+        return np.subtract(kelvin, 273.15, out = out)
+
     return kelvin - 273.15
 
 
 
 def convert_degrees2radians(
-    degrees : float
+    degrees : float,
+    out : Optional[np.ndarray] = None
 ) -> float:
     
     """
@@ -66,6 +113,8 @@ def convert_degrees2radians(
     ----------
     degrees : float
         Value in Degrees
+    out : np.ndarray
+        array written with the result (arrays only) - None for a new array
     
     Returns
     -------
@@ -73,12 +122,16 @@ def convert_degrees2radians(
         Value in Radians
     """
     
+    if out is not None:
+        return np.multiply(degrees, math.pi / 180.0, out = out)
+
     return degrees * (math.pi / 180.0)
 
 
 
 def convert_radians2degrees(
-    radians : float
+    radians : float,
+    out : Optional[np.ndarray] = None
 ) -> float:
     
     """
@@ -90,6 +143,8 @@ def convert_radians2degrees(
     ----------
     radians : float
         Value in Radians
+    out : np.ndarray
+        array written with the result (arrays only) - None for a new array
     
     Returns
     -------
@@ -97,12 +152,16 @@ def convert_radians2degrees(
         Value in Degrees
     """
     
+    if out is not None:
+        return np.multiply(radians, 180.0 / math.pi, out = out)
+
     return radians * (180.0 / math.pi)
 
 
 
 def convert_radiation2evaporation(
-    radiation : float
+    radiation : float,
+    out : Optional[np.ndarray] = None
 ) -> float:
     
     """
@@ -115,6 +174,8 @@ def convert_radiation2evaporation(
     ----------
     radiation : float
         Radiation in MJ/m2/day
+    out : np.ndarray
+        array written with the result (arrays only) - None for a new array
     
     Returns
     -------
@@ -122,6 +183,9 @@ def convert_radiation2evaporation(
         Equivalent Evaporation in mm/day
     """
     
+    if out is not None:
+        return np.multiply(radiation, 0.408, out = out)
+
     return radiation * 0.408
 
 
@@ -185,4 +249,154 @@ def standard_date_to_Julian_day (
     sdtdate = sdtdate.timetuple()
     jdate = sdtdate.tm_yday
 
-    return(jdate)
\ No newline at end of file
+    return(jdate)
+
+
+def convert_units(
+    values : Any,
+    source : str,
+    target : str,
+    out : Optional[np.ndarray] = None,
+    dtype : Any = None
+) -> np.ndarray:
+
+    """
+    Description
+    -----------
+    Convert an array between two units of UNIT_CONVERSIONS in place or into a new array.
+
+    Parameters
+    ----------
+    values : Any
+        values in the source unit
+    source : str
+        unit of values
+    target : str
+        unit of the result
+    out : np.ndarray
+        array written with the result (may be values itself) - None for a new array
+    dtype : Any
+        dtype of a new result - None to follow values (at least float32)
+
+    Returns
+    -------
+    values : np.ndarray
+        values in the target unit
+    """
+
+    if source == target:
+        if out is None:
+            return np.asarray(values, dtype = dtype)
+        out[...] = values
+        return out
+    if (source, target) not in UNIT_CONVERSIONS:
+        raise ValueError(f"no conversion from {source} to {target}!")
+
+    scale, offset = UNIT_CONVERSIONS[(source, target)]
+    if out is None:
+        values = np.asarray(values)
+        dtype = np.result_type(values.dtype, np.float32) if dtype is None else dtype
+        out = np.empty(values.shape, dtype = dtype)
+    np.multiply(values, scale, out = out, casting = 'unsafe')
+    if offset:
+        np.add(out, offset, out = out)
+
+    return out
+
+
+
+def convert_forcing(
+    forcing : Mapping[str, Any],
+    units : Mapping[str, str],
+    targets : Mapping[str, str] = FORCING_UNITS,
+    inplace : bool = False
+) -> Dict[str, Any]:
+
+    """
+    Description
+    -----------
+    Convert forcing to the units of the model, such as ERA5 temperature in kelvin and
+    precipitation in m to celsius and mm.
+
+    Parameters
+    ----------
+    forcing : Mapping[str, Any]
+        named forcing arrays
+    units : Mapping[str, str]
+        unit of every forcing array - arrays without a unit are kept as they are
+    targets : Mapping[str, str]
+        unit expected by the model for every forcing name
+    inplace : bool
+        if True floating point arrays are overwritten instead of copied
+
+    Returns
+    -------
+    forcing : Dict[str, Any]
+        forcing in the units of targets
+    """
+
+    converted = dict(forcing)
+    for name, unit in units.items():
+        if name not in forcing or name not in targets:
+            continue
+        values = forcing[name]
+        out = values if inplace and isinstance(values, np.ndarray) and values.dtype.kind == 'f' else None
+        converted[name] = convert_units(values, unit, targets[name], out = out)
+
+    return converted
+
+
+
+def calendar(
+    time : Any
+) -> Dict[str, np.ndarray]:
+
+    """
+    Description
+    -----------
+    Calendar fields of a whole time axis at once - replaces ``standard_date_to_Julian_day``
+    and ``number_of_days_in_month`` called date by date.
+
+    Parameters
+    ----------
+    time : Any
+        datetime64 array (or ISO strings, such as the ones of ``standard_date_to_Julian_day``)
+
+    Returns
+    -------
+    fields : Dict[str, np.ndarray]
+        'year', 'month' (1 - 12), 'day' (day of the month), 'julian_day' (day of the year),
+        'days_in_month' and 'is_leap' with the shape of time
+    """
+
+    days = np.asarray(time, dtype = 'datetime64[D]')
+    months = days.astype('datetime64[M]')
+    years = days.astype('datetime64[Y]')
+
+    year = years.astype(np.int64) + 1970
+    is_leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+
+    return {
+        'year': year,
+        'month': (months - years).astype(np.int64) + 1,
+        'day': (days - months).astype(np.int64) + 1,
+        'julian_day': (days - years).astype(np.int64) + 1,
+        'days_in_month': ((months + 1).astype('datetime64[D]') - months).astype(np.int64),
+        'is_leap': is_leap
+    }
+
+
+
+def julian_day(
+    time : Any
+) -> np.ndarray:
+
+    """
+    Description
+    -----------
+    Day of the year of every date of a time axis (see ``calendar``).
+    """
+
+    days = np.asarray(time, dtype = 'datetime64[D]')
+
+    return (days - days.astype('datetime64[Y]')).astype(np.int64) + 1
@@ -0,0 +1,430 @@
+"""
+Hourly FAO-56 Penman-Monteith Streamed Into Daily Totals.
+
+Hourly forcing is given block by block (any number of hours of all cells) and
+every block is reduced to daily sums as soon as it is computed, so only one
+block and one running daily sum per cell are held in memory. The daily totals
+are given to the driver as the 'reference_evapotranspiration' forcing, which
+replaces the daily Hargreaves stage for that run.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Iterable, Iterator, Mapping
+import numpy as np
+from .asset import (
+    inverse_relative_distance_earth_sun,
+    solar_declination,
+    saturation_vapour_pressure_with_temperature,
+    slope_vapour_pressure_curve_with_maen_temperature,
+    pressure_with_altitudes,
+    psychrometric_constant_with_altitudes
+)
+from .convert import convert_degrees2radians, convert_celsius2kelvin, julian_day as day_of_year
+from .global_variable import *
+from ..model.dtype import resolve_dtype, as_float_array
+
+
+# Cn, Cd at day, Cd at night and G / Rn at day and at night - eq 53 FAO56 and ASCE-EWRI (2005) Table 1
+HOURLY_CONSTANTS = {
+    'fao56' : {'cn': 37, 'cd_day': 0.34, 'cd_night': 0.34, 'g_day': 0.1, 'g_night': 0.5},
+    'asce_short' : {'cn': 37, 'cd_day': 0.24, 'cd_night': 0.96, 'g_day': 0.1, 'g_night': 0.5},
+    'asce_tall' : {'cn': 66, 'cd_day': 0.25, 'cd_night': 1.7, 'g_day': 0.04, 'g_night': 0.2}
+}
+
+# Albedo of the reference crop
+ALBEDO = 0.23
+
+# Bounds of Rs / Rso in the cloudiness function - ASCE-EWRI (2005) eq 45, so 0.05 <= fcd <= 1
+RADIATION_RATIO_BOUNDS = (0.3, 1.0)
+
+
+
+def cloudiness_function(
+    radiation_ratio : np.ndarray
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Cloudiness function fcd of the net longwave radiation from Rs / Rso - eq 39 FAO56 with
+    the ratio bounded to RADIATION_RATIO_BOUNDS (ASCE-EWRI 2005 eq 45)
+    """
+
+    return 1.35 * np.clip(radiation_ratio, *RADIATION_RATIO_BOUNDS) - 0.35
+
+
+
+def hourly_extraterrestrial_radiation(
+    latitude : np.ndarray,
+    longitude : np.ndarray,
+    julian_day : np.ndarray,
+    hour : np.ndarray,
+    utc_offset : float = 0,
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Extraterrestrial radiation of one hour - eq 28 and 31 to 33 FAO56
+
+    Parameters
+    ----------
+    latitude : np.ndarray
+        latitude in degrees
+    longitude : np.ndarray
+        longitude in degrees east of Greenwich
+    julian_day : np.ndarray
+        day of the year
+    hour : np.ndarray
+        start of the hour in local standard time (0 - 23)
+    utc_offset : float
+        offset of the local standard time from UTC in hours (the time zone)
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    ra : np.ndarray
+        extraterrestrial radiation in MJ / m**2 / hour
+    """
+
+    dtype = resolve_dtype(latitude, longitude, dtype = dtype)
+    phi = convert_degrees2radians(as_float_array(latitude, dtype))
+    longitude = as_float_array(longitude, dtype)
+    julian_day = np.asarray(julian_day)
+
+    dr = inverse_relative_distance_earth_sun(julian_date = julian_day)
+    delta = solar_declination(julian_date = julian_day)
+    b = 2 * np.pi * (julian_day - 81) / 364
+    sc = 0.1645 * np.sin(2 * b) - 0.1255 * np.cos(b) - 0.025 * np.sin(b)
+
+    # Lz - Lm of eq 31 with longitudes west of Greenwich
+    t = np.asarray(hour) + 0.5
+    omega = np.pi / 12 * ((t + 0.06667 * (longitude - 15 * utc_offset) + sc) - 12)
+    omega_s = np.arccos(np.clip(-np.tan(phi) * np.tan(delta), -1, 1))
+    omega_1 = np.clip(omega - np.pi / 24, -omega_s, omega_s)
+    omega_2 = np.clip(omega + np.pi / 24, -omega_s, omega_s)
+
+    ra = 12 * 60 / np.pi * SOLAR_CONSTANT * dr * (
+        (omega_2 - omega_1) * np.sin(phi) * np.sin(delta) +
+        np.cos(phi) * np.cos(delta) * (np.sin(omega_2) - np.sin(omega_1))
+    )
+
+    return np.maximum(ra, 0).astype(dtype, copy = False)
+
+
+
+def penman_monteith_hourly(
+    temperature : np.ndarray,
+    wind_speed : np.ndarray,
+    actual_vapour_pressure : np.ndarray,
+    net_radiation : np.ndarray,
+    soil_heat_flux : np.ndarray,
+    psychrometric_constant : np.ndarray,
+    is_day : np.ndarray,
+    constants : str = 'fao56',
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Hourly reference evapotranspiration - eq 53 FAO56 with the Cn / Cd constants of ``constants``
+
+    Parameters
+    ----------
+    temperature : np.ndarray
+        mean hourly air temperature in celsius
+    wind_speed : np.ndarray
+        mean hourly wind speed at 2 m in m / s
+    actual_vapour_pressure : np.ndarray
+        mean hourly actual vapour pressure in kilo pascal
+    net_radiation : np.ndarray
+        net radiation at the crop surface in MJ / m**2 / hour
+    soil_heat_flux : np.ndarray
+        soil heat flux density in MJ / m**2 / hour
+    psychrometric_constant : np.ndarray
+        psychrometric constant in kilo pascal per celsius
+    is_day : np.ndarray
+        True for the hours with the sun above the horizon
+    constants : str
+        key of HOURLY_CONSTANTS
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    ETo : np.ndarray
+        reference evapotranspiration in mm / hour
+    """
+
+    c = HOURLY_CONSTANTS[constants]
+    dtype = resolve_dtype(temperature, wind_speed, actual_vapour_pressure, net_radiation, dtype = dtype)
+    temperature = as_float_array(temperature, dtype)
+    u2 = as_float_array(wind_speed, dtype)
+    gamma = as_float_array(psychrometric_constant, dtype)
+
+    delta = slope_vapour_pressure_curve_with_maen_temperature(tmean = temperature)
+    es = saturation_vapour_pressure_with_temperature(temperature = temperature)
+    cd = np.where(is_day, c['cd_day'], c['cd_night'])
+
+    numerator = (0.408 * delta * (as_float_array(net_radiation, dtype) - as_float_array(soil_heat_flux, dtype)) +
+                 gamma * c['cn'] / (temperature + 273) * u2 * (es - as_float_array(actual_vapour_pressure, dtype)))
+
+    return (numerator / (delta + gamma * (1 + cd * u2))).astype(dtype, copy = False)
+
+
+
+class HourlyReferenceET :
+
+    def __init__(self,
+        latitude : np.ndarray,
+        longitude : np.ndarray,
+        altitude : np.ndarray = 0,
+        utc_offset : float = 0,
+        constants : str = 'fao56',
+        night_radiation_ratio : float = 0.8,
+        dtype : Any = None
+    ):
+        """
+        Description
+        -----------
+        Hourly FAO-56 Penman-Monteith for all cells, reduced to daily totals on the fly.
+
+        Parameters
+        ----------
+        latitude : np.ndarray
+            latitude of the cells in degrees
+        longitude : np.ndarray
+            longitude of the cells in degrees east of Greenwich
+        altitude : np.ndarray
+            elevation of the cells in meter
+        utc_offset : float
+            time zone of the time stamps in hours
+        constants : str
+            'fao56', 'asce_short' or 'asce_tall' (see HOURLY_CONSTANTS)
+        night_radiation_ratio : float
+            Rs / Rso used at night before the first daylight hour of a cell (eq 39 FAO56 -
+            afterwards the ratio of the last daylight hour is carried)
+        dtype : Any
+            dtype of the results - None to follow the inputs
+        """
+
+        if constants not in HOURLY_CONSTANTS:
+            raise ValueError(f"constants must be one of {tuple(HOURLY_CONSTANTS)}: {constants}")
+
+        self.dtype = resolve_dtype(latitude, longitude, dtype = dtype)
+        self.latitude = as_float_array(latitude, self.dtype)
+        self.longitude = as_float_array(longitude, self.dtype)
+        self.altitude = as_float_array(altitude, self.dtype)
+        self.utc_offset = utc_offset
+        self.constants = constants
+
+        self.gamma = psychrometric_constant_with_altitudes(pressure = pressure_with_altitudes(altitude = self.altitude))
+        shape = np.broadcast_shapes(np.shape(self.latitude), np.shape(self.longitude), np.shape(self.altitude))
+        self.radiation_ratio = np.full(shape, np.clip(night_radiation_ratio, *RADIATION_RATIO_BOUNDS), dtype = self.dtype)
+
+        self._day = None
+        self._total = None
+        self._hours = 0
+
+
+    def hourly(
+        self,
+        time : np.ndarray,
+        forcing : Mapping[str, np.ndarray]
+    ) -> np.ndarray:
+        """
+        Description
+        -----------
+        Hourly ETo of a block of hours. Updates the Rs / Rso ratio carried to the night.
+
+        Parameters
+        ----------
+        time : np.ndarray
+            start of every hour in local standard time, datetime64 of shape (h,)
+        forcing : Mapping[str, np.ndarray]
+            arrays of shape (h, cells): 'temperature' (celsius), 'wind_speed' (m / s at 2 m),
+            'solar_radiation' (MJ / m**2 / hour) and either 'actual_vapour_pressure' (kilo pascal)
+            or 'relative_humidity' (percent)
+
+        Returns
+        -------
+        ETo : np.ndarray
+            reference evapotranspiration in mm / hour, shape (h, cells)
+        """
+
+        time = np.asarray(time, dtype = 'datetime64[h]')
+        days = time.astype('datetime64[D]')
+        julian_day = day_of_year(days)
+        hour = (time - days).astype(int)
+
+        temperature = as_float_array(forcing['temperature'], self.dtype)
+        es = saturation_vapour_pressure_with_temperature(temperature = temperature)
+        if 'actual_vapour_pressure' in forcing:
+            ea = as_float_array(forcing['actual_vapour_pressure'], self.dtype)
+        else:
+            ea = es * as_float_array(forcing['relative_humidity'], self.dtype) / 100
+
+        ra = hourly_extraterrestrial_radiation(
+            latitude = self.latitude,
+            longitude = self.longitude,
+            julian_day = julian_day[:, np.newaxis],
+            hour = hour[:, np.newaxis],
+            utc_offset = self.utc_offset,
+            dtype = self.dtype
+        )
+        rs = as_float_array(forcing['solar_radiation'], self.dtype)
+        rso = (0.75 + 2e-5 * self.altitude) * ra
+        is_day = rso > 0
+
+        # Rs / Rso of the daylight hours, carried through the night
+        ratio = np.where(is_day, np.clip(np.divide(rs, rso, out = np.ones_like(rs), where = is_day), *RADIATION_RATIO_BOUNDS), np.nan)
+        ratio = _carry_forward(ratio, self.radiation_ratio)
+        self.radiation_ratio = ratio[-1]
+
+        rnl = (STEFAN_BOLTZMANN_CONSTANT / 24 * convert_celsius2kelvin(temperature) ** 4 *
+               (0.34 - 0.14 * np.sqrt(np.maximum(ea, 0))) * cloudiness_function(ratio))
+        rn = (1 - ALBEDO) * rs - rnl
+
+        c = HOURLY_CONSTANTS[self.constants]
+        g = np.where(is_day, c['g_day'], c['g_night']) * rn
+
+        return penman_monteith_hourly(
+            temperature = temperature,
+            wind_speed = forcing['wind_speed'],
+            actual_vapour_pressure = ea,
+            net_radiation = rn,
+            soil_heat_flux = g,
+            psychrometric_constant = self.gamma,
+            is_day = is_day,
+            constants = self.constants,
+            dtype = self.dtype
+        )
+
+
+    def update(
+        self,
+        time : np.ndarray,
+        forcing : Mapping[str, np.ndarray]
+    ) -> List[Tuple[np.datetime64, np.ndarray, int]]:
+        """
+        Description
+        -----------
+        Add a block of hours (in time order) and return the days completed by it.
+
+        Parameters
+        ----------
+        time : np.ndarray
+            start of every hour, datetime64 of shape (h,)
+        forcing : Mapping[str, np.ndarray]
+            hourly forcing of the block as in ``hourly``
+
+        Returns
+        -------
+        days : List[Tuple[np.datetime64, np.ndarray, int]]
+            (day, daily ETo in mm / day of every cell, number of hours summed) of each completed day
+        """
+
+        time = np.asarray(time, dtype = 'datetime64[h]')
+        if time.size == 0:
+            return []
+        if np.any(np.diff(time) <= np.timedelta64(0, 'h')):
+            raise ValueError("hours of a block must be in increasing order!")
+
+        eto = self.hourly(time, forcing)
+        days = time.astype('datetime64[D]')
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        sums = np.add.reduceat(eto, starts, axis = 0)
+        counts = np.diff(np.r_[starts, len(days)])
+
+        completed = []
+        for day, total, count in zip(days[starts], sums, counts):
+            if self._day is not None and day < self._day:
+                raise ValueError("blocks must be given in time order!")
+            if self._day is not None and day != self._day:
+                completed.append((self._day, self._total, self._hours))
+                self._day = None
+            if self._day is None:
+                self._day, self._total, self._hours = day, total, int(count)
+            else:
+                self._total = self._total + total
+                self._hours += int(count)
+
+        return completed
+
+
+    def flush(self) -> List[Tuple[np.datetime64, np.ndarray, int]]:
+        """
+        Description
+        -----------
+        Return the last (possibly incomplete) day.
+        """
+
+        if self._day is None:
+            return []
+
+        last = [(self._day, self._total, self._hours)]
+        self._day = None
+
+        return last
+
+
+
+def daily_reference_et(
+    blocks : Iterable[Tuple[np.ndarray, Mapping[str, np.ndarray]]],
+    latitude : np.ndarray,
+    longitude : np.ndarray,
+    altitude : np.ndarray = 0,
+    utc_offset : float = 0,
+    constants : str = 'fao56',
+    dtype : Any = None
+) -> Iterator[Tuple[np.datetime64, np.ndarray]]:
+    """
+    Description
+    -----------
+    Daily reference evapotranspiration of every cell from a stream of hourly blocks.
+
+    Parameters
+    ----------
+    blocks : Iterable[Tuple[np.ndarray, Mapping[str, np.ndarray]]]
+        (time, forcing) of consecutive blocks of hours as in ``HourlyReferenceET.update``
+    latitude, longitude, altitude, utc_offset, constants, dtype
+        as in ``HourlyReferenceET``
+
+    Returns
+    -------
+    days : Iterator[Tuple[np.datetime64, np.ndarray]]
+        (day, ETo in mm / day) - use the values as the 'reference_evapotranspiration' forcing
+        of the driver to run the day with hourly ETo
+    """
+
+    eto = HourlyReferenceET(
+        latitude = latitude,
+        longitude = longitude,
+        altitude = altitude,
+        utc_offset = utc_offset,
+        constants = constants,
+        dtype = dtype
+    )
+    for time, forcing in blocks:
+        for day, total, _ in eto.update(time, forcing):
+            yield day, total
+    for day, total, _ in eto.flush():
+        yield day, total
+
+
+
+def _carry_forward(
+    values : np.ndarray,
+    initial : np.ndarray
+) -> np.ndarray:
+
+    """
+    Description
+    -----------
+    Replace NaN along the first axis by the last valid value (initial before the first one).
+    """
+
+    values = np.concatenate([np.broadcast_to(initial, values.shape[1:])[np.newaxis], values])
+    index = np.where(np.isnan(values), 0, np.arange(values.shape[0]).reshape((-1,) + (1,) * (values.ndim - 1)))
+    np.maximum.accumulate(index, axis = 0, out = index)
+
+    return np.take_along_axis(values, index, axis = 0)[1:]
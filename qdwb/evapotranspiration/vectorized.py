@@ -0,0 +1,552 @@
+"""
+Array Versions Of The Evapotranspiration Functions.
+
+The vapour pressure terms (es, slope and psychrometric constant) and the
+actual vapour pressure are computed once per day for all cells and feed the
+free water surface evaporation, which is evaluated for every lake, reservoir
+and water cell at once. The reference evapotranspiration (Hargreaves) does not
+use them. The actual
+evapotranspiration of the QDWB approach carries the available evaporable
+water of every cell from one day to the next.
+
+Where cells (or stations) have different data, a MethodDispatch picks the
+best vapour pressure or radiation method of every cell once, and every day
+each method is evaluated in bulk on its own cells.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Mapping, Callable, Iterable
+import numpy as np
+from .asset import (
+    saturation_vapour_pressure_with_temperature,
+    slope_vapour_pressure_curve_with_maen_temperature,
+    pressure_with_altitudes,
+    psychrometric_constant_with_altitudes
+)
+from ..model.dtype import resolve_dtype, as_float_array
+
+
+# Methods of EvaporationFromFreeWaterSurface and the inputs each one needs
+FREE_WATER_METHODS = {
+    'Jensen' : ('solar_radiation', 'tmean'),
+    'Stuart' : ('solar_radiation', 'tmean'),
+    'Makkink' : ('solar_radiation', 'slope_vapour_pressure_curve', 'psychrometric_constant', 'latent_heat_of_vaporization'),
+    'Harbeck' : ('water_area', 'wind_speed', 'saturation_vapour_pressure', 'actual_vapour_pressure'),
+    'Shuttleworth' : ('water_area', 'wind_speed', 'saturation_vapour_pressure', 'actual_vapour_pressure')
+}
+
+# Hargreaves radiation adjustment coefficient (interior locations) - eq 50 FAO56
+KRS = 0.16
+
+# Coefficient of ventilated (Asmann type) psychrometers - eq 16 FAO56
+A_PSY = 0.000662
+
+# Methods of ActualVapourPressure in the order of preference of FAO56 and the inputs each one
+# needs - 'T_min' takes the dewpoint at the minimum temperature (eq 48) where there is no humidity data
+VAPOUR_PRESSURE_METHODS = {
+    'dew' : ('tdew',),
+    'T_wet_T_dry' : ('twet', 'tdry', 'a_psy', 'altitude'),
+    'RH_and_T_max_min' : ('tmax', 'tmin', 'RH_max', 'RH_min'),
+    'RH_max_and_T_min' : ('tmin', 'RH_max'),
+    'RH_mean_T_max_min' : ('tmax', 'tmin', 'RH_mean'),
+    'T_min' : ('tmin',)
+}
+
+# Methods of SolarOrShortwaveRadiation in the order of preference and the inputs each one needs
+# (radiation in MJ/m**2/day, sunshine durations in hours)
+RADIATION_METHODS = {
+    'measured' : ('measured_solar_radiation',),
+    'Angstrom' : ('extraterrestrial_radiation', 'sunshine_duration', 'maximum_sunshine_duration'),
+    'Hargreaves' : ('extraterrestrial_radiation', 'tmax', 'tmin', 'krs')
+}
+
+# Inputs computed by the model (or with a default) - available to every cell
+DERIVED_INPUTS = ('extraterrestrial_radiation', 'maximum_sunshine_duration', 'altitude', 'a_psy', 'krs')
+
+
+
+def vapour_pressure_terms(
+    tmin : np.ndarray,
+    tmax : np.ndarray,
+    tmean : np.ndarray,
+    altitude : np.ndarray = 0.0,
+    dtype : Any = None
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Saturation vapour pressure, slope of the vapour pressure curve and psychrometric
+    constant of all cells - eq 7, 8, 11, 12 and 13 FAO56.
+
+    Parameters
+    ----------
+    tmin, tmax, tmean : np.ndarray
+        Minimum, Maximum and Mean Daily Temperature [°C]
+    altitude : np.ndarray
+        Height in meter
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    terms : Dict[str, np.ndarray]
+        'saturation_vapour_pressure' [kPa], 'slope_vapour_pressure_curve' and
+        'psychrometric_constant' [kPa °C-1]
+    """
+
+    dtype = resolve_dtype(tmin, tmax, tmean, dtype = dtype)
+    tmin, tmax, tmean = (as_float_array(t, dtype) for t in (tmin, tmax, tmean))
+
+    es = (saturation_vapour_pressure_with_temperature(temperature = tmax) +
+          saturation_vapour_pressure_with_temperature(temperature = tmin)) / 2
+    gamma = psychrometric_constant_with_altitudes(pressure = pressure_with_altitudes(altitude = as_float_array(altitude, dtype)))
+
+    return {
+        'saturation_vapour_pressure': es.astype(dtype, copy = False),
+        'slope_vapour_pressure_curve': np.asarray(slope_vapour_pressure_curve_with_maen_temperature(tmean = tmean)).astype(dtype, copy = False),
+        'psychrometric_constant': np.broadcast_to(gamma, es.shape).astype(dtype)
+    }
+
+
+
+def free_water_evaporation(
+    method : str,
+    solar_radiation : Optional[np.ndarray] = None,
+    tmean : Optional[np.ndarray] = None,
+    slope_vapour_pressure_curve : Optional[np.ndarray] = None,
+    psychrometric_constant : Optional[np.ndarray] = None,
+    latent_heat_of_vaporization : Optional[np.ndarray] = None,
+    water_area : Optional[np.ndarray] = None,
+    wind_speed : Optional[np.ndarray] = None,
+    saturation_vapour_pressure : Optional[np.ndarray] = None,
+    actual_vapour_pressure : Optional[np.ndarray] = None,
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Evaporation from the free surface of water of all water bodies with one method of
+    ``EvaporationFromFreeWaterSurface`` - eq 4, 5 (Harbeck, Shuttleworth), 7 (Makkink)
+    and 8, 9 (Jensen, Stuart). Only the inputs of the method are needed.
+
+    Parameters
+    ----------
+    method : str
+        'Jensen', 'Stuart', 'Makkink', 'Harbeck' or 'Shuttleworth'
+    solar_radiation : np.ndarray
+        Solar or shortwave radiation in MJ/m**2/day
+    tmean : np.ndarray
+        Mean Daily Temperature [°C]
+    slope_vapour_pressure_curve : np.ndarray
+        Slope Vapour Pressure Curve [kPa °C-1]
+    psychrometric_constant : np.ndarray
+        Psychrometric Constant [kPa °C-1]
+    latent_heat_of_vaporization : np.ndarray
+        latent heat of vaporization in J/kg
+    water_area : np.ndarray
+        water area of the lake or reservoir in meter**2
+    wind_speed : np.ndarray
+        Wind speed at 2m above ground surface in meter / second
+    saturation_vapour_pressure, actual_vapour_pressure : np.ndarray
+        es and ea [kPa]
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    E_free_water : np.ndarray
+        Evaporation from the free surface of water in milimeter/day
+    """
+
+    if method not in FREE_WATER_METHODS:
+        raise ValueError(f"method must be one of {', '.join(FREE_WATER_METHODS)}: {method}")
+
+    given = {
+        'solar_radiation': solar_radiation,
+        'tmean': tmean,
+        'slope_vapour_pressure_curve': slope_vapour_pressure_curve,
+        'psychrometric_constant': psychrometric_constant,
+        'latent_heat_of_vaporization': latent_heat_of_vaporization,
+        'water_area': water_area,
+        'wind_speed': wind_speed,
+        'saturation_vapour_pressure': saturation_vapour_pressure,
+        'actual_vapour_pressure': actual_vapour_pressure
+    }
+    missing = [name for name in FREE_WATER_METHODS[method] if given[name] is None]
+    if missing:
+        raise ValueError(f"{method} method needs {', '.join(missing)}!")
+
+    inputs = [given[name] for name in FREE_WATER_METHODS[method]]
+    dtype = resolve_dtype(*inputs, dtype = dtype)
+    values = {name: as_float_array(given[name], dtype) for name in FREE_WATER_METHODS[method]}
+
+    if method == 'Jensen':
+        evaporation = 0.03523 * values['solar_radiation'] * ((0.014 * values['tmean']) - 0.37)
+    elif method == 'Stuart':
+        evaporation = 0.03495 * values['solar_radiation'] * ((0.0082 * values['tmean']) - 0.19)
+    elif method == 'Makkink':
+        delta = values['slope_vapour_pressure_curve']
+        evaporation = 52.6 * (delta / (delta + values['psychrometric_constant'])) * (
+            values['solar_radiation'] / values['latent_heat_of_vaporization']) - 0.12
+    else:
+        coefficient, exponent = (2.909, -0.05) if method == 'Harbeck' else (3.623, -0.066)
+        evaporation = coefficient * values['water_area'] ** exponent * values['wind_speed'] * (
+            values['saturation_vapour_pressure'] - values['actual_vapour_pressure'])
+
+    return np.asarray(evaporation).astype(dtype, copy = False)
+
+
+
+def actual_evapotranspiration(
+    reference_evapotranspiration : np.ndarray,
+    crop_coefficient : np.ndarray,
+    crop_cover : np.ndarray,
+    infiltration : np.ndarray,
+    available_evaporable_water : np.ndarray,
+    swc_transpiration_layer : np.ndarray,
+    fc_transpiration_layer : np.ndarray,
+    pwp_transpiration_layer : np.ndarray,
+    z_transpiration_layer : np.ndarray,
+    fc_evaporation_layer : np.ndarray,
+    pwp_evaporation_layer : np.ndarray,
+    z_evaporation_layer : np.ndarray,
+    swc_evaporation_layer : Optional[np.ndarray] = None,
+    out : Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+    dtype : Any = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Description
+    -----------
+    Covered area evapotranspiration and non covered area evaporation of all cells with the
+    QDWB approach, and the available evaporable water carried to the next day - eq 2 to 5 in
+    Real.docx (``ActualEvapotranspiration.et_covered``, ``e_noncovered`` and the helpers of
+    ``asset.py``).
+
+        f = (SW[t-1] - PWP) / (FC - PWP)            clipped to 0 - 1
+        Ke = AEW[t-1] / AW                          clipped to 0 - 1
+        ET_covered = f Kc cc ET0
+        E_noncovered = (1 - cc) ET0 Ke
+        AEW[t] = 0.5 infiltration + AEW[t-1] - E_noncovered      clipped to 0 - AW
+
+    Parameters
+    ----------
+    reference_evapotranspiration : np.ndarray
+        reference crop evapotranspiration in mm
+    crop_coefficient, crop_cover : np.ndarray
+        crop coefficient and crop cover in No units
+    infiltration : np.ndarray
+        infiltration of the day in mm
+    available_evaporable_water : np.ndarray
+        available evaporable water in previous step in mm - NaN where it is not known yet
+        (the first day), which starts it from swc_evaporation_layer
+    swc_transpiration_layer : np.ndarray
+        soil wetness of the transpiration layer in previous step in mm
+    fc_transpiration_layer, pwp_transpiration_layer : np.ndarray
+        field capacity and permanent wilting point wet in percent(volumetric)
+    z_transpiration_layer : np.ndarray
+        depth of the transpiration layer in mm
+    fc_evaporation_layer, pwp_evaporation_layer : np.ndarray
+        field capacity and permanent wilting point wet of the evaporation layer in percent(volumetric)
+    z_evaporation_layer : np.ndarray
+        depth of the evaporation layer in mm
+    swc_evaporation_layer : np.ndarray
+        soil wetness of the evaporation layer in previous step in mm - start of the NaN cells
+        of available_evaporable_water (full if not given)
+    out : Tuple[np.ndarray, np.ndarray, np.ndarray]
+        arrays written with the covered ET, the non covered E and the available evaporable
+        water - None for new arrays
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    evapotranspiration_covered_areas : np.ndarray
+        evapotranspiration covered areas in mm
+    evaporation_noncovered_areas : np.ndarray
+        evaporation noncovered areas in mm
+    available_evaporable_water : np.ndarray
+        available evaporable water at the end of the day in mm
+    """
+
+    dtype = resolve_dtype(reference_evapotranspiration, infiltration, available_evaporable_water, dtype = dtype)
+    eto = as_float_array(reference_evapotranspiration, dtype)
+    cc = as_float_array(crop_cover, dtype)
+    aew = as_float_array(available_evaporable_water, dtype)
+    shape = np.broadcast_shapes(eto.shape, cc.shape, aew.shape, np.shape(swc_transpiration_layer), np.shape(infiltration))
+    if out is None:
+        out = tuple(np.empty(shape, dtype = dtype) for _ in range(3))
+    et_covered, e_noncovered, aew_next = out
+
+    # f - moisture reduction function of the transpiration layer
+    z_t = as_float_array(z_transpiration_layer, dtype)
+    pwp_t = as_float_array(pwp_transpiration_layer, dtype) / 100 * z_t
+    fc_t = as_float_array(fc_transpiration_layer, dtype) / 100 * z_t
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        np.divide(as_float_array(swc_transpiration_layer, dtype) - pwp_t, fc_t - pwp_t, out = et_covered)
+    np.nan_to_num(et_covered, copy = False, nan = 0, posinf = 0, neginf = 0)
+    np.clip(et_covered, 0, 1, out = et_covered)
+    np.multiply(et_covered, as_float_array(crop_coefficient, dtype) * cc * eto, out = et_covered)
+
+    # Ke - ratio of the available evaporable water to the available water of the evaporation layer
+    z_e = as_float_array(z_evaporation_layer, dtype)
+    pwp_e = as_float_array(pwp_evaporation_layer, dtype) / 100 * z_e
+    aw = as_float_array(fc_evaporation_layer, dtype) / 100 * z_e - pwp_e
+    unknown = np.isnan(aew)
+    if np.any(unknown):
+        start = aw if swc_evaporation_layer is None else as_float_array(swc_evaporation_layer, dtype) - pwp_e
+        aew = np.where(unknown, start, aew)
+    aew = np.clip(aew, 0, aw)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        np.divide(aew, aw, out = e_noncovered)
+    np.nan_to_num(e_noncovered, copy = False, nan = 0, posinf = 0, neginf = 0)
+    np.clip(e_noncovered, 0, 1, out = e_noncovered)
+    np.multiply(e_noncovered, (1 - cc) * eto, out = e_noncovered)
+
+    # available evaporable water at the end of the day
+    np.subtract(0.5 * as_float_array(infiltration, dtype) + aew, e_noncovered, out = aew_next)
+    np.clip(aew_next, 0, aw, out = aew_next)
+
+    return et_covered, e_noncovered, aew_next
+
+
+
+def vapour_pressure_by_method(
+    method : str,
+    values : Mapping[str, np.ndarray],
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Actual vapour pressure with one method of ``ActualVapourPressure`` - eq 14 to 19 and 48 FAO56.
+
+    Parameters
+    ----------
+    method : str
+        a key of VAPOUR_PRESSURE_METHODS
+    values : Mapping[str, np.ndarray]
+        inputs of the method (temperatures in celsius, relative humidities in percent)
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    Actual Vapour Pressure : np.ndarray
+        Actual Vapour Pressure in Kilo pascal
+    """
+
+    if method not in VAPOUR_PRESSURE_METHODS:
+        raise ValueError(f"method must be one of {', '.join(VAPOUR_PRESSURE_METHODS)}: {method}")
+
+    names = VAPOUR_PRESSURE_METHODS[method]
+    dtype = resolve_dtype(*(values[name] for name in names), dtype = dtype)
+    v = {name: as_float_array(values[name], dtype) for name in names}
+    es = saturation_vapour_pressure_with_temperature
+
+    if method == 'dew':
+        ea = es(temperature = v['tdew'])
+    elif method == 'T_wet_T_dry':
+        ea = es(temperature = v['twet']) - v['a_psy'] * pressure_with_altitudes(altitude = v['altitude']) * (v['tdry'] - v['twet'])
+    elif method == 'RH_and_T_max_min':
+        ea = (es(temperature = v['tmin']) * v['RH_max'] / 100 + es(temperature = v['tmax']) * v['RH_min'] / 100) / 2
+    elif method == 'RH_max_and_T_min':
+        ea = es(temperature = v['tmin']) * v['RH_max'] / 100
+    elif method == 'RH_mean_T_max_min':
+        ea = (es(temperature = v['tmax']) + es(temperature = v['tmin'])) / 2 * v['RH_mean'] / 100
+    else:
+        ea = es(temperature = v['tmin'])
+
+    return np.asarray(ea).astype(dtype, copy = False)
+
+
+
+def radiation_by_method(
+    method : str,
+    values : Mapping[str, np.ndarray],
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Solar or shortwave radiation with one method of ``SolarOrShortwaveRadiation`` - eq 35 and 50 FAO56,
+    or the measured radiation.
+
+    Parameters
+    ----------
+    method : str
+        a key of RADIATION_METHODS
+    values : Mapping[str, np.ndarray]
+        inputs of the method (extraterrestrial radiation in MJ/m**2/day, sunshine durations in hours -
+        daily values, or the monthly average sunshine duration in hour per day)
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    Solar or shortwave radiation : np.ndarray
+        Solar or shortwave radiation in MJ/m**2/day
+    """
+
+    if method not in RADIATION_METHODS:
+        raise ValueError(f"method must be one of {', '.join(RADIATION_METHODS)}: {method}")
+
+    names = RADIATION_METHODS[method]
+    dtype = resolve_dtype(*(values[name] for name in names), dtype = dtype)
+    v = {name: as_float_array(values[name], dtype) for name in names}
+
+    if method == 'measured':
+        rs = v['measured_solar_radiation']
+    elif method == 'Angstrom':
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            relative = np.where(v['maximum_sunshine_duration'] > 0, v['sunshine_duration'] / v['maximum_sunshine_duration'], 0)
+        rs = (0.25 + 0.5 * relative) * v['extraterrestrial_radiation']
+    else:
+        rs = v['krs'] * np.sqrt(np.maximum(v['tmax'] - v['tmin'], 0)) * v['extraterrestrial_radiation']
+
+    return np.asarray(rs).astype(dtype, copy = False)
+
+
+
+class MethodDispatch :
+
+    def __init__(self,
+        methods : Mapping[str, Tuple[str, ...]],
+        available : Mapping[str, Any],
+        n_cells : int,
+        derived : Iterable[str] = DERIVED_INPUTS
+    ):
+        """
+        Description
+        -----------
+        First method of every cell (in the order of methods) whose inputs are all available.
+        The masks are built once; every day each method is evaluated on its own cells.
+
+        Parameters
+        ----------
+        methods : Mapping[str, Tuple[str, ...]]
+            methods in the order of preference and their inputs, such as VAPOUR_PRESSURE_METHODS
+        available : Mapping[str, Any]
+            True / False, or a boolean array per cell, for every input with data
+        n_cells : int
+            number of cells
+        derived : Iterable[str]
+            inputs available to every cell (computed by the model or with a default)
+        """
+
+        available = {**dict.fromkeys(derived, True), **available}
+        self.methods = dict(methods)
+        self.n_cells = n_cells
+        self.cells = {}
+        self.method = np.full(n_cells, -1, dtype = np.int8)
+
+        remaining = np.ones(n_cells, dtype = bool)
+        for code, (method, inputs) in enumerate(self.methods.items()):
+            usable = remaining.copy()
+            for name in inputs:
+                usable &= np.broadcast_to(np.asarray(available.get(name, False), dtype = bool), (n_cells,))
+            if usable.any():
+                self.cells[method] = np.flatnonzero(usable)
+                self.method[usable] = code
+                remaining &= ~usable
+
+        if remaining.any():
+            raise ValueError(f"{int(remaining.sum())} cells have no data for any of the methods {', '.join(self.methods)}!")
+
+        self.inputs = tuple(dict.fromkeys(name for method in self.cells for name in self.methods[method]))
+
+
+    @classmethod
+    def from_data(
+        cls,
+        methods : Mapping[str, Tuple[str, ...]],
+        data : Mapping[str, Any],
+        n_cells : Optional[int] = None,
+        derived : Iterable[str] = DERIVED_INPUTS
+    ) -> 'MethodDispatch':
+        """
+        Description
+        -----------
+        Dispatch from forcing and parameters: an input is available for a cell when all its
+        values of the cell (along every leading axis, such as days) are finite.
+
+        Parameters
+        ----------
+        methods : Mapping[str, Tuple[str, ...]]
+            methods in the order of preference and their inputs
+        data : Mapping[str, Any]
+            forcing (a block, or a period) and parameters with cells on the last axis
+        n_cells : int
+            number of cells - None to take it from data
+        derived : Iterable[str]
+            inputs available to every cell
+        """
+
+        names = {name for inputs in methods.values() for name in inputs}
+        available = {}
+        for name in names & set(data):
+            values = np.asarray(data[name], dtype = np.float64)
+            if values.ndim == 0:
+                available[name] = bool(np.isfinite(values))
+            else:
+                available[name] = np.isfinite(values).reshape(-1, values.shape[-1]).all(axis = 0)
+                n_cells = values.shape[-1] if n_cells is None else n_cells
+        if n_cells is None:
+            raise ValueError("n_cells is required when data has no per cell inputs!")
+
+        return cls(methods, available, n_cells, derived)
+
+
+    def evaluate(
+        self,
+        function : Callable[[str, Mapping[str, np.ndarray], Any], np.ndarray],
+        data : Mapping[str, Any],
+        dtype : Any = None
+    ) -> np.ndarray:
+        """
+        Description
+        -----------
+        Evaluate function(method, values, dtype) for the cells of every method and scatter the
+        results into one array with cells on the last axis. A method used by every cell is
+        evaluated on the whole arrays without any gather.
+
+        Parameters
+        ----------
+        function : Callable
+            such as ``vapour_pressure_by_method`` or ``radiation_by_method``
+        data : Mapping[str, Any]
+            inputs - scalars or arrays with cells (or 1) on the last axis
+        dtype : Any
+            dtype of the result - None to follow the inputs
+        """
+
+        if len(self.cells) == 1:
+            (method,) = self.cells
+            result = function(method, {name: data[name] for name in self.methods[method]}, dtype)
+            return np.broadcast_to(result, np.broadcast_shapes(np.shape(result), (self.n_cells,)))
+
+        shape = np.broadcast_shapes(*(np.shape(data[name]) for name in self.inputs), (self.n_cells,))
+        dtype = resolve_dtype(*(data[name] for name in self.inputs), dtype = dtype)
+        out = np.empty(shape, dtype = dtype)
+        for method, cells in self.cells.items():
+            # inputs shared by the cells (scalars or a last axis of 1, such as the (T, 1) radiation
+            # of a scalar latitude) broadcast with the gathered ones as they are
+            values = {
+                name: np.take(data[name], cells, axis = -1) if np.shape(data[name])[-1:] == (self.n_cells,) else data[name]
+                for name in self.methods[method]
+            }
+            out[..., cells] = function(method, values, dtype)
+
+        return out
+
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Description
+        -----------
+        Number of cells of every method.
+        """
+
+        return {method: int(cells.size) for method, cells in self.cells.items()}
+
+
+    def __repr__(self) -> str:
+        return f"MethodDispatch(n_cells={self.n_cells}, methods={self.counts()})"
@@ -0,0 +1,285 @@
+"""
+Lateral Groundwater Flow On The Aquifer Grid.
+
+Heads of the active cells follow the 2-D finite difference equation
+
+    Sy A (h[t+1] - h[t]) / dt = sum of C (h_neighbour - h) + recharge - withdrawals
+
+solved implicitly. The matrix does not change between steps, so it is
+assembled and factorized once and every step only builds the right-hand side
+and runs the triangular solves. For very large grids a preconditioned
+conjugate gradient warm-started from the previous heads replaces the
+factorization. Springs and aqueducts (qanats) are drains evaluated on the
+heads of the previous step, which keeps the matrix constant.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Mapping
+import numpy as np
+from scipy import sparse
+from scipy.sparse import linalg
+from ..coordinate.active_cell import ActiveCellGrid
+
+
+
+class LateralGroundwater :
+
+    def __init__(self,
+        grid : ActiveCellGrid,
+        transmissivity : np.ndarray,
+        specific_yield : np.ndarray,
+        cell_size : Tuple[float, float],
+        dt : float = 1.0,
+        fixed_head : Optional[np.ndarray] = None,
+        drain_elevation : Optional[np.ndarray] = None,
+        drain_conductance : Optional[np.ndarray] = None,
+        solver : str = 'direct',
+        tolerance : float = 1e-8
+    ):
+        """
+        Description
+        -----------
+        Implicit finite difference head solver with a cached factorization.
+
+        Parameters
+        ----------
+        grid : ActiveCellGrid
+            cells of the aquifer - the boundary of the active cells is a no-flow boundary
+        transmissivity : np.ndarray
+            transmissivity of every cell [m^2/day]
+        specific_yield : np.ndarray
+            specific yield (storage coefficient) of every cell [-]
+        cell_size : Tuple[float, float]
+            size of a cell along the rows and the columns [m]
+        dt : float
+            time step [day]
+        fixed_head : np.ndarray
+            head of the fixed head cells (rivers, lakes, outflow boundaries) [m] - NaN elsewhere
+        drain_elevation : np.ndarray
+            elevation of the springs and aqueducts [m] - NaN for cells without one
+        drain_conductance : np.ndarray
+            conductance of the drains [m^2/day]
+        solver : str
+            'direct' (sparse LU, factorized once) or 'cg' (Jacobi preconditioned conjugate gradient)
+        tolerance : float
+            relative tolerance of the 'cg' solver
+        """
+
+        if solver not in ('direct', 'cg'):
+            raise ValueError(f"solver must be 'direct' or 'cg': {solver}")
+        if dt <= 0:
+            raise ValueError("dt must be greater than zero!")
+
+        n = grid.n_cells
+        self.grid = grid
+        self.n_cells = n
+        self.dt = dt
+        self.solver = solver
+        self.tolerance = tolerance
+
+        dy, dx = cell_size
+        self.area = dx * dy
+        transmissivity = np.broadcast_to(np.asarray(transmissivity, dtype = np.float64), (n,))
+        self.storage = np.broadcast_to(np.asarray(specific_yield, dtype = np.float64), (n,)) * self.area / dt
+
+        # conductance of the faces between active neighbours (harmonic mean of the transmissivity)
+        lookup = np.full(grid.mask.size, -1, dtype = np.intp)
+        lookup[grid.index] = np.arange(n)
+        first, second, conductance = [], [], []
+        for di, dj, ratio in ((0, 1, dy / dx), (1, 0, dx / dy)):
+            rows, cols = grid.rows + di, grid.cols + dj
+            inside = (rows < grid.shape[0]) & (cols < grid.shape[1])
+            neighbour = np.full(n, -1, dtype = np.intp)
+            neighbour[inside] = lookup[np.ravel_multi_index((rows[inside], cols[inside]), grid.shape)]
+            cells = np.flatnonzero(neighbour >= 0)
+            t1, t2 = transmissivity[cells], transmissivity[neighbour[cells]]
+            with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                harmonic = np.where(t1 + t2 > 0, 2 * t1 * t2 / (t1 + t2), 0)
+            first.append(cells)
+            second.append(neighbour[cells])
+            conductance.append(harmonic * ratio)
+        self.first = np.concatenate(first)
+        self.second = np.concatenate(second)
+        self.conductance = np.concatenate(conductance)
+
+        diagonal = np.bincount(self.first, self.conductance, n) + np.bincount(self.second, self.conductance, n)
+        self.laplacian = sparse.csr_matrix(
+            (np.r_[diagonal, -self.conductance, -self.conductance],
+             (np.r_[np.arange(n), self.first, self.second], np.r_[np.arange(n), self.second, self.first])),
+            shape = (n, n)
+        )
+
+        fixed_head = np.full(n, np.nan) if fixed_head is None else np.broadcast_to(np.asarray(fixed_head, dtype = np.float64), (n,))
+        self.fixed = np.flatnonzero(~np.isnan(fixed_head))
+        self.free = np.flatnonzero(np.isnan(fixed_head))
+        self.fixed_head = fixed_head[self.fixed]
+
+        self.drain_elevation = None
+        if drain_elevation is not None:
+            elevation = np.broadcast_to(np.asarray(drain_elevation, dtype = np.float64), (n,))
+            self.drains = np.flatnonzero(~np.isnan(elevation))
+            self.drain_elevation = elevation[self.drains]
+            self.drain_conductance = np.broadcast_to(
+                np.asarray(0 if drain_conductance is None else drain_conductance, dtype = np.float64), (n,)
+            )[self.drains]
+
+        # system of the free cells, fixed heads move to the right-hand side
+        laplacian = self.laplacian.tocsc()
+        self.matrix = (laplacian[self.free][:, self.free] + sparse.diags(self.storage[self.free])).tocsc()
+        self.coupling = laplacian[self.free][:, self.fixed].tocsr()
+        if np.any(self.storage[self.free] <= 0) and self.fixed.size == 0:
+            raise ValueError("specific_yield must be greater than zero without fixed head cells!")
+
+        self._lu = None
+        self._preconditioner = None
+        if solver == 'direct':
+            # the matrix is symmetric - minimum degree on A^T + A keeps the factors sparse
+            self._lu = linalg.splu(self.matrix, permc_spec = 'MMD_AT_PLUS_A')
+        else:
+            self._preconditioner = sparse.diags(1 / self.matrix.diagonal())
+
+
+    def drain_flow(
+        self,
+        head : np.ndarray
+    ) -> np.ndarray:
+        """
+        Description
+        -----------
+        Discharge of the springs and aqueducts of every cell [m^3/day] - C * max(h - z, 0).
+        """
+
+        head = np.asarray(head, dtype = np.float64)
+        flow = np.zeros(head.shape)
+        if self.drain_elevation is not None:
+            flow[..., self.drains] = self.drain_conductance * np.maximum(head[..., self.drains] - self.drain_elevation, 0)
+
+        return flow
+
+
+    def lateral_flow(
+        self,
+        head : np.ndarray
+    ) -> np.ndarray:
+        """
+        Description
+        -----------
+        Net lateral inflow of every cell from its neighbours [m^3/day] - the entrance minus the
+        outlet groundwater of ``ground_water_balance`` (divide by area / 1000 for mm/day).
+        """
+
+        head = np.asarray(head, dtype = np.float64)
+        flat = head.reshape(-1, self.n_cells)
+
+        return -np.asarray(self.laplacian @ flat.T).T.reshape(head.shape)
+
+
+    def step(
+        self,
+        head : np.ndarray,
+        recharge : Union[float, np.ndarray] = 0,
+        withdrawal : Union[float, np.ndarray] = 0
+    ) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Description
+        -----------
+        Heads after one time step.
+
+        Parameters
+        ----------
+        head : np.ndarray
+            heads at the start of the step [m] - shape (..., cells), for example (members, cells)
+        recharge : Union[float, np.ndarray]
+            deep percolation (recharge) from the soil model [mm/day]
+        withdrawal : Union[float, np.ndarray]
+            pumping of the wells of every cell [m^3/day]
+
+        Returns
+        -------
+        head : np.ndarray
+            heads at the end of the step [m]
+        fluxes : Dict[str, np.ndarray]
+            'recharge', 'withdrawal', 'drain' (springs and aqueducts, from the start heads) and
+            'lateral' (net inflow from the neighbours, at the end heads) in m^3/day per cell
+        """
+
+        head = np.asarray(head, dtype = np.float64)
+        shape = head.shape
+        flat = head.reshape(-1, self.n_cells)
+
+        recharge = np.broadcast_to(np.asarray(recharge, dtype = np.float64) * self.area / 1000, shape).reshape(flat.shape)
+        withdrawal = np.broadcast_to(np.asarray(withdrawal, dtype = np.float64), shape).reshape(flat.shape)
+        drain = self.drain_flow(flat)
+
+        source = recharge - withdrawal - drain
+        rhs = self.storage[self.free] * flat[:, self.free] + source[:, self.free]
+        if self.fixed.size:
+            rhs = rhs - np.asarray(self.coupling @ np.broadcast_to(self.fixed_head, (flat.shape[0], self.fixed.size)).T).T
+
+        new = np.empty_like(flat)
+        new[:, self.fixed] = self.fixed_head
+        if self._lu is not None:
+            new[:, self.free] = self._lu.solve(np.ascontiguousarray(rhs.T)).T
+        else:
+            for k in range(flat.shape[0]):
+                solution, info = linalg.cg(
+                    self.matrix, rhs[k], x0 = flat[k, self.free], rtol = self.tolerance, M = self._preconditioner
+                )
+                if info > 0:
+                    raise ValueError(f"conjugate gradient did not converge in {info} iterations!")
+                new[k, self.free] = solution
+
+        new = new.reshape(shape)
+        fluxes = {
+            'recharge': recharge.reshape(shape),
+            'withdrawal': withdrawal.reshape(shape),
+            'drain': drain.reshape(shape),
+            'lateral': self.lateral_flow(new)
+        }
+
+        return new, fluxes
+
+
+    def run(
+        self,
+        head : np.ndarray,
+        recharge : np.ndarray,
+        withdrawal : Union[float, np.ndarray] = 0
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Description
+        -----------
+        Heads of a block of steps.
+
+        Parameters
+        ----------
+        head : np.ndarray
+            heads at the start [m], shape (..., cells)
+        recharge : np.ndarray
+            recharge of every step [mm/day], shape (steps, ..., cells)
+        withdrawal : Union[float, np.ndarray]
+            pumping [m^3/day] - constant or with the shape of recharge
+
+        Returns
+        -------
+        heads : np.ndarray
+            heads at the end of every step, shape (steps, ..., cells)
+        drains : np.ndarray
+            discharge of the springs and aqueducts of every step [m^3/day]
+        """
+
+        recharge = np.asarray(recharge, dtype = np.float64)
+        withdrawal = np.broadcast_to(np.asarray(withdrawal, dtype = np.float64), recharge.shape)
+
+        heads = np.empty(recharge.shape[:1] + np.broadcast_shapes(np.shape(head), recharge.shape[1:]))
+        drains = np.empty_like(heads)
+        for t in range(recharge.shape[0]):
+            head, fluxes = self.step(head, recharge[t], withdrawal[t])
+            heads[t] = head
+            drains[t] = fluxes['drain']
+
+        return heads, drains
+
+
+    def __repr__(self) -> str:
+        return (f"LateralGroundwater(n_cells={self.n_cells}, fixed={self.fixed.size}, "
+                f"solver={self.solver!r}, nnz={self.matrix.nnz})")
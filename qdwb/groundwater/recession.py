@@ -0,0 +1,336 @@
+"""
+Recession Of Springs And Aqueducts (Qanats).
+
+Recession constants are fitted for all springs at once from daily discharge
+records of shape (days, springs): the recession periods of every record are
+found with array operations and the least squares sums are reduced over the
+day axis, so there is no loop over springs. The fitted recession then
+predicts the discharge of every spring one day at a time, which is the spring
+withdrawal of the groundwater balance.
+
+Maillet (one reservoir)       Q(t) = Q0 exp(-alpha t)
+Two reservoirs                Q(t) = Q1 exp(-alpha_fast t) + Q2 exp(-alpha_slow t)
+
+The two reservoir constants come from the linear recurrence
+Q[t + 2] = a1 Q[t + 1] + a2 Q[t] of a sum of two exponentials (Prony).
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn
+import numpy as np
+from ..evapotranspiration.convert import convert_units
+
+
+
+def recession_constant(
+    discharge_i : np.ndarray,
+    discharge_i1 : np.ndarray,
+    dt : float = 1.0
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Maillet recession constant between two discharges of a recession, such as the
+    discharge_from_the_spring_at_time_i and _i1 of ``GroundWaterBalance``.
+
+    Parameters
+    ----------
+    discharge_i : np.ndarray
+        discharge at time i
+    discharge_i1 : np.ndarray
+        discharge at time i + dt
+    dt : float
+        time between the two discharges [day]
+
+    Returns
+    -------
+    alpha : np.ndarray
+        recession constant [1/day] - NaN where the discharges are not positive
+    """
+
+    q0 = np.asarray(discharge_i, dtype = np.float64)
+    q1 = np.asarray(discharge_i1, dtype = np.float64)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        return np.where((q0 > 0) & (q1 > 0), np.log(q0 / q1) / dt, np.nan)
+
+
+
+def recession_days(
+    discharge : np.ndarray,
+    min_length : int = 7,
+    skip : int = 2
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Days t whose step to t + 1 belongs to a recession: discharge falls every day of a run
+    of at least min_length days, without the first skip steps after the peak (quick flow).
+
+    Parameters
+    ----------
+    discharge : np.ndarray
+        daily discharge of shape (days, springs) - NaN for missing days
+    min_length : int
+        shortest recession in days
+    skip : int
+        steps left out at the start of every recession
+
+    Returns
+    -------
+    recession : np.ndarray
+        boolean array of shape (days - 1, springs)
+    """
+
+    q = np.asarray(discharge, dtype = np.float64)
+    if q.ndim == 1:
+        q = q[:, np.newaxis]
+    if q.shape[0] < 2:
+        return np.zeros((0,) + q.shape[1:], dtype = bool)
+
+    with np.errstate(invalid = 'ignore'):
+        falling = (q[1:] < q[:-1]) & (q[1:] > 0)
+
+    steps = np.arange(falling.shape[0])[:, np.newaxis]
+    previous = np.vstack([np.zeros((1,) + falling.shape[1:], dtype = bool), falling[:-1]])
+    start = falling & ~previous
+    first = np.maximum.accumulate(np.where(start, steps, 0), axis = 0)
+    position = steps - first
+
+    # length of the run of every step: position of the last step of the run + 1
+    following = np.vstack([falling[1:], np.zeros((1,) + falling.shape[1:], dtype = bool)])
+    end = falling & ~following
+    last = np.minimum.accumulate(np.where(end, steps, falling.shape[0])[::-1], axis = 0)[::-1]
+    length = last - first + 1
+
+    return falling & (position >= skip) & (length + 1 >= min_length)
+
+
+
+def fit_maillet(
+    discharge : np.ndarray,
+    min_length : int = 7,
+    skip : int = 2
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Maillet recession constant of every spring: least squares fit of
+    ln Q[t + 1] - ln Q[t] = -alpha over the recession days.
+
+    Parameters
+    ----------
+    discharge : np.ndarray
+        daily discharge of shape (days, springs)
+    min_length, skip : int
+        selection of the recession days (see ``recession_days``)
+
+    Returns
+    -------
+    fit : Dict[str, np.ndarray]
+        'alpha' [1/day], 'residual' (standard deviation of the daily log changes) and
+        'n_steps' of every spring - NaN alpha for springs without recession
+    """
+
+    q = np.asarray(discharge, dtype = np.float64)
+    if q.ndim == 1:
+        q = q[:, np.newaxis]
+    days = recession_days(q, min_length, skip)
+
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        change = np.where(days, np.log(q[1:]) - np.log(q[:-1]), 0)
+        n = days.sum(axis = 0)
+        alpha = np.where(n > 0, -change.sum(axis = 0) / n, np.nan)
+        residual = np.sqrt(np.where(days, (change + alpha) ** 2, 0).sum(axis = 0) / np.maximum(n - 1, 1))
+
+    return {'alpha': alpha, 'residual': np.where(n > 1, residual, np.nan), 'n_steps': n}
+
+
+
+def fit_two_reservoir(
+    discharge : np.ndarray,
+    min_length : int = 7,
+    skip : int = 2
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Fast and slow recession constants of every spring from the least squares fit of
+    Q[t + 2] = a1 Q[t + 1] + a2 Q[t] over the recession days. Springs whose fit has no
+    two distinct decaying reservoirs get the Maillet constant for both.
+
+    Parameters
+    ----------
+    discharge : np.ndarray
+        daily discharge of shape (days, springs)
+    min_length, skip : int
+        selection of the recession days (see ``recession_days``)
+
+    Returns
+    -------
+    fit : Dict[str, np.ndarray]
+        'alpha_fast', 'alpha_slow' [1/day], 'two_reservoir' (True where the two reservoir
+        fit was kept) and 'n_steps' of every spring
+    """
+
+    q = np.asarray(discharge, dtype = np.float64)
+    if q.ndim == 1:
+        q = q[:, np.newaxis]
+    days = recession_days(q, min_length, skip)
+    maillet = fit_maillet(q, min_length, skip)
+
+    # triples t, t + 1, t + 2 inside one recession
+    triple = days[:-1] & days[1:]
+    x0 = np.where(triple, q[:-2], 0)
+    x1 = np.where(triple, q[1:-1], 0)
+    y = np.where(triple, q[2:], 0)
+
+    s11, s12, s22 = (x1 * x1).sum(axis = 0), (x1 * x0).sum(axis = 0), (x0 * x0).sum(axis = 0)
+    b1, b2 = (y * x1).sum(axis = 0), (y * x0).sum(axis = 0)
+    determinant = s11 * s22 - s12 ** 2
+
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        a1 = (b1 * s22 - b2 * s12) / determinant
+        a2 = (s11 * b2 - s12 * b1) / determinant
+        discriminant = a1 ** 2 + 4 * a2
+        root = np.sqrt(np.maximum(discriminant, 0))
+        fast = (a1 - root) / 2
+        slow = (a1 + root) / 2
+        valid = ((triple.sum(axis = 0) >= 3) & (determinant > 0) & (discriminant > 0) &
+                 (fast > 0) & (slow < 1) & (slow - fast > 1e-6))
+        alpha_fast = np.where(valid, -np.log(fast), maillet['alpha'])
+        alpha_slow = np.where(valid, -np.log(slow), maillet['alpha'])
+
+    return {
+        'alpha_fast': alpha_fast,
+        'alpha_slow': alpha_slow,
+        'two_reservoir': valid,
+        'n_steps': maillet['n_steps']
+    }
+
+
+
+class SpringRecession :
+
+    def __init__(self,
+        alpha_fast : np.ndarray,
+        alpha_slow : Optional[np.ndarray] = None,
+        units : str = 'l/s'
+    ):
+        """
+        Description
+        -----------
+        Daily recession of many springs - Maillet if alpha_slow is None or equal to alpha_fast.
+
+        Parameters
+        ----------
+        alpha_fast : np.ndarray
+            recession constant of the fast (or only) reservoir of every spring [1/day]
+        alpha_slow : np.ndarray
+            recession constant of the slow reservoir [1/day]
+        units : str
+            unit of the discharge ('l/s', 'm3/s' or 'm3/day')
+        """
+
+        self.fast = np.exp(-np.asarray(alpha_fast, dtype = np.float64))
+        self.slow = self.fast if alpha_slow is None else np.exp(-np.asarray(alpha_slow, dtype = np.float64))
+        self.units = units
+        self.components = None
+
+
+    @classmethod
+    def fit(
+        cls,
+        discharge : np.ndarray,
+        two_reservoir : bool = True,
+        min_length : int = 7,
+        skip : int = 2,
+        units : str = 'l/s'
+    ) -> 'SpringRecession':
+        """
+        Description
+        -----------
+        Recession fitted on daily records of shape (days, springs) and started from the
+        last two days of the records.
+        """
+
+        q = np.asarray(discharge, dtype = np.float64)
+        if two_reservoir:
+            fit = fit_two_reservoir(q, min_length, skip)
+            recession = cls(fit['alpha_fast'], fit['alpha_slow'], units = units)
+        else:
+            recession = cls(fit_maillet(q, min_length, skip)['alpha'], units = units)
+        recession.start(q[-2], q[-1])
+
+        return recession
+
+
+    def start(
+        self,
+        previous : np.ndarray,
+        current : Optional[np.ndarray] = None
+    ) -> NoReturn:
+        """
+        Description
+        -----------
+        Split the discharge of every spring between the two reservoirs from two consecutive
+        days (current is the day of the next ``step``). With one day, or for Maillet springs,
+        the whole discharge is in the slow reservoir.
+        """
+
+        if current is None:
+            current = previous
+            previous = None
+        current = np.asarray(current, dtype = np.float64)
+        slow = current.copy()
+        if previous is not None:
+            previous = np.asarray(previous, dtype = np.float64)
+            distinct = np.abs(self.slow - self.fast) > 1e-9
+            with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                # current = Qf + Qs and current = r_f Qf' + r_s Qs' with previous = Qf' + Qs'
+                previous_slow = (current - self.fast * previous) / (self.slow - self.fast)
+                candidate = self.slow * previous_slow
+            usable = distinct & np.isfinite(candidate) & (candidate >= 0) & (candidate <= current)
+            slow = np.where(usable, candidate, current)
+
+        self.components = np.stack([current - slow, slow])
+
+
+    def step(self) -> np.ndarray:
+        """
+        Description
+        -----------
+        Discharge of every spring on the next day (in the unit of the records).
+        """
+
+        if self.components is None:
+            raise ValueError("start the recession with the observed discharge first!")
+
+        self.components = self.components * np.stack([self.fast, self.slow])
+
+        return self.components.sum(axis = 0)
+
+
+    def run(
+        self,
+        n_days : int
+    ) -> np.ndarray:
+        """
+        Description
+        -----------
+        Discharge of every spring on the next n_days days, shape (n_days, springs).
+        """
+
+        return np.stack([self.step() for _ in range(n_days)])
+
+
+    def withdrawal(
+        self,
+        discharge : np.ndarray
+    ) -> np.ndarray:
+        """
+        Description
+        -----------
+        Daily volume of a discharge [m^3/day] - the withdrawal_from_springs (or aqueducts)
+        of the groundwater balance.
+        """
+
+        return convert_units(discharge, self.units, 'm3/day')
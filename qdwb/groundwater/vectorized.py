@@ -0,0 +1,157 @@
+"""
+Array Versions Of The Ground Water Balance.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn
+import numpy as np
+from ..model.dtype import resolve_dtype, as_float_array
+
+
+
+def ground_water_balance(
+    deep_perculation : np.ndarray,
+    entrance_groundwater : np.ndarray = 0,
+    outlet_groundwater : np.ndarray = 0,
+    evaporation_from_groundwater : np.ndarray = 0,
+    penetration_from_free_surface_water : np.ndarray = 0,
+    penetration_from_alluvial_fan : np.ndarray = 0,
+    infiltration_by_artificial_feeding_projects : np.ndarray = 0,
+    rate_of_water_leakage_from_underground_water_to_surface_water : np.ndarray = 0,
+    withdrawal_from_springs : np.ndarray = 0,
+    withdrawal_from_aqueducts : np.ndarray = 0,
+    withdrawal_from_wells : np.ndarray = 0,
+    R_fg : np.ndarray = 0,
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Change of groundwater storage for any number of aquifers or cells at once - same
+    terms as ``GroundWaterBalance.ground_water_balance``. All terms must share one
+    unit (m^3 per aquifer or mm per cell).
+
+    Parameters
+    ----------
+    deep_perculation : np.ndarray
+        Deep perculation caused by rain
+    entrance_groundwater, outlet_groundwater : np.ndarray
+        Entrance to and exit from underground water
+    evaporation_from_groundwater : np.ndarray
+        Evaporation from groundwater
+    penetration_from_free_surface_water, penetration_from_alluvial_fan, infiltration_by_artificial_feeding_projects : np.ndarray
+        Deep perculation from free water surface, alluvial fan and artificial feeding projects
+    rate_of_water_leakage_from_underground_water_to_surface_water : np.ndarray
+        The rate of water leakage from underground water to surface water
+    withdrawal_from_springs, withdrawal_from_aqueducts, withdrawal_from_wells : np.ndarray
+        Withdrawal from underground water by springs, aqueducts and wells
+    R_fg : np.ndarray
+        Return water to underground watr sources
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    delta_Storage_ground_water : np.ndarray
+        change of groundwater storage
+    """
+
+    terms = (
+        deep_perculation, entrance_groundwater, outlet_groundwater, evaporation_from_groundwater,
+        penetration_from_free_surface_water, penetration_from_alluvial_fan,
+        infiltration_by_artificial_feeding_projects,
+        rate_of_water_leakage_from_underground_water_to_surface_water,
+        withdrawal_from_springs, withdrawal_from_aqueducts, withdrawal_from_wells, R_fg
+    )
+    dtype = resolve_dtype(*terms, dtype = dtype)
+    (deep_perculation, entrance_groundwater, outlet_groundwater, evaporation_from_groundwater,
+     penetration_from_free_surface_water, penetration_from_alluvial_fan,
+     infiltration_by_artificial_feeding_projects,
+     rate_of_water_leakage_from_underground_water_to_surface_water,
+     withdrawal_from_springs, withdrawal_from_aqueducts, withdrawal_from_wells, R_fg) = (
+        as_float_array(term, dtype) for term in terms
+    )
+
+    delta_Sg = (deep_perculation + (entrance_groundwater - outlet_groundwater) + R_fg -
+                evaporation_from_groundwater + penetration_from_free_surface_water + penetration_from_alluvial_fan +
+                infiltration_by_artificial_feeding_projects - rate_of_water_leakage_from_underground_water_to_surface_water -
+                (withdrawal_from_springs + withdrawal_from_wells + withdrawal_from_aqueducts))
+
+    return np.asarray(delta_Sg).astype(dtype, copy = False)
+
+
+
+def update_storage(
+    storage : np.ndarray,
+    delta_storage : np.ndarray,
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Add a change of storage to the storage of the previous step. The sum is done in the
+    dtype of ``storage`` (or ``dtype``), so a float64 storage keeps accumulating float32
+    increments without losing precision.
+
+    Parameters
+    ----------
+    storage : np.ndarray
+        storage at previous step
+    delta_storage : np.ndarray
+        change of storage
+    dtype : Any
+        dtype of the storage - None to keep the dtype of ``storage``
+
+    Returns
+    -------
+    storage : np.ndarray
+        storage at current step
+    """
+
+    dtype = resolve_dtype(storage, dtype = dtype)
+
+    return (as_float_array(storage, dtype) + as_float_array(delta_storage, dtype)).astype(dtype, copy = False)
+
+
+
+def groundwater_evaporation(
+    water_table_depth : np.ndarray,
+    potential_evaporation : np.ndarray,
+    extinction_depth : np.ndarray = 5.0,
+    exponent : np.ndarray = 1.0,
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Evaporation from the water table for any number of cells - the potential rate reduced
+    with the depth of the water table, (1 - depth / extinction_depth) ** exponent (Averyanov;
+    exponent 1 is the linear curve of MODFLOW EVT), and zero below the extinction depth.
+
+    Parameters
+    ----------
+    water_table_depth : np.ndarray
+        depth of the water table below the surface in m
+    potential_evaporation : np.ndarray
+        evaporation demand left to the water table in mm
+    extinction_depth : np.ndarray
+        depth in m below which there is no evaporation from groundwater
+    exponent : np.ndarray
+        shape of the curve
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    evaporation_from_groundwater : np.ndarray
+        evaporation from groundwater in mm
+    """
+
+    dtype = resolve_dtype(water_table_depth, potential_evaporation, dtype = dtype)
+    depth = as_float_array(water_table_depth, dtype)
+    extinction_depth = as_float_array(extinction_depth, dtype)
+
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        share = np.clip(1 - np.maximum(depth, 0) / extinction_depth, 0, 1)
+    share = np.where(np.isnan(share), 0, share) ** as_float_array(exponent, dtype)
+
+    return (np.maximum(as_float_array(potential_evaporation, dtype), 0) * share).astype(dtype, copy = False)
@@ -0,0 +1,173 @@
+"""
+Array Versions Of The Interception Methods.
+
+The canopy type is carried as an integer class code per cell (see
+``CANOPY_CLASSES``) so that the bucket method can be evaluated with masks
+instead of string comparisons.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn
+import numpy as np
+from ..model.dtype import resolve_dtype, as_float_array
+from ..model.check import check_not_negative
+
+
+# type_of_basin_canopy -> class code
+CANOPY_CLASSES = {
+    'Other' : 0,
+    'Forest&Mixed' : 1,
+    'Evergreen_Forest' : 2
+}
+
+
+
+def canopy_class_codes(
+    type_of_basin_canopy : np.ndarray
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Convert an array of canopy type names to class codes.
+
+    Parameters
+    ----------
+    type_of_basin_canopy : np.ndarray
+        type_of_basin_canopy include : ['Forest&Mixed' , 'Evergreen_Forest' , 'Other']
+
+    Returns
+    -------
+    canopy_class : np.ndarray
+        class code per cell - int8
+    """
+
+    names, inverse = np.unique(np.asarray(type_of_basin_canopy, dtype = str), return_inverse = True)
+    for name in names:
+        if name not in CANOPY_CLASSES:
+            raise ValueError(f'enter correct type_of_basin_canopy and {name} is not defined')
+
+    codes = np.array([CANOPY_CLASSES[name] for name in names], dtype = np.int8)
+
+    return codes[inverse].reshape(np.shape(type_of_basin_canopy))
+
+
+
+def bucket(
+    canopy_class : np.ndarray,
+    precipitation : np.ndarray,
+    is_growing_season : np.ndarray,
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    calculate interception from precipitation value and type of basin canopy for all cells
+    **reference**based on researches of alizade (1391) & fasihi payan name
+
+    Parameters
+    -----------
+    canopy_class : np.ndarray
+        canopy class code - see CANOPY_CLASSES and canopy_class_codes
+
+    precipitation : np.ndarray
+        precipitation : zero or postive value in mm
+
+    is_growing_season : np.ndarray
+        is_growing_season include :  [True : 'growing' , False : 'none growing']
+
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    interception : np.ndarray
+        interception in mm
+    """
+
+    dtype = resolve_dtype(precipitation, dtype = dtype)
+    precipitation = as_float_array(precipitation, dtype)
+    canopy_class = np.asarray(canopy_class)
+    is_growing_season = np.asarray(is_growing_season, dtype = bool)
+
+    check_not_negative(precipitation, 'precipitation')
+    if not np.all(np.isin(canopy_class, list(CANOPY_CLASSES.values()))):
+        raise ValueError('enter correct canopy_class, see CANOPY_CLASSES')
+
+    forest = canopy_class == CANOPY_CLASSES['Forest&Mixed']
+    ratio = np.select(
+        [forest & is_growing_season, forest & ~is_growing_season, canopy_class == CANOPY_CLASSES['Evergreen_Forest']],
+        [0.06, 0.03, 0.1],
+        0
+    ).astype(dtype, copy = False)
+
+    return (ratio * precipitation).astype(dtype, copy = False)
+
+
+
+def gash(
+    total_precipitation_of_day : np.ndarray,
+    canopy_storage_capacity : np.ndarray,
+    canopy_cover : np.ndarray,
+    evaporation_to_rainfall_ratio : np.ndarray,
+    trunk_storage_capacity : np.ndarray,
+    stem_flow : np.ndarray,
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -------------------------
+    calculate interception by Gash mathod for all cells
+    **reference**based on researches of Gash(1995):
+    SWB Version 2.0—A ,page :27 & 28 ,
+    A Modified Gash Model for Estimating Rainfall Interception
+    Loss of Forest Using Remote Sensing Observations at
+    Regional Scale_ Yaokui Cui  and Li Jia _2014
+
+    Parameters
+    ----------
+    total_precipitation_of_day : np.ndarray
+        total precipitation of day in inch
+    canopy_storage_capacity : np.ndarray
+        canopy storage capacity in inch
+    canopy_cover : np.ndarray
+        canopy cover in dimentionless
+    evaporation_to_rainfall_ratio : np.ndarray
+        evaporation to rainfall ratio in dimentionless - less than one
+    trunk_storage_capacity : np.ndarray
+        trunk storage capacity in inch
+    stem_flow : np.ndarray
+        stem flow in dimentionless
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    interception : np.ndarray
+        interception in inch
+    """
+
+    dtype = resolve_dtype(
+        total_precipitation_of_day, canopy_storage_capacity, canopy_cover,
+        evaporation_to_rainfall_ratio, trunk_storage_capacity, stem_flow, dtype = dtype
+    )
+    p = as_float_array(total_precipitation_of_day, dtype)
+    c = as_float_array(canopy_cover, dtype)
+    e = as_float_array(evaporation_to_rainfall_ratio, dtype)
+    s_t = as_float_array(trunk_storage_capacity, dtype)
+    p_t = as_float_array(stem_flow, dtype)
+
+    check_not_negative(p, 'precipitation')
+    if np.any(np.asarray(e) >= 1):
+        raise ValueError('evaporation_to_rainfall_ratio Must be less than one')
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        sp = -(as_float_array(canopy_storage_capacity, dtype) / (c * e)) * np.log(1 - e)
+        ratio = s_t / p_t
+
+    saturated = (c * sp) + (c * e * (p - sp))
+    interception = np.where(
+        p < sp,
+        c * p,
+        np.where(p <= ratio, saturated + (p_t * p), saturated + s_t)
+    )
+
+    return interception.astype(dtype, copy = False)
@@ -0,0 +1,419 @@
+"""
+Content Addressed Cache Of Stage Outputs.
+
+The key of a stage call is a hash of the stage name, the code of the stage
+function (with the values its closure captured and the modules it uses), the
+dtype and every array the stage reads (inputs and state). A rerun
+with one changed parameter (geology_permeability, stress_coefficient, MAD, ...)
+then finds every stage upstream of that parameter in the cache and only the
+stages that read it, directly or through their inputs, are recomputed.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Mapping
+from collections import OrderedDict
+import hashlib
+import inspect
+import os
+import sys
+import numpy as np
+from .stages import Stage
+from .sparse import SKIPPED_KEY
+
+
+# Bumped when the layout of the cache files changes
+CACHE_VERSION = 2
+
+
+
+def code_version(
+    stage : Stage
+) -> Optional[str]:
+
+    """
+    Description
+    -----------
+    Version of the code of a stage - a hash of the source of its function (or of the byte
+    code if the source is not available), of the values its closure captured (such as the
+    method of ``free_water_stages`` or a MethodDispatch) and of the source of the modules of
+    the package it uses, directly or through their imports. None if a captured value cannot
+    be hashed - such a stage is not cached.
+    """
+
+    function = stage.function
+    package = __name__.split('.')[0]
+    digest = hashlib.blake2b(digest_size = 16)
+    digest.update(_function_code(function))
+
+    try:
+        for cell in function.__closure__ or ():
+            _update_value(digest, cell.cell_contents, package)
+    except (TypeError, ValueError):
+        return None
+
+    for name in sorted(_used_modules(function, package)):
+        digest.update(name.encode())
+        digest.update(_module_version(name))
+
+    return digest.hexdigest()
+
+
+
+def _function_code(
+    function : Any
+) -> bytes:
+
+    """
+    Description
+    -----------
+    Source of a function (or its byte code).
+    """
+
+    try:
+        return inspect.getsource(function).encode()
+    except (OSError, TypeError):
+        return getattr(getattr(function, '__code__', None), 'co_code', repr(function).encode())
+
+
+
+def _update_value(
+    digest : Any,
+    value : Any,
+    package : str,
+    depth : int = 0
+) -> NoReturn:
+
+    """
+    Description
+    -----------
+    Add a value captured by a stage function to a hash. Objects are hashed by their
+    attributes only if their class belongs to the package - a TypeError is raised for
+    any other object (open files, pools, ...).
+    """
+
+    if depth > 8:
+        raise ValueError("captured value is nested too deeply!")
+
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes, np.generic)):
+        digest.update(f"{type(value).__name__}:{value!r}".encode())
+    elif isinstance(value, np.ndarray):
+        _update_hash(digest, value)
+    elif isinstance(value, (tuple, list, set, frozenset)):
+        items = sorted(value, key = repr) if isinstance(value, (set, frozenset)) else value
+        digest.update(f"{type(value).__name__}[{len(value)}]".encode())
+        for item in items:
+            _update_value(digest, item, package, depth + 1)
+    elif isinstance(value, dict):
+        digest.update(f"dict[{len(value)}]".encode())
+        for name in sorted(value, key = repr):
+            _update_value(digest, name, package, depth + 1)
+            _update_value(digest, value[name], package, depth + 1)
+    elif inspect.isfunction(value) or inspect.isclass(value):
+        digest.update(f"{value.__module__}.{value.__qualname__}".encode())
+        digest.update(_function_code(value))
+    elif hasattr(value, '__dict__') and type(value).__module__.split('.')[0] == package:
+        digest.update(f"{type(value).__module__}.{type(value).__qualname__}".encode())
+        _update_value(digest, vars(value), package, depth + 1)
+    else:
+        raise TypeError(f"cannot hash a captured {type(value).__name__}!")
+
+
+
+def _used_modules(
+    function : Any,
+    package : str
+) -> Set[str]:
+
+    """
+    Description
+    -----------
+    Modules of the package used by a function: the modules of the globals and captured
+    values it refers to, and the modules of the package those modules import.
+    """
+
+    names = set()
+    codes = [function.__code__] if hasattr(function, '__code__') else []
+    while codes:
+        code = codes.pop()
+        names.update(code.co_names)
+        codes.extend(c for c in code.co_consts if inspect.iscode(c))
+
+    values = [function.__globals__[name] for name in names if name in getattr(function, '__globals__', {})]
+    values += [cell.cell_contents for cell in getattr(function, '__closure__', None) or ()]
+
+    modules = set()
+    pending = [function.__module__]
+    for value in values:
+        module = value if inspect.ismodule(value) else inspect.getmodule(type(value) if not (
+            inspect.isfunction(value) or inspect.isclass(value)) else value)
+        if module is not None:
+            pending.append(module.__name__)
+
+    while pending:
+        name = pending.pop()
+        if name in modules or name.split('.')[0] != package or name not in sys.modules:
+            continue
+        modules.add(name)
+        for value in vars(sys.modules[name]).values():
+            module = value if inspect.ismodule(value) else inspect.getmodule(value) if (
+                inspect.isfunction(value) or inspect.isclass(value)) else None
+            if module is not None:
+                pending.append(module.__name__)
+
+    return modules
+
+
+
+_MODULE_VERSIONS = {}
+
+
+
+def _module_version(
+    name : str
+) -> bytes:
+
+    """
+    Description
+    -----------
+    Hash of the source file of a module (read once per process).
+    """
+
+    if name not in _MODULE_VERSIONS:
+        path = getattr(sys.modules[name], '__file__', None)
+        try:
+            with open(path, 'rb') as file:
+                _MODULE_VERSIONS[name] = hashlib.blake2b(file.read(), digest_size = 16).digest()
+        except (OSError, TypeError):
+            _MODULE_VERSIONS[name] = name.encode()
+
+    return _MODULE_VERSIONS[name]
+
+
+
+def _update_hash(
+    digest : Any,
+    values : Any
+) -> NoReturn:
+
+    """
+    Description
+    -----------
+    Add dtype, shape and content of an array (or scalar) to a hash.
+    """
+
+    array = np.ascontiguousarray(values)
+    digest.update(f"{array.dtype.str}{array.shape}".encode())
+    digest.update(array.tobytes() if array.dtype.kind != 'O' else repr(array.tolist()).encode())
+
+
+
+class StageCache :
+
+    def __init__(self,
+        directory : str,
+        max_bytes : int = 2 * 1024 ** 3
+    ):
+        """
+        Description
+        -----------
+        Disk store of stage outputs with least recently used eviction. The directory is
+        read once here - after that the size and the order of use of the entries are kept
+        in memory and updated by ``get`` and ``put``.
+
+        Parameters
+        ----------
+        directory : str
+            directory of the cache files (created if missing)
+        max_bytes : int
+            size of the cache - the least recently used entries are removed above it
+        """
+
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be greater than zero!")
+
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._versions = {}
+        os.makedirs(directory, exist_ok = True)
+
+        # {path: size} from the least to the most recently used
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith('.npz'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.path, stat.st_size))
+        self._entries = OrderedDict((path, nbytes) for _, path, nbytes in sorted(entries))
+        self._nbytes = sum(self._entries.values())
+
+
+    def key(
+        self,
+        stage : Stage,
+        data : Mapping[str, Any],
+        dtype : np.dtype
+    ) -> Optional[str]:
+        """
+        Description
+        -----------
+        Content address of a stage call - None for stages whose code version cannot be
+        known (see ``code_version``), which are always recomputed.
+
+        Parameters
+        ----------
+        stage : Stage
+            the stage
+        data : Mapping[str, Any]
+            arrays available to the stage
+        dtype : np.dtype
+            dtype of the stage
+
+        Returns
+        -------
+        key : str
+            hex digest
+        """
+
+        # per stage object: stages of one name can capture different configurations
+        if stage not in self._versions:
+            self._versions[stage] = code_version(stage)
+        if self._versions[stage] is None:
+            return None
+
+        digest = hashlib.blake2b(digest_size = 20)
+        digest.update(f"{CACHE_VERSION}|{stage.name}|{self._versions[stage]}|{np.dtype(dtype).str}".encode())
+        for name in sorted(set(stage.inputs) | set(stage.state)):
+            digest.update(name.encode())
+            _update_hash(digest, data[name])
+
+        return digest.hexdigest()
+
+
+    def get(
+        self,
+        key : str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Description
+        -----------
+        Outputs stored under a key - None if the key is not in the cache.
+        """
+
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle = False) as stored:
+                result = {name: stored[name] for name in stored.files}
+        except (OSError, ValueError):
+            self._forget(path)
+            self.misses += 1
+            return None
+
+        os.utime(path)
+        if path in self._entries:
+            self._entries.move_to_end(path)
+        else:
+            # written by another process since the directory was read
+            self._add(path, os.path.getsize(path))
+        self.hits += 1
+        if SKIPPED_KEY in result:
+            skipped, total = result.pop(SKIPPED_KEY)
+            result[SKIPPED_KEY] = (int(skipped), int(total))
+
+        return result
+
+
+    def put(
+        self,
+        key : str,
+        result : Mapping[str, Any]
+    ) -> NoReturn:
+        """
+        Description
+        -----------
+        Store the outputs of a stage call and evict the least recently used entries.
+        """
+
+        arrays = {name: np.asarray(v) for name, v in result.items() if name != SKIPPED_KEY}
+        if SKIPPED_KEY in result:
+            arrays[SKIPPED_KEY] = np.asarray(result[SKIPPED_KEY], dtype = np.int64)
+
+        path = self._path(key)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as file:
+            np.savez(file, **arrays)
+            nbytes = file.tell()
+        os.replace(temporary, path)
+
+        self._forget(path)
+        self._add(path, nbytes)
+        self.evict()
+
+
+    def evict(self) -> NoReturn:
+        """
+        Description
+        -----------
+        Remove the least recently used entries until the cache fits in max_bytes.
+        """
+
+        while self._nbytes > self.max_bytes and self._entries:
+            path = next(iter(self._entries))
+            self._forget(path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+    def clear(self) -> NoReturn:
+        """
+        Description
+        -----------
+        Remove every entry of the cache.
+        """
+
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npz'):
+                os.remove(entry.path)
+        self._entries.clear()
+        self._nbytes = 0
+
+
+    def nbytes(self) -> int:
+        """
+        Description
+        -----------
+        Size of the cache files in bytes.
+        """
+
+        return self._nbytes
+
+
+    def _add(
+        self,
+        path : str,
+        nbytes : int
+    ) -> NoReturn:
+
+        self._entries[path] = nbytes
+        self._nbytes += nbytes
+
+
+    def _forget(
+        self,
+        path : str
+    ) -> NoReturn:
+
+        self._nbytes -= self._entries.pop(path, 0)
+
+
+    def _path(
+        self,
+        key : str
+    ) -> str:
+
+        return os.path.join(self.directory, f"{key}.npz")
+
+
+    def __repr__(self) -> str:
+        return f"StageCache({self.directory!r}, max_bytes={self.max_bytes}, hits={self.hits}, misses={self.misses})"
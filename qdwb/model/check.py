@@ -0,0 +1,116 @@
+"""
+Internal Validation Functions For Array Inputs.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn
+import numpy as np
+
+
+
+def check_not_negative(
+    values : np.ndarray,
+    name : str
+) -> NoReturn:
+
+    """
+    Description
+    -----------
+    Check that no element of an array is negative (NaN values are ignored).
+
+    Parameters
+    ----------
+    values : np.ndarray
+        values to be checked
+    name : str
+        name of the variable used in the error message
+    """
+
+    if np.any(np.asarray(values) < 0):
+        raise ValueError(f"{name} must be greater than or equal to zero!")
+
+
+
+def check_between(
+    values : np.ndarray,
+    min : float,
+    max : float,
+    name : str
+) -> NoReturn:
+
+    """
+    Description
+    -----------
+    Check that every element of an array is between min and max (NaN values are ignored).
+
+    Parameters
+    ----------
+    values : np.ndarray
+        values to be checked
+    min : float
+        lower bound
+    max : float
+        upper bound
+    name : str
+        name of the variable used in the error message
+    """
+
+    values = np.asarray(values)
+    if np.any(values < min) or np.any(values > max):
+        raise ValueError(f"{name} must be between {min} and {max}!")
+
+
+
+def check_float_dtype(
+    dtype : Any
+) -> np.dtype:
+
+    """
+    Description
+    -----------
+    Check that a dtype is a floating point dtype and return it as np.dtype.
+
+    Parameters
+    ----------
+    dtype : Any
+        anything accepted by np.dtype such as 'float32' or np.float64
+
+    Returns
+    -------
+    dtype : np.dtype
+        the checked dtype
+    """
+
+    dtype = np.dtype(dtype)
+    if dtype.kind != 'f':
+        raise ValueError(f"dtype must be a floating point type: {dtype}")
+
+    return dtype
+
+
+
+def check_same_length(
+    a : np.ndarray,
+    a_name : str,
+    b : np.ndarray,
+    b_name : str
+) -> NoReturn:
+
+    """
+    Description
+    -----------
+    Check that the last axis of two arrays has the same length.
+
+    Parameters
+    ----------
+    a : np.ndarray
+        first array
+    a_name : str
+        name of the first array
+    b : np.ndarray
+        second array
+    b_name : str
+        name of the second array
+    """
+
+    if np.shape(a)[-1:] != np.shape(b)[-1:]:
+        raise ValueError(f"{a_name} and {b_name} must have the same number of cells!")
@@ -0,0 +1,632 @@
+"""
+Daily Driver Of The Vectorized Water Balance.
+
+Runs the stages of ``stages.py`` for all cells at once, one day per step,
+with forcing, parameters and state cast according to a DtypePolicy.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Iterable, Iterator, Mapping
+import numpy as np
+from .dtype import DtypePolicy, DriftReport, get_dtype_policy
+from .stages import Stage, default_stages, PARAMETER_DEFAULTS
+from .sparse import SKIPPED_KEY, DENSE_KEY
+from .plan import ExecutionPlan
+from .cache import StageCache
+from .hru import HRU
+from .statistics import PeriodStatistics
+from ..coordinate.active_cell import ActiveCellGrid
+from ..evapotranspiration.convert import julian_day
+
+
+
+class Driver :
+
+    def __init__(self,
+        parameters : Mapping[str, Any],
+        state : Optional[Mapping[str, Any]] = None,
+        stages : Optional[List[Stage]] = None,
+        policy : Optional[DtypePolicy] = None,
+        grid : Optional[ActiveCellGrid] = None,
+        hru : Optional[HRU] = None,
+        cache : Optional[StageCache] = None,
+        n_members : Optional[int] = None,
+        layout : Optional[str] = None
+    ):
+        """
+        Description
+        -----------
+        Vectorized daily water balance over any number of cells.
+
+        Parameters
+        ----------
+        parameters : Mapping[str, Any]
+            static parameters - scalars or arrays with cells on the last axis
+        state : Mapping[str, Any]
+            initial state - variables missing here take the default of their stage
+        stages : List[Stage]
+            stages in execution order - None for ``default_stages()``
+        policy : DtypePolicy
+            precision policy - None for the global policy
+        grid : ActiveCellGrid
+            active cell layout - 2-D parameters, state and forcing are reduced to the active cells
+            and ``to_grid`` maps outputs back to 2-D
+        hru : HRU
+            grouping of identical cells (built on the active cells if grid is given, with the latitude of
+            the grid if it is not a parameter) - the model runs once per group, forcing is reduced with
+            ``HRU.reduce_forcing`` and ``to_cells`` expands outputs. Parameters and state that differ
+            within a group raise a ValueError
+        cache : StageCache
+            store of stage outputs - stages whose inputs, state and code did not change since an
+            earlier run are read from it instead of being recomputed
+        n_members : int
+            size of the parameter ensemble (see ``ensemble.ensemble_parameters``) - perturbed parameters
+            have a leading axis of this size, the state carries it and forcing is shared by all members
+        layout : str
+            'grid' or 'cells' layout of the arrays of 2 or more axes given with a grid (see
+            ``ActiveCellGrid.is_grid``) - None to find it from their shapes
+        """
+
+        self.policy = get_dtype_policy() if policy is None else policy
+        self.stages = default_stages() if stages is None else list(stages)
+
+        self.grid = grid
+        self.layout = layout
+        self.n_members = n_members
+        initial = (parameters, state)
+        parameters = {**PARAMETER_DEFAULTS, **parameters}
+        state = dict(state or {})
+        if grid is not None:
+            if 'latitude' not in parameters and grid.lat is not None:
+                parameters['latitude'] = grid.coordinates()[0]
+            parameters = grid.gather_all(parameters, layout)
+            state = grid.gather_all(state, layout)
+        self.hru = hru
+        if hru is not None:
+            hru.check_all(parameters)
+            hru.check_all(state)
+            parameters = hru.reduce_all(parameters)
+            state = hru.reduce_all(state)
+            n_cells = hru.n_groups
+        else:
+            n_cells = 1 if grid is None else grid.n_cells
+        self.n_cells = _number_of_cells(list(parameters.values()) + list(state.values()), default = n_cells)
+
+        self.parameters = {name: self.policy.cast(values, 'parameters') for name, values in parameters.items()}
+        self.state = {}
+        for stage in self.stages:
+            dtype = self.policy.dtype_for(stage.name, accumulator = stage.accumulator)
+            for name, default in stage.state.items():
+                values = state.get(name, default)
+                if values is None:
+                    raise ValueError(f"initial value of {name} is required!")
+                shape = stage.state_shape.get(name, ()) + (self.n_cells,)
+                if n_members is not None:
+                    shape = (n_members,) + shape
+                self.state[name] = np.array(np.broadcast_to(values, shape), dtype = dtype)
+
+        self.cache = cache
+        self._skipped = {}
+        self._dense = False
+        self._plans = {}
+        self._shadow = None
+        self._drift = None
+        if self.policy.validate:
+            self._shadow = Driver(
+                parameters = initial[0],
+                state = initial[1],
+                stages = self.stages,
+                policy = DtypePolicy(),
+                grid = grid,
+                hru = hru,
+                n_members = n_members
+            )
+            # the shadow evaluates the dry cells too, so the drift also covers the cells skipped here
+            self._shadow._dense = True
+            self._drift = DriftReport()
+
+
+    def step(
+        self,
+        forcing : Mapping[str, Any]
+    ) -> Dict[str, np.ndarray]:
+        """
+        Description
+        -----------
+        Run all stages for one day and update the state. Stages whose outputs are given in
+        forcing (such as 'reference_evapotranspiration' from ``hourly.daily_reference_et``) are skipped.
+
+        Parameters
+        ----------
+        forcing : Mapping[str, Any]
+            forcing of the day - scalars or arrays with cells on the last axis ('time', a datetime64,
+            gives julian_day)
+
+        Returns
+        -------
+        outputs : Dict[str, np.ndarray]
+            outputs of every stage (state variables at the end of the day included)
+        """
+
+        day = self._prepare_forcing(_calendar_forcing(forcing))
+        data = dict(self.parameters)
+        data.update(day)
+        data.update(self.state)
+
+        given = self.plan(day).given
+        self._run_stages([stage for stage in self.stages if stage not in given], data)
+
+        self.state = {name: data[name] for name in self.state}
+        outputs = {name: data[name] for stage in self.stages for name in stage.outputs}
+
+        if self._shadow is not None:
+            self._drift.update(outputs, self._shadow.step(forcing))
+
+        return outputs
+
+
+    def run_block(
+        self,
+        forcing : Mapping[str, Any],
+        prepared : bool = False
+    ) -> Dict[str, np.ndarray]:
+        """
+        Description
+        -----------
+        Run T days at once. Block stages of the execution plan (no state, no input from
+        the recurrence) are evaluated on (time, cell) arrays in one call, the recurrent
+        stages then run day by day on slices of them.
+
+        Parameters
+        ----------
+        forcing : Mapping[str, Any]
+            forcing of the block - arrays with time on the first axis, either (T, ..., cells)
+            or (T,) for values shared by all cells (such as julian_day, or 'time' as datetime64 which
+            gives julian_day)
+        prepared : bool
+            True if forcing was returned by ``prepare_block`` - its stage outputs are not recomputed
+
+        Returns
+        -------
+        outputs : Dict[str, np.ndarray]
+            outputs of every stage with shape (T, ..., cells) - (T, members, ..., cells) in an ensemble
+            for the outputs that depend on the perturbed parameters or the state
+        """
+
+        block = dict(forcing) if prepared else self._prepare_block_forcing(forcing)
+        n_days = _number_of_days(block)
+        if self.n_members is not None:
+            # forcing is shared by the members: (T, 1, ...cells)
+            block = {name: v[:, np.newaxis] for name, v in block.items()}
+        plan = self.plan(block)
+        varying = set(block) | set(plan.block_outputs)
+
+        data = dict(self.parameters)
+        data.update(block)
+        self._run_stages(plan.block, data)
+
+        outputs = {}
+        for t in range(n_days):
+            day = dict(data)
+            day.update({name: data[name][t] for name in varying})
+            day.update(self.state)
+            self._run_stages(plan.recurrent, day)
+            self.state = {name: day[name] for name in self.state}
+            for stage in plan.recurrent:
+                for name in stage.outputs:
+                    if name not in outputs:
+                        outputs[name] = np.empty((n_days,) + np.shape(day[name]), dtype = np.asarray(day[name]).dtype)
+                    outputs[name][t] = day[name]
+
+        for name in plan.given_outputs + plan.block_outputs:
+            values = np.asarray(data[name])
+            outputs[name] = np.broadcast_to(values, (n_days,) + values.shape[1:-1] + (self.n_cells,))
+        outputs = {name: outputs[name] for stage in self.stages for name in stage.outputs}
+
+        if self._shadow is not None:
+            self._drift.update(outputs, self._shadow.run_block(forcing, prepared = prepared))
+
+        return outputs
+
+
+    def prepare_block(
+        self,
+        forcing : Mapping[str, Any],
+        exclude : Iterable[str] = ()
+    ) -> Dict[str, np.ndarray]:
+        """
+        Description
+        -----------
+        Forcing of a block reduced and cast as in ``run_block``, together with the outputs of
+        the block stages that do not read the excluded parameters. The result can be run by
+        any driver with the same layout and the same excluded parameters (such as the members
+        of a calibration) with ``run_block(prepared, prepared = True)``.
+
+        Parameters
+        ----------
+        forcing : Mapping[str, Any]
+            forcing of the block as in ``run_block``
+        exclude : Iterable[str]
+            parameters that change between the runs sharing the result
+
+        Returns
+        -------
+        prepared : Dict[str, np.ndarray]
+            forcing and stage outputs with time on the first axis
+        """
+
+        block = self._prepare_block_forcing(forcing)
+        plan = ExecutionPlan(self.stages, (set(self.parameters) - set(exclude)) | set(block))
+
+        data = dict(self.parameters)
+        data.update(block)
+        self._run_stages(plan.block, data)
+        block.update({name: data[name] for name in plan.block_outputs})
+
+        return block
+
+
+    def plan(
+        self,
+        forcing : Mapping[str, Any]
+    ) -> ExecutionPlan:
+        """
+        Description
+        -----------
+        Execution plan of the stages for forcing with the given names (cached per set of names).
+        """
+
+        key = frozenset(forcing)
+        if key not in self._plans:
+            self._plans[key] = ExecutionPlan(self.stages, set(self.parameters) | key)
+
+        return self._plans[key]
+
+
+    def _prepare_block_forcing(
+        self,
+        forcing : Mapping[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Description
+        -----------
+        Forcing of a block prepared as in ``_prepare_forcing`` - series of shape (T,) become (T, 1).
+        """
+
+        forcing = _calendar_forcing(forcing)
+        _number_of_days(forcing)
+        series = {name: np.asarray(v)[:, np.newaxis] for name, v in forcing.items() if np.ndim(v) == 1}
+        fields = {name: v for name, v in forcing.items() if name not in series}
+
+        block = self._prepare_forcing(fields)
+        block.update({name: self.policy.cast(v, 'forcing') for name, v in series.items()})
+
+        return block
+
+
+    def _prepare_forcing(
+        self,
+        forcing : Mapping[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Description
+        -----------
+        Forcing reduced to the active cells (and HRU groups) and cast to the forcing dtype.
+        """
+
+        if self.grid is not None:
+            forcing = self.grid.gather_all(forcing, self.layout)
+        if self.hru is not None:
+            forcing = self.hru.reduce_forcing(forcing)
+
+        return {name: self.policy.cast(values, 'forcing') for name, values in forcing.items()}
+
+
+    def _run_stages(
+        self,
+        stages : List[Stage],
+        data : Dict[str, Any]
+    ) -> NoReturn:
+        """
+        Description
+        -----------
+        Run stages in order, adding their outputs to data.
+        """
+
+        if self._dense:
+            data[DENSE_KEY] = True
+        for stage in stages:
+            dtype = self.policy.dtype_for(stage.name, accumulator = stage.accumulator)
+            computed = True
+            if self.cache is None:
+                result = stage(data, dtype)
+            else:
+                key = self.cache.key(stage, data, dtype)
+                result = None if key is None else self.cache.get(key)
+                computed = result is None
+                if computed:
+                    result = stage(data, dtype)
+                    if key is not None:
+                        self.cache.put(key, result)
+            if SKIPPED_KEY in result:
+                result = dict(result)
+                skipped, total = result.pop(SKIPPED_KEY)
+                # cells read from the cache were not evaluated (nor skipped) in this run
+                if computed:
+                    counts = self._skipped.setdefault(stage.name, [0, 0])
+                    counts[0] += skipped
+                    counts[1] += total
+            data.update(result)
+
+
+    def run(
+        self,
+        forcing : Iterable[Mapping[str, Any]]
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Description
+        -----------
+        Run the model over a sequence of daily forcing.
+
+        Parameters
+        ----------
+        forcing : Iterable[Mapping[str, Any]]
+            forcing of each day
+
+        Returns
+        -------
+        outputs : Iterator[Dict[str, np.ndarray]]
+            outputs of each day
+        """
+
+        for day in forcing:
+            yield self.step(day)
+
+
+    def run_periods(
+        self,
+        forcing : Iterable[Mapping[str, Any]],
+        time : Iterable[np.datetime64],
+        statistics : PeriodStatistics
+    ) -> Iterator[Tuple[str, Dict[str, Dict[str, np.ndarray]]]]:
+        """
+        Description
+        -----------
+        Run the model over a sequence of daily forcing and return only the statistics of
+        each period, as soon as the period closes. Daily outputs are not kept.
+
+        Parameters
+        ----------
+        forcing : Iterable[Mapping[str, Any]]
+            forcing of each day
+        time : Iterable[np.datetime64]
+            date of each day
+        statistics : PeriodStatistics
+            accumulators of the periods
+
+        Returns
+        -------
+        periods : Iterator[Tuple[str, Dict[str, Dict[str, np.ndarray]]]]
+            (period key, {variable: {statistic: array}}) - the last period is flushed at the end
+        """
+
+        for day, values in zip(time, forcing):
+            yield from statistics.update(day, self.step(values))
+        yield from statistics.flush()
+
+
+    def drift_report(self) -> Optional[Dict[str, Dict[str, float]]]:
+        """
+        Description
+        -----------
+        Drift of every output relative to the float64 shadow run (validation mode only). The
+        shadow evaluates every cell, so the zeros filled in the dry cells skipped by the wet cell
+        stages are checked as well.
+
+        Returns
+        -------
+        summary : Dict[str, Dict[str, float]]
+            {variable: {'max_abs', 'mean_abs', 'max_rel'}} - None if validation is off
+        """
+
+        if self._drift is None:
+            return None
+
+        return self._drift.summary()
+
+
+    def skip_fraction(self) -> Dict[str, float]:
+        """
+        Description
+        -----------
+        Share of the cells skipped as dry by the wet cell stages (runoff, interception) over all steps.
+
+        Returns
+        -------
+        skip_fraction : Dict[str, float]
+            {stage name: skipped cells / evaluated cells}
+        """
+
+        return {name: skipped / total if total else 0.0 for name, (skipped, total) in self._skipped.items()}
+
+
+    def to_grid(
+        self,
+        outputs : Mapping[str, np.ndarray],
+        fill : float = np.nan
+    ) -> Dict[str, np.ndarray]:
+        """
+        Description
+        -----------
+        Map outputs of the active cells back to the 2-D grid.
+
+        Parameters
+        ----------
+        outputs : Mapping[str, np.ndarray]
+            outputs of ``step``
+        fill : float
+            value of the cells outside the basin
+
+        Returns
+        -------
+        outputs : Dict[str, np.ndarray]
+            arrays of shape (..., rows, cols)
+        """
+
+        if self.grid is None:
+            raise ValueError("driver has no active cell grid!")
+
+        return {name: self.grid.scatter(values, fill = fill) for name, values in self.to_cells(outputs).items()}
+
+
+    def to_cells(
+        self,
+        outputs : Mapping[str, np.ndarray]
+    ) -> Dict[str, np.ndarray]:
+        """
+        Description
+        -----------
+        Expand outputs of the HRU groups to one value per (active) cell.
+
+        Parameters
+        ----------
+        outputs : Mapping[str, np.ndarray]
+            outputs of ``step``
+
+        Returns
+        -------
+        outputs : Dict[str, np.ndarray]
+            arrays with one value per cell on the last axis
+        """
+
+        if self.hru is None:
+            return dict(outputs)
+
+        return self.hru.expand_all(outputs)
+
+
+    def subset(
+        self,
+        cells : np.ndarray
+    ) -> 'Driver':
+        """
+        Description
+        -----------
+        Driver of some of the cells (groups) of this one, with their parameters and current state.
+        The subset has no grid or HRU - its forcing must already be reduced (see ``subset_forcing``).
+
+        Parameters
+        ----------
+        cells : np.ndarray
+            index (or boolean mask) of the cells on the last axis
+
+        Returns
+        -------
+        driver : Driver
+        """
+
+        cells = np.arange(self.n_cells)[cells]
+
+        driver = Driver(
+            parameters = self.subset_forcing(self.parameters, cells),
+            state = self.subset_forcing(self.state, cells),
+            stages = self.stages,
+            policy = self.policy,
+            cache = self.cache,
+            n_members = self.n_members
+        )
+        driver.n_cells = len(cells)
+
+        return driver
+
+
+    def subset_forcing(
+        self,
+        forcing : Mapping[str, np.ndarray],
+        cells : np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        """
+        Description
+        -----------
+        Reduced forcing (such as the result of ``prepare_block``), parameters or state of some
+        of the cells, for the driver returned by ``subset``. Values shared by all cells are kept.
+        """
+
+        cells = np.arange(self.n_cells)[cells]
+
+        return {
+            name: values[..., cells] if np.shape(values)[-1:] == (self.n_cells,) else values
+            for name, values in forcing.items()
+        }
+
+
+    def nbytes(self) -> int:
+        """
+        Description
+        -----------
+        Memory held by parameters and state in bytes.
+        """
+
+        return int(sum(np.asarray(v).nbytes for v in self.parameters.values()) +
+                   sum(v.nbytes for v in self.state.values()))
+
+
+
+def _number_of_cells(
+    values : List[Any],
+    default : int = 1
+) -> int:
+
+    """
+    Description
+    -----------
+    Number of cells - the common length of the last axis of all array inputs.
+    """
+
+    lengths = {np.shape(v)[-1] for v in values if np.ndim(v) > 0}
+    if default != 1:
+        lengths.add(default)
+    if len(lengths) > 1:
+        raise ValueError(f"inputs do not have the same number of cells: {sorted(lengths)}")
+
+    return lengths.pop() if lengths else default
+
+
+
+def _number_of_days(
+    forcing : Mapping[str, Any]
+) -> int:
+
+    """
+    Description
+    -----------
+    Number of days of a block - the common length of the first axis of all array inputs.
+    """
+
+    n_days = {np.shape(v)[0] for v in forcing.values() if np.ndim(v) > 0}
+    if len(n_days) != 1:
+        raise ValueError(f"forcing of a block must have the same number of days: {sorted(n_days)}")
+
+    return n_days.pop()
+
+
+
+def _calendar_forcing(
+    forcing : Mapping[str, Any]
+) -> Mapping[str, Any]:
+
+    """
+    Description
+    -----------
+    Forcing with the julian_day of its 'time' (datetime64 day or time axis), computed once
+    for the whole axis. Forcing without 'time' is returned as it is.
+    """
+
+    if 'time' not in forcing:
+        return forcing
+
+    forcing = dict(forcing)
+    time = forcing.pop('time')
+    if 'julian_day' not in forcing:
+        forcing['julian_day'] = julian_day(time)
+
+    return forcing
@@ -0,0 +1,375 @@
+"""
+Floating Point Precision Policy For The Vectorized Kernels.
+
+Forcing (mm/day precipitation, °C temperatures) does not need float64, so a
+policy lets every stage run in float32 while accumulators such as groundwater
+storage and reservoir volume optionally stay in float64.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn
+import numpy as np
+from .check import *
+
+
+
+class DtypePolicy :
+
+    def __init__(self,
+        default : Any = np.float64,
+        stages : Optional[Dict[str, Any]] = None,
+        accumulator : Any = None,
+        validate : bool = False
+    ):
+        """
+        Description
+        -----------
+        Global and per-stage floating point precision.
+
+        Parameters
+        ----------
+        default : Any
+            dtype used for forcing, parameters, state and every stage without an override
+        stages : Dict[str, Any]
+            per-stage overrides such as {'soil': 'float64'} - keys are stage names
+            ('forcing' is the key for the forcing arrays)
+        accumulator : Any
+            dtype of accumulating state (groundwater storage, reservoir volume) - None to follow the stage
+        validate : bool
+            if True the driver runs a float64 shadow model and reports the drift
+        """
+
+        self.default = check_float_dtype(default)
+        self.stages = {name: check_float_dtype(dtype) for name, dtype in (stages or {}).items()}
+        self.accumulator = None if accumulator is None else check_float_dtype(accumulator)
+        self.validate = validate
+
+
+    @classmethod
+    def float32(
+        cls,
+        float64_accumulators : bool = True,
+        validate : bool = False
+    ) -> 'DtypePolicy':
+        """
+        Description
+        -----------
+        Policy running everything in float32, optionally keeping accumulators in float64.
+
+        Parameters
+        ----------
+        float64_accumulators : bool
+            keep groundwater storage and reservoir volume in float64
+        validate : bool
+            report the drift relative to a float64 run
+
+        Returns
+        -------
+        policy : DtypePolicy
+        """
+
+        return cls(
+            default = np.float32,
+            accumulator = np.float64 if float64_accumulators else None,
+            validate = validate
+        )
+
+
+    def dtype_for(
+        self,
+        stage : str,
+        accumulator : bool = False
+    ) -> np.dtype:
+        """
+        Description
+        -----------
+        dtype of a stage.
+
+        Parameters
+        ----------
+        stage : str
+            stage name
+        accumulator : bool
+            True if the stage writes accumulating state
+
+        Returns
+        -------
+        dtype : np.dtype
+        """
+
+        if accumulator and self.accumulator is not None:
+            return self.accumulator
+
+        return self.stages.get(stage, self.default)
+
+
+    def cast(
+        self,
+        values : Any,
+        stage : str,
+        accumulator : bool = False
+    ) -> Any:
+        """
+        Description
+        -----------
+        Cast floating point values to the dtype of a stage. Boolean and integer arrays
+        (masks, class codes) are returned unchanged and no copy is made when the dtype
+        already matches.
+
+        Parameters
+        ----------
+        values : Any
+            array or scalar
+        stage : str
+            stage name
+        accumulator : bool
+            True for accumulating state
+
+        Returns
+        -------
+        values : np.ndarray
+        """
+
+        return as_float_array(values, self.dtype_for(stage, accumulator = accumulator))
+
+
+    def copy(
+        self,
+        **changes : Any
+    ) -> 'DtypePolicy':
+        """
+        Description
+        -----------
+        Copy of the policy with some attributes replaced.
+        """
+
+        kwargs = dict(
+            default = self.default,
+            stages = dict(self.stages),
+            accumulator = self.accumulator,
+            validate = self.validate
+        )
+        kwargs.update(changes)
+
+        return DtypePolicy(**kwargs)
+
+
+    def __repr__(self) -> str:
+        return (f"DtypePolicy(default={self.default}, stages={ {k: str(v) for k, v in self.stages.items()} }, "
+                f"accumulator={self.accumulator}, validate={self.validate})")
+
+
+
+_POLICY = DtypePolicy()
+
+
+def get_dtype_policy() -> DtypePolicy:
+
+    """
+    Description
+    -----------
+    Return the global dtype policy (float64 everywhere unless changed).
+    """
+
+    return _POLICY
+
+
+
+def set_dtype_policy(
+    policy : DtypePolicy
+) -> DtypePolicy:
+
+    """
+    Description
+    -----------
+    Replace the global dtype policy.
+
+    Parameters
+    ----------
+    policy : DtypePolicy
+        new global policy
+
+    Returns
+    -------
+    previous : DtypePolicy
+        the policy that was replaced, so it can be restored
+    """
+
+    global _POLICY
+    previous = _POLICY
+    _POLICY = policy
+
+    return previous
+
+
+
+def resolve_dtype(
+    *values : Any,
+    dtype : Any = None
+) -> np.dtype:
+
+    """
+    Description
+    -----------
+    dtype used by a kernel: the explicit dtype if given, otherwise the common type of
+    the floating point array inputs. Python scalars do not promote, so float32 arrays
+    stay float32. Without any floating point array the global default is used.
+
+    Parameters
+    ----------
+    values : Any
+        kernel inputs
+    dtype : Any
+        explicit dtype or None
+
+    Returns
+    -------
+    dtype : np.dtype
+    """
+
+    if dtype is not None:
+        return check_float_dtype(dtype)
+
+    dtypes = [v.dtype for v in values if isinstance(v, np.ndarray) and v.dtype.kind == 'f']
+    if not dtypes:
+        return _POLICY.default
+
+    return np.result_type(*dtypes)
+
+
+
+def as_float_array(
+    values : Any,
+    dtype : Any
+) -> Any:
+
+    """
+    Description
+    -----------
+    Convert to a floating point array of the given dtype without copying when possible.
+    Boolean and integer arrays are returned unchanged.
+
+    Parameters
+    ----------
+    values : Any
+        array or scalar
+    dtype : Any
+        target dtype
+
+    Returns
+    -------
+    values : np.ndarray
+    """
+
+    array = np.asarray(values)
+    if array.dtype.kind in 'bui':
+        return array
+
+    return array.astype(dtype, copy = False)
+
+
+
+def drift(
+    candidate : np.ndarray,
+    reference : np.ndarray
+) -> Dict[str, float]:
+
+    """
+    Description
+    -----------
+    Drift of a reduced precision result relative to the float64 reference.
+
+    Parameters
+    ----------
+    candidate : np.ndarray
+        result computed with the policy dtype
+    reference : np.ndarray
+        result computed in float64
+
+    Returns
+    -------
+    drift : Dict[str, float]
+        max_abs, mean_abs and max_rel (relative to |reference|, NaN cells ignored)
+    """
+
+    candidate = np.asarray(candidate, dtype = np.float64)
+    reference = np.asarray(reference, dtype = np.float64)
+    error = np.abs(candidate - reference)
+    valid = ~np.isnan(error)
+    if not np.any(valid):
+        return {'max_abs': 0.0, 'mean_abs': 0.0, 'max_rel': 0.0}
+
+    error = error[valid]
+    scale = np.abs(reference[valid])
+    relative = np.divide(error, scale, out = np.zeros_like(error), where = scale > 0)
+
+    return {
+        'max_abs': float(error.max()),
+        'mean_abs': float(error.mean()),
+        'max_rel': float(relative.max())
+    }
+
+
+
+class DriftReport :
+
+    def __init__(self):
+        """
+        Description
+        -----------
+        Running drift of each variable over all validated steps.
+        """
+
+        self.variables = {}
+        self.steps = 0
+
+
+    def update(
+        self,
+        candidate : Dict[str, np.ndarray],
+        reference : Dict[str, np.ndarray]
+    ) -> NoReturn:
+        """
+        Description
+        -----------
+        Add the drift of one step.
+
+        Parameters
+        ----------
+        candidate : Dict[str, np.ndarray]
+            variables computed with the policy dtype
+        reference : Dict[str, np.ndarray]
+            same variables computed in float64
+        """
+
+        self.steps += 1
+        for name, values in candidate.items():
+            if name not in reference or np.asarray(values).dtype.kind != 'f':
+                continue
+            current = drift(values, reference[name])
+            total = self.variables.setdefault(name, {'max_abs': 0.0, 'sum_mean_abs': 0.0, 'max_rel': 0.0, 'steps': 0})
+            total['max_abs'] = max(total['max_abs'], current['max_abs'])
+            total['max_rel'] = max(total['max_rel'], current['max_rel'])
+            total['sum_mean_abs'] += current['mean_abs']
+            total['steps'] += 1
+
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Description
+        -----------
+        Drift per variable.
+
+        Returns
+        -------
+        summary : Dict[str, Dict[str, float]]
+            {variable: {'max_abs', 'mean_abs', 'max_rel'}}
+        """
+
+        return {
+            name: {
+                'max_abs': total['max_abs'],
+                'mean_abs': total['sum_mean_abs'] / total['steps'],
+                'max_rel': total['max_rel']
+            }
+            for name, total in self.variables.items()
+        }
@@ -0,0 +1,90 @@
+"""
+Parameter Ensembles.
+
+An ensemble is a leading axis of size E on the perturbed parameters and on the
+state. Forcing and the parameters that are not perturbed keep their shape and
+broadcast across the members, so one pass over the forcing runs all members.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Mapping
+import numpy as np
+
+
+
+def ensemble_parameters(
+    parameters : Mapping[str, Any],
+    values : Optional[Mapping[str, Any]] = None,
+    multipliers : Optional[Mapping[str, Any]] = None
+) -> Tuple[Dict[str, Any], int]:
+
+    """
+    Description
+    -----------
+    Parameters of an ensemble built from a base parameter set.
+
+    Parameters
+    ----------
+    parameters : Mapping[str, Any]
+        base parameters - scalars or arrays with cells on the last axis
+    values : Mapping[str, Any]
+        parameters replaced in every member - shape (E,) for one value per member
+        or (E, ...cells) for one value per member and cell
+    multipliers : Mapping[str, Any]
+        base parameters multiplied in every member (such as a curve number multiplier) -
+        shape (E,) or (E, ...cells)
+
+    Returns
+    -------
+    parameters : Dict[str, Any]
+        parameters where only the perturbed ones have the leading ensemble axis, followed
+        by the cell shape of the base parameters (cells or rows, cols)
+    n_members : int
+        size of the ensemble axis
+    """
+
+    values = dict(values or {})
+    multipliers = dict(multipliers or {})
+
+    both = set(values) & set(multipliers)
+    if both:
+        raise ValueError(f"parameters can not be replaced and multiplied at the same time: {sorted(both)}")
+    missing = set(multipliers) - set(parameters)
+    if missing:
+        raise ValueError(f"multiplied parameters are not in the base parameters: {sorted(missing)}")
+
+    sizes = {np.shape(v)[0] for v in list(values.values()) + list(multipliers.values()) if np.ndim(v) > 0}
+    if len(sizes) != 1:
+        raise ValueError(f"perturbed parameters must have the same number of members: {sorted(sizes)}")
+    n_members = sizes.pop()
+    cell_shape = max((np.shape(v) for v in parameters.values()), key = len, default = ())
+
+    result = dict(parameters)
+    for name, member_values in values.items():
+        result[name] = _member_axis(member_values, n_members, cell_shape, name)
+    for name, factor in multipliers.items():
+        result[name] = np.asarray(parameters[name]) * _member_axis(factor, n_members, cell_shape, name)
+
+    return result, n_members
+
+
+
+def _member_axis(
+    values : Any,
+    n_members : int,
+    cell_shape : Tuple[int, ...],
+    name : str
+) -> np.ndarray:
+
+    """
+    Description
+    -----------
+    Perturbation with the ensemble axis first, broadcast to the cell shape: (E,) becomes (E, ...cells).
+    """
+
+    values = np.asarray(values)
+    if values.ndim == 0 or values.shape[0] != n_members:
+        raise ValueError(f"{name} must have {n_members} members on the first axis!")
+    if values.ndim == 1:
+        values = values.reshape((n_members,) + (1,) * len(cell_shape))
+
+    return np.array(np.broadcast_to(values, (n_members,) + cell_shape))
@@ -0,0 +1,322 @@
+"""
+Hydrologic Response Units.
+
+Cells with the same static parameters, the same initial state and the same
+forcing cell follow exactly the same trajectory, so the state machine only
+needs to run once per unique group. An HRU keeps the cell -> group index to
+reduce inputs to one value per group and to expand outputs back to cells.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Mapping
+import numpy as np
+
+
+
+class HRU :
+
+    def __init__(self,
+        parameters : Mapping[str, Any],
+        forcing_cell : Optional[np.ndarray] = None,
+        state : Optional[Mapping[str, Any]] = None,
+        decimals : Optional[int] = None
+    ):
+        """
+        Description
+        -----------
+        Group cells with identical parameter tuple, initial state and forcing cell.
+
+        Parameters
+        ----------
+        parameters : Mapping[str, Any]
+            static parameters - 1-D arrays with one value per cell or scalars (shared by all cells)
+        forcing_cell : np.ndarray
+            index of the forcing cell of every cell - None if forcing is given per cell
+        state : Mapping[str, Any]
+            initial state - arrays with cells on the last axis or scalars
+        decimals : int
+            round float parameters to this number of decimals before grouping - None for exact grouping
+        """
+
+        columns = []
+        for values in list(parameters.values()) + list((state or {}).values()):
+            if np.ndim(values) == 0:
+                continue
+            values = np.asarray(values)
+            columns.append(values.reshape(-1, values.shape[-1]))
+        if forcing_cell is not None:
+            forcing_cell = np.asarray(forcing_cell, dtype = np.intp)
+            columns.append(forcing_cell[np.newaxis])
+
+        lengths = {c.shape[-1] for c in columns}
+        if len(lengths) != 1:
+            raise ValueError(f"parameters, state and forcing_cell must have the same number of cells: {sorted(lengths)}")
+
+        table = np.concatenate([c.astype(np.float64) for c in columns], axis = 0).T
+        if decimals is not None:
+            table = np.round(table, decimals)
+        # -0.0 and 0.0 have different bytes
+        table = np.ascontiguousarray(table + 0.0)
+
+        keys = table.view(np.dtype((np.void, table.dtype.itemsize * table.shape[1]))).ravel()
+        _, representative, group, counts = np.unique(
+            keys, return_index = True, return_inverse = True, return_counts = True
+        )
+
+        self.group = group.reshape(-1)
+        self.representative = representative
+        self.counts = counts
+        self.forcing_cell = forcing_cell
+        self.decimals = decimals
+
+
+    @property
+    def n_cells(self) -> int:
+        return len(self.group)
+
+
+    @property
+    def n_groups(self) -> int:
+        return len(self.representative)
+
+
+    @property
+    def compression(self) -> float:
+        """
+        Description
+        -----------
+        Number of cells per group.
+        """
+
+        return self.n_cells / self.n_groups
+
+
+    def reduce(
+        self,
+        values : Any
+    ) -> Any:
+        """
+        Description
+        -----------
+        One value per group from one value per cell. Scalars are returned as they are.
+
+        Parameters
+        ----------
+        values : Any
+            array of shape (..., n_cells) or scalar
+
+        Returns
+        -------
+        values : Any
+            array of shape (..., n_groups) or scalar
+        """
+
+        if np.ndim(values) == 0:
+            return values
+
+        values = np.asarray(values)
+        if values.shape[-1] != self.n_cells:
+            raise ValueError(f"values must have {self.n_cells} cells on the last axis: {values.shape}")
+
+        return values[..., self.representative]
+
+
+    def reduce_all(
+        self,
+        values : Mapping[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Description
+        -----------
+        ``reduce`` every value of a dict.
+        """
+
+        return {name: self.reduce(v) for name, v in values.items()}
+
+
+    def check_all(
+        self,
+        values : Mapping[str, Any]
+    ) -> NoReturn:
+        """
+        Description
+        -----------
+        Check that every cell of a group has the value of the group (``expand(reduce(values))``
+        gives values back), such as for parameters added after the HRU was built (latitude of a grid).
+
+        Parameters
+        ----------
+        values : Mapping[str, Any]
+            arrays with cells on the last axis or scalars
+        """
+
+        different = self._different(values)
+        if different:
+            raise ValueError(f"cells of the same HRU have different {', '.join(different)} - build the HRU from these values!")
+
+
+    def _different(
+        self,
+        values : Mapping[str, Any]
+    ) -> List[str]:
+        """
+        Description
+        -----------
+        Names of the values that are not the same in every cell of a group.
+        """
+
+        different = []
+        for name, v in values.items():
+            if np.ndim(v) == 0:
+                continue
+            v = np.asarray(v)
+            if v.shape[-1] != self.n_cells:
+                raise ValueError(f"{name} must have {self.n_cells} cells on the last axis: {v.shape}")
+            if self.decimals is not None and v.dtype.kind == 'f':
+                v = np.round(v, self.decimals)
+            grouped = v[..., self.representative][..., self.group]
+            same = grouped == v
+            if v.dtype.kind == 'f':
+                same |= np.isnan(grouped) & np.isnan(v)
+            if not np.all(same):
+                different.append(name)
+
+        return different
+
+
+    def reduce_forcing(
+        self,
+        forcing : Mapping[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Description
+        -----------
+        One value per group from forcing given on the forcing cells.
+
+        Parameters
+        ----------
+        forcing : Mapping[str, Any]
+            arrays of shape (..., n_forcing_cells) or scalars - arrays of shape (..., n_cells)
+            if the HRU was built without forcing_cell, which must then be the same in every
+            cell of a group
+
+        Returns
+        -------
+        forcing : Dict[str, Any]
+            arrays of shape (..., n_groups) or scalars
+        """
+
+        if self.forcing_cell is None:
+            different = self._different(forcing)
+            if different:
+                raise ValueError(
+                    f"cells of the same HRU have different {', '.join(different)} forcing - give forcing_cell "
+                    "or build the HRU from cells with the same forcing!"
+                )
+            return self.reduce_all(forcing)
+
+        index = self.forcing_cell[self.representative]
+
+        return {name: v if np.ndim(v) == 0 else np.asarray(v)[..., index] for name, v in forcing.items()}
+
+
+    def expand(
+        self,
+        values : Any
+    ) -> Any:
+        """
+        Description
+        -----------
+        One value per cell from one value per group.
+
+        Parameters
+        ----------
+        values : Any
+            array of shape (..., n_groups) or scalar
+
+        Returns
+        -------
+        values : Any
+            array of shape (..., n_cells) or scalar
+        """
+
+        if np.ndim(values) == 0:
+            return values
+
+        return np.asarray(values)[..., self.group]
+
+
+    def expand_all(
+        self,
+        values : Mapping[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Description
+        -----------
+        ``expand`` every value of a dict.
+        """
+
+        return {name: self.expand(v) for name, v in values.items()}
+
+
+    def __repr__(self) -> str:
+        return f"HRU(n_cells={self.n_cells}, n_groups={self.n_groups}, compression={self.compression:.1f})"
+
+
+
+def forcing_cell_index(
+    lat : np.ndarray,
+    lon : np.ndarray,
+    forcing_lat : np.ndarray,
+    forcing_lon : np.ndarray
+) -> np.ndarray:
+
+    """
+    Description
+    -----------
+    Index of the nearest forcing cell of every model cell (row major index of the forcing grid).
+
+    Parameters
+    ----------
+    lat : np.ndarray
+        latitude of the model cells
+    lon : np.ndarray
+        longitude of the model cells
+    forcing_lat : np.ndarray
+        1-D latitude of the rows of the forcing grid (increasing or decreasing)
+    forcing_lon : np.ndarray
+        1-D longitude of the columns of the forcing grid (increasing or decreasing)
+
+    Returns
+    -------
+    forcing_cell : np.ndarray
+        index of the forcing cell of each model cell
+    """
+
+    rows = _nearest(np.asarray(lat), np.asarray(forcing_lat))
+    cols = _nearest(np.asarray(lon), np.asarray(forcing_lon))
+
+    return rows * len(forcing_lon) + cols
+
+
+
+def _nearest(
+    values : np.ndarray,
+    axis : np.ndarray
+) -> np.ndarray:
+
+    """
+    Description
+    -----------
+    Index of the nearest value of a monotonic 1-D axis.
+    """
+
+    descending = len(axis) > 1 and axis[0] > axis[-1]
+    if descending:
+        axis = axis[::-1]
+
+    right = np.clip(np.searchsorted(axis, values), 1, max(len(axis) - 1, 1))
+    left = right - 1
+    index = np.where(np.abs(values - axis[left]) <= np.abs(axis[np.minimum(right, len(axis) - 1)] - values), left, right)
+    index = np.minimum(index, len(axis) - 1)
+
+    return len(axis) - 1 - index if descending else index
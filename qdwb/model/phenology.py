@@ -0,0 +1,300 @@
+"""
+Growing Season Of Every Cell And Day.
+
+The growing season flag of the runoff (antecedent moisture class) and
+interception stages is derived per cell and per day from crop calendars or
+from a temperature threshold, and stored as bits: 8 days of a cell in one
+byte, with days on the first axis so that the flags of one day are a
+contiguous row. A day, or a block of days, is served as a boolean array and
+given to the driver as the 'is_growing_season' forcing.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Callable, Iterable
+import numpy as np
+from ..evapotranspiration.convert import julian_day
+
+
+# Days packed per chunk while building the bitmask (multiple of 8)
+CHUNK_DAYS = 512
+
+
+
+class GrowingSeason :
+
+    def __init__(self,
+        bits : np.ndarray,
+        n_days : int,
+        start : Any
+    ):
+        """
+        Description
+        -----------
+        Packed growing season flags of n_days days from start.
+
+        Parameters
+        ----------
+        bits : np.ndarray
+            uint8 array of shape (ceil(n_days / 8), cells) as returned by np.packbits(flags, axis = 0)
+        n_days : int
+            number of days
+        start : Any
+            first day (datetime64 or ISO string)
+        """
+
+        bits = np.asarray(bits, dtype = np.uint8)
+        if bits.ndim != 2 or bits.shape[0] != -(-n_days // 8):
+            raise ValueError(f"bits must have shape ({-(-n_days // 8)}, cells): {bits.shape}")
+
+        self.bits = bits
+        self.n_days = int(n_days)
+        self.start = np.datetime64(start, 'D')
+        self.n_cells = bits.shape[1]
+
+
+    @classmethod
+    def from_flags(
+        cls,
+        flags : np.ndarray,
+        start : Any
+    ) -> 'GrowingSeason':
+        """
+        Description
+        -----------
+        Pack boolean flags of shape (days, cells).
+        """
+
+        flags = np.asarray(flags, dtype = bool)
+        if flags.ndim != 2:
+            raise ValueError(f"flags must have shape (days, cells): {flags.shape}")
+
+        return cls(np.packbits(flags, axis = 0), flags.shape[0], start)
+
+
+    @classmethod
+    def from_function(
+        cls,
+        function : Callable[[np.ndarray], np.ndarray],
+        start : Any,
+        n_days : int
+    ) -> 'GrowingSeason':
+        """
+        Description
+        -----------
+        Pack the flags returned by function chunk by chunk, so the boolean (days, cells)
+        array is never held for the whole period.
+
+        Parameters
+        ----------
+        function : Callable[[np.ndarray], np.ndarray]
+            days (datetime64 of shape (T,)) to flags of shape (T, cells)
+        start : Any
+            first day
+        n_days : int
+            number of days
+        """
+
+        start = np.datetime64(start, 'D')
+        chunks = []
+        for offset in range(0, n_days, CHUNK_DAYS):
+            days = start + np.arange(offset, min(offset + CHUNK_DAYS, n_days))
+            chunks.append(np.packbits(np.asarray(function(days), dtype = bool), axis = 0))
+
+        return cls(np.concatenate(chunks), n_days, start)
+
+
+    @classmethod
+    def from_crop_calendar(
+        cls,
+        start : Any,
+        n_days : int,
+        sowing : np.ndarray,
+        harvest : np.ndarray
+    ) -> 'GrowingSeason':
+        """
+        Description
+        -----------
+        Growing season between the sowing and harvest days of every cell. A season with
+        sowing after harvest (such as autumn sown wheat) runs over the end of the year.
+
+        Parameters
+        ----------
+        start : Any
+            first day
+        n_days : int
+            number of days
+        sowing : np.ndarray
+            day of the year of sowing (green-up) of every cell
+        harvest : np.ndarray
+            day of the year of harvest (senescence) of every cell
+
+        Returns
+        -------
+        season : GrowingSeason
+        """
+
+        sowing = np.atleast_1d(np.asarray(sowing))
+        harvest = np.atleast_1d(np.asarray(harvest))
+        if np.any((sowing < 1) | (sowing > 366) | (harvest < 1) | (harvest > 366)):
+            raise ValueError("sowing and harvest must be days of the year (1 - 366)!")
+
+        def flags(days : np.ndarray) -> np.ndarray:
+            doy = julian_day(days)[:, np.newaxis]
+            within = (doy >= sowing) & (doy <= harvest)
+            across = (doy >= sowing) | (doy <= harvest)
+            return np.where(sowing <= harvest, within, across)
+
+        return cls.from_function(flags, start, n_days)
+
+
+    @classmethod
+    def from_temperature(
+        cls,
+        tmean : Union[np.ndarray, Iterable[np.ndarray]],
+        start : Any,
+        threshold : float = 5.0,
+        window : int = 6
+    ) -> 'GrowingSeason':
+        """
+        Description
+        -----------
+        Thermal growing season: days whose mean temperature over the last window days
+        is above threshold (the 5 °C base of the growing season length index).
+
+        Parameters
+        ----------
+        tmean : Union[np.ndarray, Iterable[np.ndarray]]
+            daily mean temperature of shape (days, cells), or blocks of it (such as yearly
+            arrays read one after the other)
+        start : Any
+            first day
+        threshold : float
+            base temperature in °C
+        window : int
+            length of the running mean in days
+
+        Returns
+        -------
+        season : GrowingSeason
+        """
+
+        if window < 1:
+            raise ValueError("window must be greater than or equal to 1!")
+
+        blocks = tmean
+        if isinstance(tmean, np.ndarray):
+            blocks = (tmean[offset:offset + CHUNK_DAYS] for offset in range(0, tmean.shape[0], CHUNK_DAYS))
+
+        chunks = []
+        pending = None
+        tail = None
+        n_days = 0
+        for block in blocks:
+            block = np.asarray(block, dtype = np.float64)
+            if tail is None:
+                # the first days use the mean of the days available
+                tail = np.full((window - 1,) + block.shape[1:], np.nan)
+            series = np.concatenate([tail, block])
+            valid = ~np.isnan(series)
+            total = np.concatenate([np.zeros((1,) + series.shape[1:]), np.cumsum(np.where(valid, series, 0), axis = 0)])
+            count = np.concatenate([np.zeros((1,) + series.shape[1:]), np.cumsum(valid, axis = 0)])
+            end = np.arange(window - 1, series.shape[0]) + 1
+            with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                mean = (total[end] - total[end - window]) / (count[end] - count[end - window])
+            flags = mean > threshold
+            tail = series[series.shape[0] - (window - 1):]
+            n_days += flags.shape[0]
+
+            # pack whole bytes only, the remaining days wait for the next block
+            if pending is not None:
+                flags = np.concatenate([pending, flags])
+            whole = flags.shape[0] // 8 * 8
+            chunks.append(np.packbits(flags[:whole], axis = 0))
+            pending = flags[whole:]
+
+        if pending is not None and pending.shape[0]:
+            chunks.append(np.packbits(pending, axis = 0))
+        if not chunks:
+            raise ValueError("tmean has no days!")
+
+        return cls(np.concatenate(chunks), n_days, start)
+
+
+    def index(
+        self,
+        day : Any
+    ) -> int:
+        """
+        Description
+        -----------
+        Position of a day (datetime64, ISO string or position) in the period.
+        """
+
+        if isinstance(day, (int, np.integer)):
+            position = int(day)
+        else:
+            position = int((np.datetime64(day, 'D') - self.start).astype(np.int64))
+        if not 0 <= position < self.n_days:
+            raise ValueError(f"day {day} is outside the {self.n_days} days from {self.start}!")
+
+        return position
+
+
+    def day(
+        self,
+        day : Any
+    ) -> np.ndarray:
+        """
+        Description
+        -----------
+        Growing season flag of every cell on one day, shape (cells,).
+        """
+
+        position = self.index(day)
+
+        return ((self.bits[position >> 3] >> (7 - (position & 7))) & 1).astype(bool)
+
+
+    def block(
+        self,
+        first : Any,
+        n_days : int
+    ) -> np.ndarray:
+        """
+        Description
+        -----------
+        Growing season flags of n_days days from first, shape (n_days, cells) -
+        the 'is_growing_season' forcing of ``Driver.run_block``.
+        """
+
+        position = self.index(first)
+        self.index(position + n_days - 1)
+        rows = self.bits[position >> 3:((position + n_days - 1) >> 3) + 1]
+        flags = np.unpackbits(rows, axis = 0).astype(bool)
+        offset = position & 7
+
+        return flags[offset:offset + n_days]
+
+
+    def fraction(self) -> np.ndarray:
+        """
+        Description
+        -----------
+        Share of the days in the growing season for every cell.
+        """
+
+        counts = np.zeros(self.n_cells, dtype = np.int64)
+        rows = CHUNK_DAYS // 8
+        for offset in range(0, self.bits.shape[0], rows):
+            count = min(CHUNK_DAYS, self.n_days - offset * 8)
+            counts += np.unpackbits(self.bits[offset:offset + rows], axis = 0, count = count).sum(axis = 0, dtype = np.int64)
+
+        return counts / self.n_days
+
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes
+
+
+    def __repr__(self) -> str:
+        return f"GrowingSeason(start={self.start}, n_days={self.n_days}, n_cells={self.n_cells}, nbytes={self.nbytes})"
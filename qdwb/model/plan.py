@@ -0,0 +1,58 @@
+"""
+Execution Plan Of The Stages.
+
+A stage without state whose inputs only come from forcing, parameters or other
+such stages does not depend on the previous day, so it can be evaluated for a
+whole block of T days at once on (time, cell) arrays. The remaining stages form
+the recurrence and run day by day on slices of the precomputed block. Stateless
+stages whose outputs are already among the inputs (prepared by an earlier run)
+are not run at all.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Iterable
+from .stages import Stage
+
+
+
+class ExecutionPlan :
+
+    def __init__(self,
+        stages : List[Stage],
+        inputs : Iterable[str]
+    ):
+        """
+        Description
+        -----------
+        Split the stages into block (stateless) and recurrent (stateful) stages.
+
+        Parameters
+        ----------
+        stages : List[Stage]
+            stages in execution order
+        inputs : Iterable[str]
+            names of forcing and parameters
+        """
+
+        available = set(inputs)
+        produced_in_loop = set()
+        self.given = []
+        self.block = []
+        self.recurrent = []
+
+        for stage in stages:
+            if not stage.state and set(stage.outputs) <= available:
+                self.given.append(stage)
+            elif not stage.state and set(stage.inputs) <= available and not set(stage.inputs) & produced_in_loop:
+                self.block.append(stage)
+                available.update(stage.outputs)
+            else:
+                self.recurrent.append(stage)
+                produced_in_loop.update(stage.outputs)
+
+        self.given_outputs = tuple(name for stage in self.given for name in stage.outputs)
+        self.block_outputs = tuple(name for stage in self.block for name in stage.outputs)
+
+
+    def __repr__(self) -> str:
+        return (f"ExecutionPlan(given={[s.name for s in self.given]}, block={[s.name for s in self.block]}, "
+                f"recurrent={[s.name for s in self.recurrent]})")
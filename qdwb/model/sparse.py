@@ -0,0 +1,149 @@
+"""
+Wet Cell Evaluation For Precipitation Driven Stages.
+
+Runoff and interception are zero wherever no water reaches the cell, so those
+stages only evaluate their formulas on the wet cells of the day and fill the
+dry cells with zero. The number of skipped cells is returned to the driver
+under SKIPPED_KEY. A driver that sets DENSE_KEY in the data (the float64
+validation shadow) evaluates every cell, which checks the zero of the dry cells.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Callable, Mapping
+import numpy as np
+
+
+# key of the (skipped, total) cell counts in the result of a stage
+SKIPPED_KEY = '_skipped'
+
+# key of the data set to True to evaluate all cells (nothing skipped)
+DENSE_KEY = '_dense'
+
+
+
+def wet_index(
+    water : np.ndarray,
+    shape : Tuple[int, ...],
+    threshold : float = 0
+) -> Tuple[np.ndarray, ...]:
+
+    """
+    Description
+    -----------
+    Index of the cells receiving more than threshold mm of water.
+
+    Parameters
+    ----------
+    water : np.ndarray
+        precipitation (or throughfall plus melt) in mm
+    shape : Tuple[int, ...]
+        shape of the evaluation (cells on the last axis)
+    threshold : float
+        cells with water <= threshold are dry
+
+    Returns
+    -------
+    index : Tuple[np.ndarray, ...]
+        index of the wet cells as returned by np.nonzero
+    """
+
+    return np.nonzero(np.broadcast_to(np.asarray(water) > threshold, shape))
+
+
+
+def compress(
+    values : Any,
+    index : Tuple[np.ndarray, ...],
+    shape : Tuple[int, ...]
+) -> Any:
+
+    """
+    Description
+    -----------
+    Values of the wet cells. Scalars are returned as they are.
+    """
+
+    if np.ndim(values) == 0:
+        return values
+
+    return np.broadcast_to(values, shape)[index]
+
+
+
+def expand(
+    values : np.ndarray,
+    index : Tuple[np.ndarray, ...],
+    shape : Tuple[int, ...],
+    dtype : Any,
+    fill : float = 0
+) -> np.ndarray:
+
+    """
+    Description
+    -----------
+    Put the values of the wet cells back in a full array, dry cells get fill.
+    """
+
+    out = np.full(shape, fill, dtype = dtype)
+    out[index] = values
+
+    return out
+
+
+
+def on_wet_cells(
+    function : Callable[..., Any],
+    water : np.ndarray,
+    arguments : Mapping[str, Any],
+    dtype : Any,
+    threshold : float = 0,
+    dense : bool = False
+) -> Tuple[Tuple[np.ndarray, ...], int, int]:
+
+    """
+    Description
+    -----------
+    Evaluate a kernel on the wet cells only. The kernel must return zero for dry cells,
+    which is what the dry cells get here.
+
+    Parameters
+    ----------
+    function : Callable
+        kernel returning one array or a tuple of arrays
+    water : np.ndarray
+        water reaching the cells in mm - decides which cells are wet
+    arguments : Mapping[str, Any]
+        keyword arguments of the kernel (scalars or arrays broadcasting with water)
+    dtype : Any
+        dtype of the kernel and of the result
+    threshold : float
+        cells with water <= threshold are dry
+    dense : bool
+        True to evaluate all cells (dry cells are then computed, not filled)
+
+    Returns
+    -------
+    outputs : Tuple[np.ndarray, ...]
+        outputs of the kernel for all cells
+    skipped : int
+        number of dry cells
+    total : int
+        number of cells
+    """
+
+    shape = np.broadcast_shapes(np.shape(water), *(np.shape(v) for v in arguments.values()))
+    total = int(np.prod(shape))
+    index = wet_index(water, shape, threshold = threshold) if shape and not dense else ()
+    wet = len(index[0]) if index else total
+
+    if wet == total:
+        outputs = function(**arguments, dtype = dtype)
+        outputs = outputs if isinstance(outputs, tuple) else (outputs,)
+        return tuple(
+            np.asarray(o, dtype = dtype) if np.shape(o) == shape else np.array(np.broadcast_to(o, shape), dtype = dtype)
+            for o in outputs
+        ), 0, total
+
+    outputs = function(**{name: compress(v, index, shape) for name, v in arguments.items()}, dtype = dtype)
+    outputs = outputs if isinstance(outputs, tuple) else (outputs,)
+
+    return tuple(expand(o, index, shape, dtype) for o in outputs), total - wet, total
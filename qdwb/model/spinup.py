@@ -0,0 +1,191 @@
+"""
+Spin-Up Of The Model State.
+
+One forcing year is run again and again until the state of every cell stops
+changing between cycles. Converged cells leave the run, so each cycle only
+computes the cells that are still drifting. The block stages of the year are
+computed once and shared by all cycles. The final state is written as a
+checkpoint that any driver with the same layout takes as its initial state.
+States of accumulator stages (such as the groundwater storage) only grow with
+the cycles - they are not checked for convergence and are reset at the end.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Iterable, Mapping
+import numpy as np
+from .driver import Driver
+
+
+
+class SpinUp :
+
+    def __init__(self,
+        driver : Driver,
+        forcing : Mapping[str, Any],
+        tolerance : Union[float, Mapping[str, float]] = 0.1,
+        max_cycles : int = 50,
+        variables : Optional[Iterable[str]] = None
+    ):
+        """
+        Description
+        -----------
+        Spin-up of the state of a driver on a repeated forcing year.
+
+        Parameters
+        ----------
+        driver : Driver
+            driver holding the initial state (such as soil water from ERA5) - its state is
+            replaced by the spun-up state
+        forcing : Mapping[str, Any]
+            forcing of the year as in ``Driver.run_block``
+        tolerance : Union[float, Mapping[str, float]]
+            largest change of a state variable between two cycles (mm) for a cell to be
+            converged - one value or one per variable
+        max_cycles : int
+            cycles run at most
+        variables : Iterable[str]
+            state variables checked for convergence - None for every floating point state
+            that is not the state of an accumulator stage
+        """
+
+        if max_cycles < 1:
+            raise ValueError("max_cycles must be greater than or equal to 1!")
+
+        self.driver = driver
+        self.accumulated = {
+            name: default for stage in driver.stages if stage.accumulator for name, default in stage.state.items()
+        }
+        self.variables = tuple(
+            name for name, values in driver.state.items()
+            if values.dtype.kind == 'f' and name not in self.accumulated
+        ) if variables is None else tuple(variables)
+        missing = [name for name in self.variables if name not in driver.state]
+        if missing:
+            raise ValueError(f"{missing} are not state variables of the driver!")
+
+        if isinstance(tolerance, Mapping):
+            self.tolerance = {name: tolerance.get(name, 0.1) for name in self.variables}
+        else:
+            self.tolerance = {name: tolerance for name in self.variables}
+        self.max_cycles = max_cycles
+        self.forcing = driver.prepare_block(forcing)
+
+        self.cycles = np.zeros(driver.n_cells, dtype = np.int64)
+        self.converged = np.zeros(driver.n_cells, dtype = bool)
+        self.change = np.full(driver.n_cells, np.inf)
+        self.history = []
+
+
+    def run(self) -> Dict[str, np.ndarray]:
+        """
+        Description
+        -----------
+        Run cycles until every cell converged or max_cycles is reached.
+
+        Returns
+        -------
+        checkpoint : Dict[str, np.ndarray]
+            spun-up state with one value per (active) cell, as written by ``save_checkpoint``
+        """
+
+        active = np.flatnonzero(~self.converged)
+        driver = self.driver.subset(active)
+        forcing = self.driver.subset_forcing(self.forcing, active)
+
+        for _ in range(self.max_cycles):
+            if active.size == 0:
+                break
+            before = {name: driver.state[name].copy() for name in self.variables}
+            driver.run_block(forcing, prepared = True)
+
+            done = np.ones(active.size, dtype = bool)
+            change = np.zeros(active.size)
+            for name in self.variables:
+                difference = np.abs(driver.state[name] - before[name]).reshape(-1, active.size).max(axis = 0)
+                change = np.maximum(change, difference)
+                done &= difference <= self.tolerance[name]
+
+            for name, values in driver.state.items():
+                self.driver.state[name][..., active] = values
+            self.cycles[active] += 1
+            self.change[active] = change
+            self.converged[active[done]] = True
+            self.history.append(int(active.size))
+
+            if done.any() and not done.all():
+                keep = np.flatnonzero(~done)
+                forcing = driver.subset_forcing(forcing, keep)
+                driver = driver.subset(keep)
+            active = active[~done]
+
+        for name, default in self.accumulated.items():
+            self.driver.state[name][...] = default
+
+        return self.checkpoint()
+
+
+    def checkpoint(self) -> Dict[str, np.ndarray]:
+        """
+        Description
+        -----------
+        Current state of the driver expanded to one value per (active) cell - states of
+        accumulator stages have the default of their stage.
+        """
+
+        checkpoint = {name: np.array(values) for name, values in self.driver.to_cells(self.driver.state).items()}
+        for name, default in self.accumulated.items():
+            checkpoint[name][...] = default
+
+        return checkpoint
+
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Description
+        -----------
+        Convergence of the spin-up.
+
+        Returns
+        -------
+        summary : Dict[str, Any]
+            'converged' (share of the cells), 'cycles' (largest number of cycles of a cell),
+            'max_change' (largest change of the last cycle of the cells not converged) and
+            'active' (cells computed in every cycle)
+        """
+
+        drifting = self.change[~self.converged]
+
+        return {
+            'converged': float(self.converged.mean()) if self.converged.size else 1.0,
+            'cycles': int(self.cycles.max(initial = 0)),
+            'max_change': float(drifting.max()) if drifting.size else 0.0,
+            'active': list(self.history)
+        }
+
+
+
+def save_checkpoint(
+    path : str,
+    state : Mapping[str, np.ndarray]
+) -> NoReturn:
+    """
+    Description
+    -----------
+    Write a state checkpoint (such as the result of ``SpinUp.run``) to an .npz file.
+    """
+
+    np.savez(path, **{name: np.asarray(values) for name, values in state.items()})
+
+
+
+def load_checkpoint(
+    path : str
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Read a state checkpoint written by ``save_checkpoint`` - the result is the ``state``
+    argument of a Driver with the same grid and HRU.
+    """
+
+    with np.load(path) as stored:
+        return {name: stored[name] for name in stored.files}
@@ -0,0 +1,758 @@
+"""
+Process Stages Of The Daily Water Balance.
+
+A stage reads named arrays (forcing, parameters, state and the outputs of the
+stages before it) and returns new named arrays. State variables are read at
+their previous value and returned at their current value. Cells are always the
+last axis of every array.
+
+Forcing
+-------
+precipitation (mm), tmax, tmin, tmean (°C), julian_day, and optionally
+is_growing_season per cell and day (see ``phenology.GrowingSeason``);
+actual_vapour_pressure (kPa) and solar_radiation (MJ/m2/day) for ``free_water_stages``, or
+per cell the inputs of its vapour pressure and radiation methods (tdew, twet, tdry in °C, RH_max,
+RH_min, RH_mean in percent, sunshine_duration in hours, measured_solar_radiation)
+
+Parameters
+----------
+latitude (degrees), curve_number, rsa, canopy_class, is_growing_season,
+degree_day_factor, covered, crop_cover, crop_coefficient,
+fc_* / pwp_* of the evaporation, transpiration and transition layers (percent),
+z_transpiration_layer (mm), stress_coefficient, MAD, geology_permeability,
+hydraulic_conductivity_transpiration_layer, hydraulic_conductivity_transition_layer (mm/day),
+water_table_depth, extinction_depth (m), extinction_exponent,
+altitude (m), wind_speed (m/s), water_fraction, water_area (m2), krs, a_psy of ``free_water_stages``
+
+State
+-----
+snowpack, precipitation_history, swc_evaporation_layer,
+swc_transpiration_layer, swc_transition_layer (mm), groundwater_storage (mm),
+available_evaporable_water (mm, NaN to start from swc_evaporation_layer)
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Callable, Mapping
+import numpy as np
+from ..evapotranspiration.asset import (
+    inverse_relative_distance_earth_sun,
+    solar_declination,
+    sunset_hour_angle,
+    extraterrestrial_radiation,
+    maximum_possible_sunshine_duration_in_a_day
+)
+from ..evapotranspiration.convert import convert_degrees2radians, convert_radiation2evaporation
+from ..evapotranspiration.et import ReferenceEvapotranspiration
+from ..evapotranspiration.vectorized import (
+    vapour_pressure_terms,
+    free_water_evaporation,
+    actual_evapotranspiration,
+    vapour_pressure_by_method,
+    radiation_by_method,
+    MethodDispatch,
+    FREE_WATER_METHODS,
+    VAPOUR_PRESSURE_METHODS,
+    RADIATION_METHODS,
+    KRS,
+    A_PSY
+)
+from ..snow_pack.vectorized import check_snow_fall_or_not, snow_melt, DEGREE_DAY_FACTOR
+from ..interception.vectorized import bucket
+from ..primary_surface_flow.vectorized import scs
+from ..soil_content.vectorized import water_soil_content, upward_flux, layer_capacity, UPWARD_FLUXES
+from ..soil_content.constant import soil_depth
+from ..deep_percolation.vectorized import partition_deep_percolation
+from ..groundwater.vectorized import update_storage, groundwater_evaporation
+from .sparse import on_wet_cells, SKIPPED_KEY, DENSE_KEY
+
+
+# Number of previous days summed into the antecedent precipitation of the SCS method
+ANTECEDENT_DAYS = 5
+
+
+PARAMETER_DEFAULTS = {
+    'rsa' : 1.0,
+    'canopy_class' : 0,
+    'is_growing_season' : True,
+    'degree_day_factor' : DEGREE_DAY_FACTOR,
+    'stress_coefficient' : 1.0,
+    'MAD' : 0.0,
+    # no upward flux unless conductivities are given
+    'hydraulic_conductivity_transpiration_layer' : 0.0,
+    'hydraulic_conductivity_transition_layer' : 0.0,
+    # no evaporation from groundwater unless a water table depth is given (or forced)
+    'water_table_depth' : np.inf,
+    'extinction_depth' : 5.0,
+    'extinction_exponent' : 1.0,
+    # free water surface of ``free_water_stages`` - 2 m/s where no wind data (FAO56)
+    'altitude' : 0.0,
+    'wind_speed' : 2.0,
+    'water_fraction' : 0.0,
+    'krs' : KRS,
+    'a_psy' : A_PSY
+}
+
+
+
+class Stage :
+
+    def __init__(self,
+        name : str,
+        function : Callable[[Mapping[str, np.ndarray], np.dtype], Dict[str, np.ndarray]],
+        inputs : Tuple[str, ...],
+        outputs : Tuple[str, ...],
+        state : Optional[Dict[str, Optional[float]]] = None,
+        state_shape : Optional[Dict[str, Tuple[int, ...]]] = None,
+        accumulator : bool = False
+    ):
+        """
+        Description
+        -----------
+        One process of the daily water balance.
+
+        Parameters
+        ----------
+        name : str
+            stage name - also the key of the stage in DtypePolicy
+        function : Callable
+            function(data, dtype) returning a dict of new arrays
+        inputs : Tuple[str, ...]
+            names read from forcing, parameters and earlier stages
+        outputs : Tuple[str, ...]
+            names returned (state variables included)
+        state : Dict[str, Optional[float]]
+            state variables of the stage and their default initial value (None if required)
+        state_shape : Dict[str, Tuple[int, ...]]
+            leading shape of state variables that are not one value per cell
+        accumulator : bool
+            True if the state accumulates (kept in the accumulator dtype of the policy)
+        """
+
+        self.name = name
+        self.function = function
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.state = dict(state or {})
+        self.state_shape = dict(state_shape or {})
+        self.accumulator = accumulator
+
+
+    def __call__(
+        self,
+        data : Mapping[str, np.ndarray],
+        dtype : np.dtype
+    ) -> Dict[str, np.ndarray]:
+
+        return self.function(data, dtype)
+
+
+    def __repr__(self) -> str:
+        return f"Stage({self.name!r})"
+
+
+
+def radiation(
+    data : Mapping[str, np.ndarray],
+    dtype : np.dtype
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Extraterrestrial radiation as equivalent evaporation - eq 21 to 28 FAO56
+    """
+
+    latitude = convert_degrees2radians(np.asarray(data['latitude'], dtype = dtype))
+    julian_day = data['julian_day']
+
+    dr = inverse_relative_distance_earth_sun(julian_date = julian_day)
+    delta = solar_declination(julian_date = julian_day)
+    ws = sunset_hour_angle(latitude = latitude, solar_declination = delta)
+    ra = extraterrestrial_radiation(
+        inverse_relative_distance_earth_sun = dr,
+        sunset_hour_angle = ws,
+        latitude = latitude,
+        solar_declination = delta
+    )
+
+    return {'extraterrestrial_radiation': np.asarray(convert_radiation2evaporation(ra), dtype = dtype)}
+
+
+
+def reference_evapotranspiration(
+    data : Mapping[str, np.ndarray],
+    dtype : np.dtype
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Reference crop evapotranspiration with the Hargreaves and Samani method
+    """
+
+    eto = ReferenceEvapotranspiration.hargreaves_samani(
+        tmin = data['tmin'],
+        tmax = data['tmax'],
+        tmean = data['tmean'],
+        ra = data['extraterrestrial_radiation']
+    )
+
+    return {'reference_evapotranspiration': np.asarray(eto, dtype = dtype)}
+
+
+
+def vapour_pressure(
+    data : Mapping[str, np.ndarray],
+    dtype : np.dtype
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Saturation vapour pressure, slope of the vapour pressure curve and psychrometric constant
+    """
+
+    return vapour_pressure_terms(
+        tmin = data['tmin'],
+        tmax = data['tmax'],
+        tmean = data['tmean'],
+        altitude = data['altitude'],
+        dtype = dtype
+    )
+
+
+
+def precipitation_phase(
+    data : Mapping[str, np.ndarray],
+    dtype : np.dtype
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Split precipitation into snowfall and rainfall
+    """
+
+    precipitation = np.asarray(data['precipitation'], dtype = dtype)
+    is_snow = check_snow_fall_or_not(tmax = data['tmax'], tmin = data['tmin'], tmean = data['tmean'])
+    snowfall = np.where(is_snow, precipitation, 0).astype(dtype, copy = False)
+
+    return {'snowfall': snowfall, 'rainfall': (precipitation - snowfall).astype(dtype, copy = False)}
+
+
+
+def snow(
+    data : Mapping[str, np.ndarray],
+    dtype : np.dtype
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Snow accumulation and degree day melt limited by the available snow
+    """
+
+    available = np.asarray(data['snowpack'], dtype = dtype) + np.asarray(data['snowfall'], dtype = dtype)
+    melt = np.minimum(
+        snow_melt(tmax = data['tmax'], degree_day_factor = data['degree_day_factor'], dtype = dtype), available
+    ).astype(dtype, copy = False)
+
+    return {'snow_melt': melt, 'snowpack': (available - melt).astype(dtype, copy = False)}
+
+
+
+def interception(
+    data : Mapping[str, np.ndarray],
+    dtype : np.dtype
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Canopy interception of rainfall with the bucket method, evaluated on wet cells only
+    """
+
+    rainfall = np.asarray(data['rainfall'], dtype = dtype)
+    (intercepted,), skipped, total = on_wet_cells(
+        bucket,
+        water = rainfall,
+        arguments = {
+            'canopy_class': data['canopy_class'],
+            'precipitation': rainfall,
+            'is_growing_season': data['is_growing_season']
+        },
+        dtype = dtype,
+        dense = bool(data.get(DENSE_KEY, False))
+    )
+    throughfall = (rainfall - intercepted).astype(dtype, copy = False)
+
+    return {'interception': intercepted, 'throughfall': throughfall, SKIPPED_KEY: (skipped, total)}
+
+
+
+def antecedent_precipitation(
+    data : Mapping[str, np.ndarray],
+    dtype : np.dtype
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Sum of the precipitation of the previous ANTECEDENT_DAYS days
+    """
+
+    history = data['precipitation_history']
+    precipitation = np.asarray(data['precipitation'], dtype = dtype)
+
+    return {
+        'antecedent_precipitation': history.sum(axis = -2, dtype = dtype),
+        'precipitation_history': np.concatenate(
+            [history[..., 1:, :], np.broadcast_to(precipitation, history[..., :1, :].shape)], axis = -2
+        )
+    }
+
+
+
+def runoff(
+    data : Mapping[str, np.ndarray],
+    dtype : np.dtype
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    SCS runoff of throughfall plus snow melt, evaluated on wet cells only
+    """
+
+    water = np.asarray(data['throughfall'], dtype = dtype) + np.asarray(data['snow_melt'], dtype = dtype)
+    (surface_runoff, _), skipped, total = on_wet_cells(
+        scs,
+        water = water,
+        arguments = {
+            'precipitation': water,
+            'curve_number': data['curve_number'],
+            'rsa': data['rsa'],
+            'antecedent_precipitation': data['antecedent_precipitation'],
+            'is_growing_season': data['is_growing_season']
+        },
+        dtype = dtype,
+        dense = bool(data.get(DENSE_KEY, False))
+    )
+
+    # all the water that does not run off enters the soil (also below the initial abstraction)
+    infiltration = np.maximum(water - surface_runoff, 0).astype(dtype, copy = False)
+
+    return {'runoff': surface_runoff, 'infiltration': infiltration, SKIPPED_KEY: (skipped, total)}
+
+
+
+def evapotranspiration(
+    data : Mapping[str, np.ndarray],
+    dtype : np.dtype
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Covered area evapotranspiration and non covered area evaporation (QDWB approach)
+    from the soil water content and the available evaporable water at the previous step
+    """
+
+    transpiration, evaporation, aew = actual_evapotranspiration(
+        reference_evapotranspiration = data['reference_evapotranspiration'],
+        crop_coefficient = data['crop_coefficient'],
+        crop_cover = data['crop_cover'],
+        infiltration = data['infiltration'],
+        available_evaporable_water = data['available_evaporable_water'],
+        swc_transpiration_layer = data['swc_transpiration_layer'],
+        fc_transpiration_layer = data['fc_transpiration_layer'],
+        pwp_transpiration_layer = data['pwp_transpiration_layer'],
+        z_transpiration_layer = data['z_transpiration_layer'],
+        fc_evaporation_layer = data['fc_evaporation_layer'],
+        pwp_evaporation_layer = data['pwp_evaporation_layer'],
+        z_evaporation_layer = soil_depth.get('evaporation_layer'),
+        swc_evaporation_layer = data['swc_evaporation_layer'],
+        dtype = dtype
+    )
+
+    return {'transpiration': transpiration, 'evaporation': evaporation, 'available_evaporable_water': aew}
+
+
+
+def capillary_rise(
+    data : Mapping[str, np.ndarray],
+    dtype : np.dtype
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Upward flux from the deeper soil layers at the start of the day
+    """
+
+    layers = ('evaporation_layer', 'transpiration_layer', 'transition_layer')
+    fluxes, swc = upward_flux(
+        covered = data['covered'],
+        swc = {layer: data[f"swc_{layer}"] for layer in layers},
+        fc = {layer: data[f"fc_{layer}"] for layer in layers},
+        pwp = {layer: data[f"pwp_{layer}"] for layer in layers},
+        hydraulic_conductivity = {
+            'transpiration_layer': data['hydraulic_conductivity_transpiration_layer'],
+            'transition_layer': data['hydraulic_conductivity_transition_layer']
+        },
+        z_transpiration_layer = data['z_transpiration_layer'],
+        dtype = dtype
+    )
+
+    return {**fluxes, **{f"swc_{layer}": values for layer, values in swc.items()}}
+
+
+
+def soil(
+    data : Mapping[str, np.ndarray],
+    dtype : np.dtype
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Soil water content of the three soil layers
+    """
+
+    result = water_soil_content(
+        covered = data['covered'],
+        infiltration = data['infiltration'],
+        evaporation = data['evaporation'],
+        transpiration = data['transpiration'],
+        init_swc_evaporation_layer = data['swc_evaporation_layer'],
+        init_swc_transpiration_layer = data['swc_transpiration_layer'],
+        init_swc_transition_layer = data['swc_transition_layer'],
+        fc_evaporation_layer = data['fc_evaporation_layer'],
+        fc_transpiration_layer = data['fc_transpiration_layer'],
+        fc_transition_layer = data['fc_transition_layer'],
+        pwp_evaporation_layer = data['pwp_evaporation_layer'],
+        pwp_transpiration_layer = data['pwp_transpiration_layer'],
+        pwp_transition_layer = data['pwp_transition_layer'],
+        z_transpiration_layer = data['z_transpiration_layer'],
+        stress_coefficient = data['stress_coefficient'],
+        MAD = data['MAD'],
+        dtype = dtype
+    )
+
+    return dict(zip(SOIL_OUTPUTS, result))
+
+
+
+def deep_percolation(
+    data : Mapping[str, np.ndarray],
+    dtype : np.dtype
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Groundwater recharge and late runoff from the deep percolation
+    """
+
+    recharge, late_runoff = partition_deep_percolation(
+        deep_percolation = data['deep_percolation'],
+        geology_permeability = data['geology_permeability'],
+        dtype = dtype
+    )
+
+    return {'recharge': recharge, 'late_runoff': late_runoff}
+
+
+
+def capillary_supply(
+    data : Mapping[str, np.ndarray],
+    dtype : np.dtype
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Evaporation from a shallow water table: the crop demand the soil could not meet, reduced
+    with the water table depth, rises into the transition layer (up to its field capacity)
+    """
+
+    demand = (np.asarray(data['reference_evapotranspiration'], dtype = dtype) * data['crop_coefficient'] -
+              data['actual_transpiration'] - data['actual_evaporation'])
+    evaporation = groundwater_evaporation(
+        water_table_depth = data['water_table_depth'],
+        potential_evaporation = demand,
+        extinction_depth = data['extinction_depth'],
+        exponent = data['extinction_exponent'],
+        dtype = dtype
+    )
+
+    swc = np.asarray(data['swc_transition_layer'], dtype = dtype)
+    room = np.maximum(layer_capacity(data['fc_transition_layer'], soil_depth.get('transition_layer')) - swc, 0)
+    evaporation = np.minimum(evaporation, room).astype(dtype, copy = False)
+
+    return {'groundwater_evaporation': evaporation, 'swc_transition_layer': (swc + evaporation).astype(dtype, copy = False)}
+
+
+
+def groundwater(
+    data : Mapping[str, np.ndarray],
+    dtype : np.dtype
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    -----------
+    Groundwater storage accumulated from recharge minus the evaporation from groundwater
+    """
+
+    change = np.asarray(data['recharge'], dtype = dtype) - data['groundwater_evaporation']
+
+    return {'groundwater_storage': update_storage(data['groundwater_storage'], change, dtype = dtype)}
+
+
+
+SOIL_OUTPUTS = (
+    'swc_evaporation_layer',
+    'swc_transpiration_layer',
+    'swc_transition_layer',
+    'actual_transpiration',
+    'actual_evaporation',
+    'evaporation_layer_drainage',
+    'transpiration_layer_drainage',
+    'irrigation_requirement',
+    'deep_percolation'
+)
+
+
+
+def default_stages() -> List[Stage]:
+
+    """
+    Description
+    -----------
+    Stages of the QDWB daily water balance in execution order.
+
+    Returns
+    -------
+    stages : List[Stage]
+    """
+
+    return [
+        Stage(
+            name = 'radiation',
+            function = radiation,
+            inputs = ('latitude', 'julian_day'),
+            outputs = ('extraterrestrial_radiation',)
+        ),
+        Stage(
+            name = 'reference_evapotranspiration',
+            function = reference_evapotranspiration,
+            inputs = ('tmin', 'tmax', 'tmean', 'extraterrestrial_radiation'),
+            outputs = ('reference_evapotranspiration',)
+        ),
+        Stage(
+            name = 'precipitation_phase',
+            function = precipitation_phase,
+            inputs = ('precipitation', 'tmax', 'tmin', 'tmean'),
+            outputs = ('snowfall', 'rainfall')
+        ),
+        Stage(
+            name = 'snow',
+            function = snow,
+            inputs = ('snowfall', 'tmax', 'degree_day_factor'),
+            outputs = ('snow_melt', 'snowpack'),
+            state = {'snowpack': 0.0}
+        ),
+        Stage(
+            name = 'interception',
+            function = interception,
+            inputs = ('canopy_class', 'rainfall', 'is_growing_season'),
+            outputs = ('interception', 'throughfall')
+        ),
+        Stage(
+            name = 'antecedent_precipitation',
+            function = antecedent_precipitation,
+            inputs = ('precipitation',),
+            outputs = ('antecedent_precipitation', 'precipitation_history'),
+            state = {'precipitation_history': 0.0},
+            state_shape = {'precipitation_history': (ANTECEDENT_DAYS,)}
+        ),
+        Stage(
+            name = 'runoff',
+            function = runoff,
+            inputs = ('throughfall', 'snow_melt', 'curve_number', 'rsa', 'antecedent_precipitation', 'is_growing_season'),
+            outputs = ('runoff', 'infiltration')
+        ),
+        Stage(
+            name = 'evapotranspiration',
+            function = evapotranspiration,
+            inputs = (
+                'reference_evapotranspiration', 'crop_coefficient', 'crop_cover',
+                'swc_transpiration_layer', 'pwp_transpiration_layer', 'fc_transpiration_layer', 'z_transpiration_layer',
+                'swc_evaporation_layer', 'pwp_evaporation_layer', 'fc_evaporation_layer', 'infiltration'
+            ),
+            outputs = ('transpiration', 'evaporation', 'available_evaporable_water'),
+            # NaN starts the available evaporable water from swc_evaporation_layer
+            state = {'available_evaporable_water': np.nan}
+        ),
+        Stage(
+            name = 'capillary_rise',
+            function = capillary_rise,
+            inputs = (
+                'covered', 'z_transpiration_layer',
+                'fc_evaporation_layer', 'fc_transpiration_layer', 'fc_transition_layer',
+                'pwp_evaporation_layer', 'pwp_transpiration_layer', 'pwp_transition_layer',
+                'hydraulic_conductivity_transpiration_layer', 'hydraulic_conductivity_transition_layer',
+                'swc_evaporation_layer', 'swc_transpiration_layer', 'swc_transition_layer'
+            ),
+            outputs = tuple(name for name, _, _, _ in UPWARD_FLUXES) + (
+                'swc_evaporation_layer', 'swc_transpiration_layer', 'swc_transition_layer'
+            )
+        ),
+        Stage(
+            name = 'soil',
+            function = soil,
+            inputs = (
+                'covered', 'infiltration', 'evaporation', 'transpiration',
+                'fc_evaporation_layer', 'fc_transpiration_layer', 'fc_transition_layer',
+                'pwp_evaporation_layer', 'pwp_transpiration_layer', 'pwp_transition_layer',
+                'z_transpiration_layer', 'stress_coefficient', 'MAD'
+            ),
+            outputs = SOIL_OUTPUTS,
+            state = {'swc_evaporation_layer': None, 'swc_transpiration_layer': None, 'swc_transition_layer': None}
+        ),
+        Stage(
+            name = 'deep_percolation',
+            function = deep_percolation,
+            inputs = ('deep_percolation', 'geology_permeability'),
+            outputs = ('recharge', 'late_runoff')
+        ),
+        Stage(
+            name = 'capillary_supply',
+            function = capillary_supply,
+            inputs = (
+                'reference_evapotranspiration', 'crop_coefficient', 'actual_transpiration', 'actual_evaporation',
+                'water_table_depth', 'extinction_depth', 'extinction_exponent',
+                'fc_transition_layer', 'swc_transition_layer'
+            ),
+            outputs = ('groundwater_evaporation', 'swc_transition_layer')
+        ),
+        Stage(
+            name = 'groundwater',
+            function = groundwater,
+            inputs = ('recharge', 'groundwater_evaporation'),
+            outputs = ('groundwater_storage',),
+            state = {'groundwater_storage': 0.0},
+            accumulator = True
+        )
+    ]
+
+
+
+def free_water_stages(
+    method : str = 'Jensen',
+    vapour_pressure_methods : Optional[MethodDispatch] = None,
+    radiation_methods : Optional[MethodDispatch] = None
+) -> List[Stage]:
+    """
+    Description
+    -----------
+    Stages of the evaporation from the free water surface of lakes, reservoirs and water cells,
+    run after ``default_stages()``. 'free_water_evaporation' is the depth over the water surface
+    and 'water_body_evaporation' the depth over the whole cell (times water_fraction), so
+    ``Aggregation.volume`` of it is the volume_evaporation of every reservoir. Both are only
+    evaluated on the cells with water (water_fraction > 0) and are zero elsewhere.
+
+    Parameters
+    ----------
+    method : str
+        'Jensen', 'Stuart', 'Makkink' (needs latent_heat_of_vaporization), 'Harbeck' or
+        'Shuttleworth' (need water_area)
+    vapour_pressure_methods : MethodDispatch
+        method of the actual vapour pressure of every cell (VAPOUR_PRESSURE_METHODS) - None for
+        the dewpoint at the minimum temperature everywhere
+    radiation_methods : MethodDispatch
+        method of the solar radiation of every cell (RADIATION_METHODS) - None for Hargreaves
+        everywhere
+
+    Returns
+    -------
+    stages : List[Stage]
+    """
+
+    if method not in FREE_WATER_METHODS:
+        raise ValueError(f"method must be one of {', '.join(FREE_WATER_METHODS)}: {method}")
+
+    vapour_inputs = VAPOUR_PRESSURE_METHODS['T_min'] if vapour_pressure_methods is None else vapour_pressure_methods.inputs
+    radiation_inputs = RADIATION_METHODS['Hargreaves'] if radiation_methods is None else radiation_methods.inputs
+    angstrom = radiation_methods is not None and 'Angstrom' in radiation_methods.cells
+    if angstrom:
+        radiation_inputs = tuple(name for name in radiation_inputs if name != 'maximum_sunshine_duration') + ('latitude', 'julian_day')
+
+    def actual_vapour_pressure(
+        data : Mapping[str, np.ndarray],
+        dtype : np.dtype
+    ) -> Dict[str, np.ndarray]:
+        if vapour_pressure_methods is None:
+            ea = vapour_pressure_by_method('T_min', data, dtype)
+        else:
+            ea = vapour_pressure_methods.evaluate(vapour_pressure_by_method, data, dtype)
+        return {'actual_vapour_pressure': np.asarray(ea, dtype = dtype)}
+
+    def solar_radiation(
+        data : Mapping[str, np.ndarray],
+        dtype : np.dtype
+    ) -> Dict[str, np.ndarray]:
+        values = {name: data[name] for name in radiation_inputs}
+        values['extraterrestrial_radiation'] = np.asarray(data['extraterrestrial_radiation'], dtype = dtype) / 0.408
+        if angstrom:
+            ws = sunset_hour_angle(
+                latitude = convert_degrees2radians(np.asarray(data['latitude'], dtype = dtype)),
+                solar_declination = solar_declination(julian_date = data['julian_day'])
+            )
+            values['maximum_sunshine_duration'] = maximum_possible_sunshine_duration_in_a_day(sunset_hour_angle = ws)
+        if radiation_methods is None:
+            rs = radiation_by_method('Hargreaves', values, dtype)
+        else:
+            rs = radiation_methods.evaluate(radiation_by_method, values, dtype)
+        return {'solar_radiation': np.asarray(rs, dtype = dtype)}
+
+    def water_surface_evaporation(
+        water_fraction : np.ndarray,
+        dtype : np.dtype,
+        **inputs
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        evaporation = np.maximum(free_water_evaporation(method, dtype = dtype, **inputs), 0)
+        return evaporation, evaporation * water_fraction
+
+    def free_water(
+        data : Mapping[str, np.ndarray],
+        dtype : np.dtype
+    ) -> Dict[str, np.ndarray]:
+        (evaporation, water_body), skipped, total = on_wet_cells(
+            water_surface_evaporation,
+            water = data['water_fraction'],
+            arguments = {
+                'water_fraction': data['water_fraction'],
+                **{name: data[name] for name in FREE_WATER_METHODS[method]}
+            },
+            dtype = dtype,
+            dense = bool(data.get(DENSE_KEY, False))
+        )
+        return {
+            'free_water_evaporation': evaporation,
+            'water_body_evaporation': water_body,
+            SKIPPED_KEY: (skipped, total)
+        }
+
+    return [
+        Stage(
+            name = 'vapour_pressure',
+            function = vapour_pressure,
+            inputs = ('tmin', 'tmax', 'tmean', 'altitude'),
+            outputs = ('saturation_vapour_pressure', 'slope_vapour_pressure_curve', 'psychrometric_constant')
+        ),
+        Stage(
+            name = 'actual_vapour_pressure',
+            function = actual_vapour_pressure,
+            inputs = vapour_inputs,
+            outputs = ('actual_vapour_pressure',)
+        ),
+        Stage(
+            name = 'solar_radiation',
+            function = solar_radiation,
+            inputs = radiation_inputs,
+            outputs = ('solar_radiation',)
+        ),
+        Stage(
+            name = 'free_water_evaporation',
+            function = free_water,
+            inputs = FREE_WATER_METHODS[method] + ('water_fraction',),
+            outputs = ('free_water_evaporation', 'water_body_evaporation')
+        )
+    ]
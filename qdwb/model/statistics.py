@@ -0,0 +1,379 @@
+"""
+Streaming Temporal Statistics Of The Model Outputs.
+
+Daily outputs are reduced per cell into running sums, means, extremes, counts
+and approximate percentiles (P-square, Jain and Chlamtac 1985) of the current
+month, season or year. A period is returned as soon as it closes, so monthly
+or annual products of long runs never need the daily cube.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn, Iterable, Mapping
+import numpy as np
+
+
+# Periods of the accumulators
+PERIODS = ('month', 'season', 'year')
+
+# Statistics besides the percentiles
+STATISTICS = ('sum', 'mean', 'min', 'max', 'count')
+
+# Meteorological seasons, indexed by (month % 12) // 3 with months 1 to 12
+SEASONS = ('DJF', 'MAM', 'JJA', 'SON')
+
+
+
+def period_key(
+    day : np.datetime64,
+    period : str = 'month',
+    climatology : bool = False
+) -> str:
+    """
+    Description
+    -----------
+    Label of the period holding a day.
+
+    Parameters
+    ----------
+    day : np.datetime64
+        the day
+    period : str
+        'month', 'season' or 'year'
+    climatology : bool
+        if True the label ignores the year (all Januaries share '01')
+
+    Returns
+    -------
+    key : str
+        '2001-01', '2001-DJF' (December is in the winter of the next year) or '2001' -
+        '01', 'DJF' or 'all' for a climatology
+    """
+
+    month = np.datetime64(day, 'M')
+    year = month.astype('datetime64[Y]')
+    index = int((month - year).astype(int))
+
+    if period == 'month':
+        return f"{index + 1:02d}" if climatology else str(month)
+    if period == 'season':
+        season = SEASONS[((index + 1) % 12) // 3]
+        return season if climatology else f"{year + (index == 11)}-{season}"
+    if period == 'year':
+        return 'all' if climatology else str(year)
+
+    raise ValueError(f"period must be one of {PERIODS}: {period}")
+
+
+
+class P2Quantile :
+
+    def __init__(self,
+        p : float,
+        size : int
+    ):
+        """
+        Description
+        -----------
+        P-square estimate of one quantile for many independent series at once, with five
+        markers per series. NaN values are ignored.
+
+        Parameters
+        ----------
+        p : float
+            quantile in (0, 1)
+        size : int
+            number of series (cells)
+        """
+
+        if not 0 < p < 1:
+            raise ValueError(f"p must be between 0 and 1: {p}")
+
+        self.p = p
+        self.count = np.zeros(size, dtype = np.int64)
+        self.q = np.full((5, size), np.nan)
+        self.n = np.tile(np.arange(1, 6, dtype = np.float64)[:, np.newaxis], (1, size))
+        self.desired = np.tile(np.array([1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5])[:, np.newaxis], (1, size))
+        self.increment = np.array([0, p / 2, p, (1 + p) / 2, 1])[:, np.newaxis]
+
+
+    def update(
+        self,
+        values : np.ndarray
+    ) -> NoReturn:
+        """
+        Description
+        -----------
+        Add one value to every series, shape (size,).
+        """
+
+        values = np.asarray(values, dtype = np.float64)
+        valid = ~np.isnan(values)
+
+        # the first five values of a series are kept as they are and sorted at the fifth
+        filling = valid & (self.count < 5)
+        if filling.any():
+            cells = np.flatnonzero(filling)
+            self.q[self.count[cells], cells] = values[cells]
+            self.count[cells] += 1
+            full = cells[self.count[cells] == 5]
+            self.q[:, full] = np.sort(self.q[:, full], axis = 0)
+
+        cells = np.flatnonzero(valid & ~filling)
+        if cells.size == 0:
+            return
+        self.count[cells] += 1
+        x = values[cells]
+        q = self.q[:, cells]
+        n = self.n[:, cells]
+
+        q[0] = np.minimum(q[0], x)
+        q[4] = np.maximum(q[4], x)
+        k = np.clip((x[np.newaxis] >= q[1:4]).sum(axis = 0), 0, 3)
+        n += np.arange(5)[:, np.newaxis] > k
+        desired = self.desired[:, cells] + self.increment
+
+        for i in (1, 2, 3):
+            d = desired[i] - n[i]
+            move = ((d >= 1) & (n[i + 1] - n[i] > 1)) | ((d <= -1) & (n[i - 1] - n[i] < -1))
+            if not move.any():
+                continue
+            s = np.sign(d)
+            parabolic = q[i] + s / (n[i + 1] - n[i - 1]) * (
+                (n[i] - n[i - 1] + s) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                (n[i + 1] - n[i] - s) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+            )
+            neighbour = np.where(s > 0, i + 1, i - 1)
+            columns = np.arange(q.shape[1])
+            linear = q[i] + s * (q[neighbour, columns] - q[i]) / (n[neighbour, columns] - n[i])
+            inside = (q[i - 1] < parabolic) & (parabolic < q[i + 1])
+            q[i] = np.where(move, np.where(inside, parabolic, linear), q[i])
+            n[i] = np.where(move, n[i] + s, n[i])
+
+        self.q[:, cells] = q
+        self.n[:, cells] = n
+        self.desired[:, cells] = desired
+
+
+    def value(self) -> np.ndarray:
+        """
+        Description
+        -----------
+        Current estimate of every series - exact below five values, NaN without values.
+        """
+
+        result = self.q[2].copy()
+        few = self.count < 5
+        if few.any():
+            with np.errstate(invalid = 'ignore'):
+                start = self.q[:, few]
+                rows = np.arange(5)[:, np.newaxis] < self.count[few]
+                start = np.where(rows, start, np.nan)
+                exact = np.full(start.shape[1], np.nan)
+                some = self.count[few] > 0
+                exact[some] = np.nanquantile(start[:, some], self.p, axis = 0)
+            result[few] = exact
+
+        return result
+
+
+
+class RunningStatistics :
+
+    def __init__(self,
+        shape : Tuple[int, ...],
+        statistics : Iterable[str] = STATISTICS,
+        percentiles : Iterable[float] = ()
+    ):
+        """
+        Description
+        -----------
+        Running statistics of one variable per cell. NaN values are ignored.
+
+        Parameters
+        ----------
+        shape : Tuple[int, ...]
+            shape of the variable on one day
+        statistics : Iterable[str]
+            names from STATISTICS
+        percentiles : Iterable[float]
+            percentiles in (0, 100) - estimated with P2Quantile
+        """
+
+        self.statistics = tuple(statistics)
+        unknown = set(self.statistics) - set(STATISTICS)
+        if unknown:
+            raise ValueError(f"unknown statistics {sorted(unknown)} - available: {STATISTICS}")
+
+        self.shape = tuple(shape)
+        size = int(np.prod(self.shape, dtype = np.int64))
+        self.sum = np.zeros(size)
+        self.count = np.zeros(size, dtype = np.int64)
+        self.min = np.full(size, np.inf)
+        self.max = np.full(size, -np.inf)
+        self.percentiles = {p: P2Quantile(p / 100, size) for p in percentiles}
+
+
+    def update(
+        self,
+        values : np.ndarray
+    ) -> NoReturn:
+        """
+        Description
+        -----------
+        Add a block of days with the days on the first axis, shape (T,) + shape.
+        """
+
+        values = np.asarray(values, dtype = np.float64).reshape(-1, self.sum.size)
+        valid = ~np.isnan(values)
+
+        self.sum += np.where(valid, values, 0).sum(axis = 0)
+        self.count += valid.sum(axis = 0)
+        self.min = np.fmin(self.min, np.where(valid, values, np.inf).min(axis = 0))
+        self.max = np.fmax(self.max, np.where(valid, values, -np.inf).max(axis = 0))
+        for quantile in self.percentiles.values():
+            for row in values:
+                quantile.update(row)
+
+
+    def result(self) -> Dict[str, np.ndarray]:
+        """
+        Description
+        -----------
+        Statistics so far - NaN in the cells without a value.
+
+        Returns
+        -------
+        result : Dict[str, np.ndarray]
+            {'sum', 'mean', 'min', 'max', 'count', 'p<percentile>'} arrays of the variable shape
+        """
+
+        empty = self.count == 0
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            values = {
+                'sum': np.where(empty, np.nan, self.sum),
+                'mean': np.where(empty, np.nan, self.sum / self.count),
+                'min': np.where(empty, np.nan, self.min),
+                'max': np.where(empty, np.nan, self.max),
+                'count': self.count
+            }
+        result = {name: values[name].reshape(self.shape) for name in self.statistics}
+        for p, quantile in self.percentiles.items():
+            result[f"p{p:g}"] = quantile.value().reshape(self.shape)
+
+        return result
+
+
+
+class PeriodStatistics :
+
+    def __init__(self,
+        variables : Iterable[str],
+        period : str = 'month',
+        statistics : Iterable[str] = STATISTICS,
+        percentiles : Iterable[float] = (),
+        climatology : bool = False
+    ):
+        """
+        Description
+        -----------
+        Statistics of outputs per cell and per period, returned when each period closes.
+
+        Parameters
+        ----------
+        variables : Iterable[str]
+            outputs of the driver to reduce, such as 'runoff' or 'actual_evapotranspiration'
+        period : str
+            'month', 'season' or 'year'
+        statistics : Iterable[str]
+            names from STATISTICS
+        percentiles : Iterable[float]
+            approximate percentiles in (0, 100), such as (10, 50, 90)
+        climatology : bool
+            if True the same month (season) of all years is reduced together and the
+            periods are only returned by ``flush``
+        """
+
+        if period not in PERIODS:
+            raise ValueError(f"period must be one of {PERIODS}: {period}")
+
+        self.variables = tuple(variables)
+        self.period = period
+        self.statistics = tuple(statistics)
+        self.percentiles = tuple(percentiles)
+        self.climatology = climatology
+        self.open = {}
+        self._key = None
+        self._last = None
+
+
+    def update(
+        self,
+        time : Union[np.datetime64, np.ndarray],
+        outputs : Mapping[str, np.ndarray]
+    ) -> List[Tuple[str, Dict[str, Dict[str, np.ndarray]]]]:
+        """
+        Description
+        -----------
+        Add one day (outputs of ``Driver.step``) or a block of days (outputs of
+        ``Driver.run_block`` with time on the first axis). Days must be in increasing order.
+
+        Parameters
+        ----------
+        time : Union[np.datetime64, np.ndarray]
+            the day, or the days of the block with shape (T,)
+        outputs : Mapping[str, np.ndarray]
+            outputs of the day or of the block
+
+        Returns
+        -------
+        closed : List[Tuple[str, Dict[str, Dict[str, np.ndarray]]]]
+            (period key, {variable: {statistic: array}}) of every period closed by these days
+        """
+
+        single = np.ndim(time) == 0
+        days = np.atleast_1d(np.asarray(time, dtype = 'datetime64[D]'))
+        if np.any(np.diff(days) <= np.timedelta64(0, 'D')) or (self._last is not None and days[0] <= self._last):
+            raise ValueError("days must be given in increasing order!")
+        self._last = days[-1]
+
+        missing = [name for name in self.variables if name not in outputs]
+        if missing:
+            raise ValueError(f"outputs {missing} are missing!")
+
+        keys = [period_key(day, self.period, self.climatology) for day in days]
+        starts = [i for i in range(len(keys)) if i == 0 or keys[i] != keys[i - 1]] + [len(keys)]
+
+        closed = []
+        for start, stop in zip(starts[:-1], starts[1:]):
+            key = keys[start]
+            if not self.climatology and self._key is not None and key != self._key:
+                closed.extend(self.flush())
+            self._key = key
+            accumulators = self.open.get(key)
+            for name in self.variables:
+                values = np.asarray(outputs[name])
+                values = values[np.newaxis] if single else values[start:stop]
+                if accumulators is None:
+                    accumulators = self.open[key] = {}
+                if name not in accumulators:
+                    accumulators[name] = RunningStatistics(values.shape[1:], self.statistics, self.percentiles)
+                accumulators[name].update(values)
+
+        return closed
+
+
+    def flush(self) -> List[Tuple[str, Dict[str, Dict[str, np.ndarray]]]]:
+        """
+        Description
+        -----------
+        Return and reset every open period (the last, possibly incomplete, one of a run or
+        all the periods of a climatology).
+        """
+
+        closed = [
+            (key, {name: accumulator.result() for name, accumulator in accumulators.items()})
+            for key, accumulators in self.open.items()
+        ]
+        self.open = {}
+        self._key = None
+
+        return closed
@@ -0,0 +1,169 @@
+"""
+Array Versions Of The Primary Surface Flow Functions.
+
+Same equations as ``asset.py`` and ``PrimarySurfaceFlow.scs`` evaluated for all
+cells at once. Inputs broadcast against each other, so scalars, 1-D cell arrays
+and (time, cell) blocks can be mixed.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn
+import numpy as np
+from ..model.dtype import resolve_dtype, as_float_array
+
+
+
+def modify_CN(
+    curve_number : np.ndarray,
+    antecedent_precipitation : np.ndarray,
+    is_growing_season : np.ndarray,
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Modify Curve Number using Antecedent Moisture Condition
+    **Reference**: Guide Lines for Estimating Runoff for Design of Irrigation and Drainage Networks. No.519 (2010)
+
+    Parameters
+    ----------
+    curve_number : np.ndarray
+        An index of the land condition as indicated by soils, cover, land use - Between 0 to 100 - dimensionless
+
+    antecedent_precipitation : np.ndarray
+        Sum of Precipitation for previous 5 days - Starts from 0 - mm
+
+    is_growing_season : np.ndarray
+        Check if its growing season or not - bool
+
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    - modified curve number : np.ndarray
+        An index of the land condition as indicated by soils, cover, land use - Between 0 to 100 - dimensionless
+    """
+
+    dtype = resolve_dtype(curve_number, antecedent_precipitation, dtype = dtype)
+    curve_number = as_float_array(curve_number, dtype)
+    antecedent_precipitation = as_float_array(antecedent_precipitation, dtype)
+    is_growing_season = np.asarray(is_growing_season, dtype = bool)
+
+    lower = np.where(is_growing_season, 35.6, 12.7)
+    upper = np.where(is_growing_season, 53.3, 27.9)
+
+    dry = (4.2 * curve_number) / (10 - (0.058 * curve_number))
+    wet = (23 * curve_number) / (10 + (0.13 * curve_number))
+
+    modified_cn = np.where(
+        antecedent_precipitation < lower,
+        dry,
+        np.where(antecedent_precipitation > upper, wet, curve_number)
+    )
+
+    return modified_cn.astype(dtype, copy = False)
+
+
+
+def calculate_potential_retention(
+    curve_number : np.ndarray,
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Calculate potential retention known as "S"
+    **Reference**: National Resources Conservation Service, National Engineering Handbook, Section 4 "Hydrology" (1985)
+
+    Parameters
+    ----------
+    curve_number : np.ndarray
+        An index of the land condition as indicated by soils, cover, land use - Between 0 to 100 - dimensionless
+
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    - potential_retention : np.ndarray
+        Maximum depth of storm rainfall that could potentially be abstracted by a given site - Starts from 0 - mm
+    """
+
+    dtype = resolve_dtype(curve_number, dtype = dtype)
+    curve_number = as_float_array(curve_number, dtype)
+
+    # Constant 25.4, convert inch to mm
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        s = (1000 / curve_number - 10) * 25.4
+
+    return np.where(curve_number == 0, 0, s).astype(dtype, copy = False)
+
+
+
+def scs(
+    precipitation : np.ndarray,
+    curve_number : np.ndarray,
+    rsa : np.ndarray,
+    antecedent_precipitation : np.ndarray,
+    is_growing_season : np.ndarray,
+    dtype : Any = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Description
+    -----------
+    Calculate Runoff using precipitation and curve number for all cells at once.
+    Follows ``PrimarySurfaceFlow.scs``: the curve number is only modified where the
+    antecedent precipitation is non zero.
+    **Reference**: National Resources Conservation Service, National Engineering Handbook, Section 4 "Hydrology" (1985)
+
+    Parameters
+    ----------
+    precipitation : np.ndarray
+        Event Rainfall Depth - Starts from 0 - mm
+
+    curve_number : np.ndarray
+        An index of the land condition as indicated by soils, cover, land use - Between 0 to 100 - dimensionless
+
+    rsa : np.ndarray
+        Runoff source area - 0 to 1 - dimensionless
+
+    antecedent_precipitation : np.ndarray
+        Antecedent precipitation - Starts from 0 - mm
+
+    is_growing_season : np.ndarray
+        Check whether it's growing season or not - bool
+
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    - runoff : np.ndarray
+        Runoff depth resulted from precpitation - Starts from 0 - mm
+
+    - underground_runoff : np.ndarray
+        Runoff depth that enters the soil - Starts from 0 - mm
+    """
+
+    dtype = resolve_dtype(precipitation, curve_number, rsa, antecedent_precipitation, dtype = dtype)
+    precipitation = as_float_array(precipitation, dtype)
+    curve_number = as_float_array(curve_number, dtype)
+    rsa = as_float_array(rsa, dtype)
+    antecedent_precipitation = as_float_array(antecedent_precipitation, dtype)
+
+    modified_cn = np.where(
+        antecedent_precipitation != 0,
+        modify_CN(curve_number, antecedent_precipitation, is_growing_season, dtype = dtype),
+        curve_number
+    )
+
+    potential_retention = calculate_potential_retention(modified_cn, dtype = dtype)
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        runoff = ((precipitation - 0.2 * potential_retention) ** 2 / (precipitation + 0.8 * potential_retention)) * rsa
+
+    runoff = np.where(precipitation <= 0.2 * potential_retention, 0, runoff).astype(dtype, copy = False)
+
+    underground_runoff = np.where(runoff > 0, np.maximum(precipitation - runoff, 0), 0).astype(dtype, copy = False)
+
+    return runoff, underground_runoff
@@ -0,0 +1,246 @@
+"""
+Array Versions Of The Reservoir Functions.
+
+Evaluate the Vecchia (2002) area/volume curves and the reservoir balance for
+any number of reservoirs at once.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn
+import numpy as np
+from ..model.dtype import resolve_dtype, as_float_array
+from ..model.check import check_not_negative
+
+
+
+def standard_height(
+    height : np.ndarray,
+    height_min : np.ndarray,
+    height_max : np.ndarray,
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    calculate the standard height of water in reservoirs.
+
+    Parameters
+    ----------
+    height : np.ndarray
+        height in m
+    height_min : np.ndarray
+        minimum height in m
+    height_max : np.ndarray
+        maximum height in m
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    standard_height : np.ndarray
+        standard height in m
+    """
+
+    dtype = resolve_dtype(height, height_min, height_max, dtype = dtype)
+    height, height_min, height_max = (as_float_array(h, dtype) for h in (height, height_min, height_max))
+
+    check_not_negative(height, 'height')
+    check_not_negative(height_min, 'height_min')
+    if np.any(height_min > height_max):
+        raise ValueError("height_min is greater than height_max!")
+
+    return ((height - height_min) / (height_max - height_min)).astype(dtype, copy = False)
+
+
+
+def water_area(
+    standard_height : np.ndarray,
+    max_area : np.ndarray,
+    a : np.ndarray,
+    p : np.ndarray,
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Convert standard height of water in reservoirs to area of water in m^2.
+    **Reference**: Based on Equation Vecchia, A.V., 2002
+
+    Parameters
+    ----------
+    standard_height : np.ndarray
+        standard height
+    max_area : np.ndarray
+        maximum area of water in reservoir in m^2
+    a : np.ndarray
+    p : np.ndarray
+        a and p are adjustable parameters - a>0 and p>1
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    water_area : np.ndarray
+        Area of surface water in m^2
+    """
+
+    dtype = resolve_dtype(standard_height, max_area, a, p, dtype = dtype)
+    h, max_area, a, p = (as_float_array(v, dtype) for v in (standard_height, max_area, a, p))
+
+    if np.any(a <= 0):
+        raise ValueError('a value must be greater than 0')
+    if np.any(p <= 1):
+        raise ValueError('p value must be greater than 1')
+    check_not_negative(h, 'standard_height')
+
+    temp_1 = (a * h) + (0.5 * (1 - a) * (1 - np.cos(np.pi * h)))
+    temp_2 = ((1 - a) * np.pi * np.sin(np.pi * h)) / (2 * a)
+
+    return (max_area * (temp_1 ** (p - 1)) * (1 + temp_2)).astype(dtype, copy = False)
+
+
+
+def water_volume(
+    standard_height : np.ndarray,
+    height_min : np.ndarray,
+    height_max : np.ndarray,
+    max_area : np.ndarray,
+    a : np.ndarray,
+    p : np.ndarray,
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Convert standard height of water in reservoirs to volume of water in m^3.
+    **Reference**: Based on Equation Vecchia, A.V., 2002 .
+
+    Parameters
+    ----------
+    standard_height : np.ndarray
+        standard height
+    height_min : np.ndarray
+        minimum height in m
+    height_max : np.ndarray
+        maximum height in m
+    max_area : np.ndarray
+        maximum area of water in reservoir in m^2
+    a : np.ndarray
+    p : np.ndarray
+        a and p are adjustable parameters - a>0 and p>1
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    water_volume : np.ndarray
+        volume of water in m^3
+    """
+
+    dtype = resolve_dtype(standard_height, height_min, height_max, max_area, a, p, dtype = dtype)
+    h, height_min, height_max, max_area, a, p = (
+        as_float_array(v, dtype) for v in (standard_height, height_min, height_max, max_area, a, p)
+    )
+
+    if np.any(a <= 0):
+        raise ValueError('a value must be greater than 0')
+    if np.any(p <= 1):
+        raise ValueError('p value must be greater than 1')
+    check_not_negative(h, 'standard_height')
+    if np.any(height_min > height_max):
+        raise ValueError("height_min is greater than height_max!")
+
+    water_volume = (max_area * (height_max - height_min) / (p * a)) * (a * h + 0.5 * (1 - a) * (1 - np.cos(np.pi * h))) ** p
+
+    return water_volume.astype(dtype, copy = False)
+
+
+
+def evaporation_volume(
+    evaporation : np.ndarray,
+    water_area : np.ndarray,
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Volume of water evaporated from every reservoir - the volume_evaporation of the balance.
+
+    Parameters
+    ----------
+    evaporation : np.ndarray
+        evaporation from the free surface of water in mm (see ``free_water_evaporation``)
+    water_area : np.ndarray
+        water area of every reservoir in m^2 (see ``water_area``)
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    volume_evaporation : np.ndarray
+        volume of water that vape from reservoir in m^3
+    """
+
+    dtype = resolve_dtype(evaporation, water_area, dtype = dtype)
+    volume = np.maximum(as_float_array(evaporation, dtype), 0) * as_float_array(water_area, dtype) / 1000
+
+    return volume.astype(dtype, copy = False)
+
+
+
+def remained_water_volume_at_the_end_of_current_step(
+    water_volume : np.ndarray,
+    precipitation_volume : np.ndarray,
+    volume_runoff : np.ndarray,
+    volume_groundwater : np.ndarray,
+    volume_evaporation : np.ndarray,
+    volume_wier : np.ndarray,
+    volume_infiltration : np.ndarray,
+    volume_use : np.ndarray,
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Volume of left over water in every reservoir using the balance equation for reservoirs.
+    The balance is accumulated in the dtype of ``water_volume`` (or ``dtype``) so a float64
+    volume can take float32 fluxes.
+    **Reference**: Based on Equation Nouvelot, J.F. (1993)
+
+    Parameters
+    ----------
+    water_volume : np.ndarray
+        Volume of water at the start time in m^3
+    precipitation_volume : np.ndarray
+        volume of percipitation that falls on the reservoir in m^3
+    volume_runoff : np.ndarray
+        Volume of runoff that enter reservoir from watershed in m^3
+    volume_groundwater : np.ndarray
+        volume that enters from groundwater in m^3
+    volume_evaporation : np.ndarray
+        volume of water that vape from reservoir in m^3
+    volume_wier : np.ndarray
+        The volume of water discharged from the tank in m^3
+    volume_infiltration : np.ndarray
+        volume of water that penetrate and seepage in m^3
+    volume_use : np.ndarray
+        volume of water that release and use in downstream in m^3
+    dtype : Any
+        dtype of the volume - None to keep the dtype of ``water_volume``
+
+    Returns
+    -------
+    remained_water_volume_at_the_end_of_current_step : np.ndarray
+        volume of water that remain in the reservoir at the end of the time in m^3
+    """
+
+    dtype = resolve_dtype(water_volume, dtype = dtype)
+    fluxes = [as_float_array(v, dtype) for v in (
+        precipitation_volume, volume_runoff, volume_groundwater,
+        volume_evaporation, volume_wier, volume_infiltration, volume_use
+    )]
+    precipitation_volume, volume_runoff, volume_groundwater, volume_evaporation, volume_wier, volume_infiltration, volume_use = fluxes
+
+    remained = as_float_array(water_volume, dtype) + (volume_runoff + volume_groundwater + precipitation_volume) - (
+        volume_evaporation + volume_wier + volume_infiltration + volume_use)
+
+    return np.asarray(remained).astype(dtype, copy = False)
@@ -0,0 +1,378 @@
+"""
+Routing Of Runoff Along The Flow Network Of A DEM.
+
+Flow directions (D8 or multiple flow direction) are derived once from the DEM
+of the active cells. The cells are then grouped into levels of a topological
+order: a cell is only reached after every cell draining to it. Accumulating
+a day of runoff is one vectorized sweep per level, O(cells) in total, and
+gives the discharge of every cell at once, so the hydrographs of any number
+of gauges come out of the same pass.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn
+import numpy as np
+from ..coordinate.active_cell import ActiveCellGrid
+from ..model.dtype import resolve_dtype, as_float_array
+
+
+# Row and column offsets of the 8 neighbours and their ESRI D8 codes (E, SE, S, SW, W, NW, N, NE)
+D8_OFFSETS = ((0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1))
+D8_CODES = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+
+def neighbour_drops(
+    dem : np.ndarray,
+    mask : np.ndarray,
+    cell_size : Tuple[float, float] = (1.0, 1.0)
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Slope from every cell to its 8 neighbours, NaN for neighbours outside the mask or the grid.
+
+    Parameters
+    ----------
+    dem : np.ndarray
+        2-D elevation
+    mask : np.ndarray
+        2-D boolean array, True for the active cells
+    cell_size : Tuple[float, float]
+        size of a cell along the rows and the columns (same unit as the elevation)
+
+    Returns
+    -------
+    drops : np.ndarray
+        array of shape (8, rows, cols) in the order of D8_OFFSETS - positive downhill
+    """
+
+    dem = np.where(mask, np.asarray(dem, dtype = np.float64), np.nan)
+    padded = np.pad(dem, 1, constant_values = np.nan)
+    rows, cols = dem.shape
+    dy, dx = cell_size
+
+    drops = np.empty((8,) + dem.shape)
+    for k, (di, dj) in enumerate(D8_OFFSETS):
+        neighbour = padded[1 + di:1 + di + rows, 1 + dj:1 + dj + cols]
+        drops[k] = (dem - neighbour) / np.hypot(di * dy, dj * dx)
+
+    return drops
+
+
+
+class FlowNetwork :
+
+    def __init__(self,
+        source : np.ndarray,
+        target : np.ndarray,
+        weight : np.ndarray,
+        n_cells : int
+    ):
+        """
+        Description
+        -----------
+        Directed flow graph between cells with the share of the outflow of the source
+        sent along every edge, ordered in levels for the accumulation sweeps.
+
+        Parameters
+        ----------
+        source : np.ndarray
+            cell of every edge
+        target : np.ndarray
+            downstream cell of every edge
+        weight : np.ndarray
+            share of the outflow of source going to target (1 for D8)
+        n_cells : int
+            number of cells - cells without an edge are outlets
+        """
+
+        self.source = np.asarray(source, dtype = np.intp)
+        self.target = np.asarray(target, dtype = np.intp)
+        self.weight = np.asarray(weight, dtype = np.float64)
+        self.n_cells = int(n_cells)
+        if not (self.source.shape == self.target.shape == self.weight.shape):
+            raise ValueError("source, target and weight must have the same length!")
+
+        self.level = self._levels()
+        self.levels = []
+        order = np.argsort(self.level[self.source], kind = 'stable')
+        edge_starts = np.searchsorted(self.level[self.source][order], np.arange(self.n_levels + 1))
+        cell_order = np.argsort(self.level, kind = 'stable')
+        cell_starts = np.searchsorted(self.level[cell_order], np.arange(self.n_levels + 1))
+        for k in range(self.n_levels):
+            edges = order[edge_starts[k]:edge_starts[k + 1]]
+            edges = edges[np.argsort(self.target[edges], kind = 'stable')]
+            targets, starts = np.unique(self.target[edges], return_index = True)
+            self.levels.append((cell_order[cell_starts[k]:cell_starts[k + 1]], self.source[edges], self.weight[edges], targets, starts))
+
+
+    @classmethod
+    def from_dem(
+        cls,
+        dem : np.ndarray,
+        grid : Optional[ActiveCellGrid] = None,
+        method : str = 'd8',
+        cell_size : Tuple[float, float] = (1.0, 1.0),
+        exponent : float = 1.1
+    ) -> 'FlowNetwork':
+        """
+        Description
+        -----------
+        Flow network of the active cells from a DEM. A cell drains to its steepest lower
+        neighbour (D8) or to all its lower neighbours in proportion to slope ** exponent
+        (MFD, Freeman 1991). Cells without a lower active neighbour (the basin outlet,
+        pits) are outlets - fill the pits of the DEM beforehand.
+
+        Parameters
+        ----------
+        dem : np.ndarray
+            2-D elevation, with the grid shape
+        grid : ActiveCellGrid
+            active cells - None for the cells where dem is not NaN
+        method : str
+            'd8' or 'mfd'
+        cell_size : Tuple[float, float]
+            size of a cell along the rows and the columns (same unit as the elevation)
+        exponent : float
+            exponent of the slope in the MFD shares
+
+        Returns
+        -------
+        network : FlowNetwork
+            network of the active cells in the order of the grid
+        """
+
+        dem = np.asarray(dem, dtype = np.float64)
+        if grid is None:
+            grid = ActiveCellGrid.from_raster(dem)
+        if dem.shape != grid.shape:
+            raise ValueError(f"dem must have the grid shape {grid.shape}: {dem.shape}")
+
+        drops = neighbour_drops(dem, grid.mask, cell_size)[:, grid.rows, grid.cols]
+        drops = np.where(np.isnan(drops) | (drops <= 0), 0.0, drops)
+
+        offsets = np.array(D8_OFFSETS)
+        lookup = np.full(grid.mask.size, -1, dtype = np.intp)
+        lookup[grid.index] = np.arange(grid.n_cells)
+        neighbour_rows = np.clip(grid.rows[np.newaxis] + offsets[:, :1], 0, grid.shape[0] - 1)
+        neighbour_cols = np.clip(grid.cols[np.newaxis] + offsets[:, 1:], 0, grid.shape[1] - 1)
+        neighbours = lookup[np.ravel_multi_index((neighbour_rows, neighbour_cols), grid.shape)]
+
+        if method == 'd8':
+            k = np.argmax(drops, axis = 0)
+            cells = np.flatnonzero(drops[k, np.arange(grid.n_cells)] > 0)
+            return cls(cells, neighbours[k[cells], cells], np.ones(cells.size), grid.n_cells)
+        if method == 'mfd':
+            shares = drops ** exponent
+            total = shares.sum(axis = 0)
+            directions, cells = np.nonzero(shares > 0)
+            return cls(cells, neighbours[directions, cells], shares[directions, cells] / total[cells], grid.n_cells)
+
+        raise ValueError(f"method must be 'd8' or 'mfd': {method}")
+
+
+    @classmethod
+    def from_d8(
+        cls,
+        directions : np.ndarray,
+        grid : Optional[ActiveCellGrid] = None
+    ) -> 'FlowNetwork':
+        """
+        Description
+        -----------
+        Flow network of the active cells from an ESRI D8 direction raster (1, 2, 4, ..., 128).
+        Cells draining outside the active cells, or with another code, are outlets.
+        """
+
+        directions = np.asarray(directions)
+        if grid is None:
+            grid = ActiveCellGrid(np.isin(directions, D8_CODES))
+
+        codes = directions[grid.rows, grid.cols]
+        known = np.isin(codes, D8_CODES)
+        k = np.searchsorted(D8_CODES, np.where(known, codes, 1))
+        offsets = np.array(D8_OFFSETS)[k]
+        rows = grid.rows + offsets[:, 0]
+        cols = grid.cols + offsets[:, 1]
+        inside = known & (rows >= 0) & (rows < grid.shape[0]) & (cols >= 0) & (cols < grid.shape[1])
+
+        lookup = np.full(grid.mask.size, -1, dtype = np.intp)
+        lookup[grid.index] = np.arange(grid.n_cells)
+        target = np.full(grid.n_cells, -1, dtype = np.intp)
+        target[inside] = lookup[np.ravel_multi_index((rows[inside], cols[inside]), grid.shape)]
+        cells = np.flatnonzero(target >= 0)
+
+        return cls(cells, target[cells], np.ones(cells.size), grid.n_cells)
+
+
+    @property
+    def n_levels(self) -> int:
+        return int(self.level.max(initial = -1)) + 1
+
+
+    @property
+    def outlets(self) -> np.ndarray:
+        """
+        Description
+        -----------
+        Cells that do not drain to another cell.
+        """
+
+        return np.setdiff1d(np.arange(self.n_cells), self.source)
+
+
+    def _levels(self) -> np.ndarray:
+        """
+        Description
+        -----------
+        Level of every cell (longest path from a cell without inflow) by Kahn's algorithm,
+        one vectorized step per level.
+        """
+
+        order = np.argsort(self.source, kind = 'stable')
+        pointer = np.searchsorted(self.source[order], np.arange(self.n_cells + 1))
+        remaining = np.bincount(self.target, minlength = self.n_cells)
+        level = np.full(self.n_cells, -1, dtype = np.int64)
+
+        current = np.flatnonzero(remaining == 0)
+        k = 0
+        while current.size:
+            level[current] = k
+            counts = pointer[current + 1] - pointer[current]
+            edges = order[_ranges(pointer[current], counts)]
+            targets = self.target[edges]
+            remaining -= np.bincount(targets, minlength = self.n_cells)
+            targets = np.unique(targets)
+            current = targets[remaining[targets] == 0]
+            k += 1
+
+        if np.any(level < 0):
+            raise ValueError("flow network has a cycle (flat areas or pits in the DEM?)!")
+
+        return level
+
+
+    def accumulate(
+        self,
+        values : np.ndarray,
+        dtype : Any = None
+    ) -> np.ndarray:
+        """
+        Description
+        -----------
+        Sum of values over every cell and all the cells upstream of it (flow accumulation).
+
+        Parameters
+        ----------
+        values : np.ndarray
+            local contribution of every cell, such as runoff + late_runoff - array of shape
+            (..., cells), for example (days, cells) to route a whole block at once
+        dtype : Any
+            dtype of the result - None to follow values
+
+        Returns
+        -------
+        accumulated : np.ndarray
+            array of the shape of values
+        """
+
+        dtype = resolve_dtype(values, dtype = dtype)
+        total = np.array(np.broadcast_to(as_float_array(values, dtype), np.shape(values)[:-1] + (self.n_cells,)))
+
+        for _, source, weight, targets, starts in self.levels:
+            if source.size:
+                total[..., targets] += np.add.reduceat(total[..., source] * weight, starts, axis = -1)
+
+        return total
+
+
+    def route(
+        self,
+        values : np.ndarray,
+        storage : Optional[np.ndarray] = None,
+        k : Optional[np.ndarray] = None,
+        dtype : Any = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Description
+        -----------
+        Route local contributions day by day through a linear reservoir in every cell:
+        the inflow (local plus upstream outflow of the same day) is added to the storage
+        and storage * (1 - exp(-1 / k)) leaves the cell.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            local contribution of every cell, shape (days, ..., cells)
+        storage : np.ndarray
+            storage of the cells at the start - None for empty reservoirs
+        k : np.ndarray
+            residence time of every cell in days - None or 0 for no lag (``accumulate``)
+        dtype : Any
+            dtype of the results - None to follow values
+
+        Returns
+        -------
+        outflow : np.ndarray
+            outflow of every cell on every day, shape of values
+        storage : np.ndarray
+            storage of the cells at the end
+        """
+
+        dtype = resolve_dtype(values, dtype = dtype)
+        values = as_float_array(values, dtype)
+        if k is None:
+            return self.accumulate(values, dtype = dtype), np.zeros(values.shape[1:], dtype = dtype)
+
+        k = np.broadcast_to(np.asarray(k, dtype = np.float64), (self.n_cells,))
+        with np.errstate(divide = 'ignore'):
+            release = np.where(k > 0, -np.expm1(-1 / np.where(k > 0, k, 1)), 1.0).astype(dtype)
+        storage = np.zeros(values.shape[1:], dtype = dtype) if storage is None else np.array(storage, dtype = dtype)
+
+        outflow = np.empty_like(values)
+        for t in range(values.shape[0]):
+            inflow = values[t].copy()
+            for cells, source, weight, targets, starts in self.levels:
+                water = storage[..., cells] + inflow[..., cells]
+                out = water * release[cells]
+                storage[..., cells] = water - out
+                inflow[..., cells] = out
+                if source.size:
+                    inflow[..., targets] += np.add.reduceat(inflow[..., source] * weight, starts, axis = -1)
+            outflow[t] = inflow
+
+        return outflow, storage
+
+
+    def upstream_cells(self) -> np.ndarray:
+        """
+        Description
+        -----------
+        Number of cells draining through every cell (itself included) - the contributing area in cells.
+        """
+
+        return self.accumulate(np.ones(self.n_cells))
+
+
+    def __repr__(self) -> str:
+        return f"FlowNetwork(n_cells={self.n_cells}, n_edges={self.source.size}, n_levels={self.n_levels})"
+
+
+
+def _ranges(
+    starts : np.ndarray,
+    counts : np.ndarray
+) -> np.ndarray:
+
+    """
+    Description
+    -----------
+    Concatenation of the ranges [start, start + count).
+    """
+
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype = np.intp)
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+
+    return offsets + np.arange(total)
@@ -0,0 +1,183 @@
+"""
+Array Versions Of The Snow Pack Functions.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn
+import numpy as np
+from ..model.dtype import resolve_dtype, as_float_array
+
+
+# Degree Day factor = 1.5 (mm/day.°c)
+DEGREE_DAY_FACTOR = 1.5
+
+
+
+def check_snow_fall_or_not(
+    tmax : np.ndarray,
+    tmin : np.ndarray,
+    tmean : np.ndarray
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Check snowfall for all cells.
+    **Reference**: Based on Equation 1-2 in SWB Version 2.0 (2018).
+
+    Parameters
+    ----------
+    tmax : np.ndarray
+        Maximum Daily Temperature [Degrees Celsius]
+
+    tmin : np.ndarray
+        Minimum Daily Temperature [Degrees Celsius]
+
+    tmean : np.ndarray
+        Mean Daily Temperature [Degrees Celsius]
+
+    Returns
+    -------
+    is_snow : np.ndarray
+        True where the precipitation falls as snow
+    """
+
+    return (np.asarray(tmean) - (np.asarray(tmax) - np.asarray(tmin)) / 3) <= 0
+
+
+
+def snow_melt(
+    tmax : np.ndarray,
+    degree_day_factor : np.ndarray = DEGREE_DAY_FACTOR,
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Calculate potential snow melting rate, zero where the maximum temperature is below freezing.
+    **Reference**: Based on Equation 1-3 in SWB Version 2.0 (2018).
+
+    Parameters
+    ----------
+    tmax : np.ndarray
+        Maximum Daily Temperature [Degrees Celsius]
+
+    degree_day_factor : np.ndarray
+        Degree day factor [mm / day.°c]
+
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    M : np.ndarray
+        Snow melting rate [mm / day]
+    """
+
+    dtype = resolve_dtype(tmax, degree_day_factor, dtype = dtype)
+    tmax = as_float_array(tmax, dtype)
+
+    return np.where(tmax > 0, as_float_array(degree_day_factor, dtype) * tmax, 0).astype(dtype, copy = False)
+
+
+
+def sublimation_snow_and_ice_surface(
+    wind_speed_at_10m_above_ground_surface : np.ndarray,
+    saturated_vapor_pressure_at_snow_surface_temperature : np.ndarray,
+    steam_pressure_at_2m_above_snow_surface : np.ndarray,
+    dtype : Any = None
+) -> np.ndarray:
+    """
+    Description
+    -----------
+    Calculate evaporation from snow and ice surfaces.
+    **Reference**: Based on Equation 55-6 in Instructions for methods of calculating the balance of water resources(1393).
+
+    Parameters
+    ----------
+    wind_speed_at_10m_above_ground_surface : np.ndarray
+        Average daily values of wind speed at a height of 10 meters above the snow surface [m / s]
+
+    saturated_vapor_pressure_at_snow_surface_temperature : np.ndarray
+        Saturated vapor pressure corresponding to the temperature of the snow surface [Kpa]
+
+    steam_pressure_at_2m_above_snow_surface : np.ndarray
+        steam pressure at a height of 2 meters above the snow surface [Kpa]
+
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    E : np.ndarray
+        Evaporation [mm / day]
+    """
+
+    dtype = resolve_dtype(
+        wind_speed_at_10m_above_ground_surface,
+        saturated_vapor_pressure_at_snow_surface_temperature,
+        steam_pressure_at_2m_above_snow_surface,
+        dtype = dtype
+    )
+    u10 = as_float_array(wind_speed_at_10m_above_ground_surface, dtype)
+    esn = as_float_array(saturated_vapor_pressure_at_snow_surface_temperature, dtype)
+    e2 = as_float_array(steam_pressure_at_2m_above_snow_surface, dtype)
+
+    return ((0.18 + 0.98 * u10) * (esn - e2)).astype(dtype, copy = False)
+
+
+
+def snow_pack(
+    precipitation : np.ndarray,
+    tmax : np.ndarray,
+    tmin : np.ndarray,
+    tmean : np.ndarray,
+    snowpack : np.ndarray,
+    degree_day_factor : np.ndarray = DEGREE_DAY_FACTOR,
+    dtype : Any = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Description
+    -----------
+    Split precipitation into snowfall and rainfall and update the snow water equivalent
+    of the snow pack for one step. Melt is limited by the available snow.
+
+    Parameters
+    ----------
+    precipitation : np.ndarray
+        precipitation in mm
+    tmax : np.ndarray
+        Maximum Daily Temperature [Degrees Celsius]
+    tmin : np.ndarray
+        Minimum Daily Temperature [Degrees Celsius]
+    tmean : np.ndarray
+        Mean Daily Temperature [Degrees Celsius]
+    snowpack : np.ndarray
+        snow water equivalent at previous step in mm
+    degree_day_factor : np.ndarray
+        Degree day factor [mm / day.°c]
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    -------
+    snowfall : np.ndarray
+        precipitation falling as snow in mm
+    rainfall : np.ndarray
+        precipitation falling as rain in mm
+    melt : np.ndarray
+        snow melt in mm
+    snowpack : np.ndarray
+        snow water equivalent at current step in mm
+    """
+
+    dtype = resolve_dtype(precipitation, tmax, tmin, tmean, snowpack, degree_day_factor, dtype = dtype)
+    precipitation = as_float_array(precipitation, dtype)
+    snowpack = as_float_array(snowpack, dtype)
+
+    is_snow = check_snow_fall_or_not(tmax = tmax, tmin = tmin, tmean = tmean)
+    snowfall = np.where(is_snow, precipitation, 0).astype(dtype, copy = False)
+    rainfall = (precipitation - snowfall).astype(dtype, copy = False)
+
+    available = snowpack + snowfall
+    melt = np.minimum(snow_melt(tmax, degree_day_factor, dtype = dtype), available).astype(dtype, copy = False)
+
+    return snowfall, rainfall, melt, (available - melt).astype(dtype, copy = False)
@@ -0,0 +1,274 @@
+"""
+Soil Hydraulic Properties From Texture (Pedotransfer).
+
+Array version of the Saxton and Rawls (2006) equations used in ``bilan.ipynb``.
+Sand, clay and organic matter are given for the standard OpenLandMap depths
+(b0, b10, b30, b60, b100, b200) with depth on the first axis, so every depth
+and every cell is computed at once. The profiles are then averaged over the
+evaporation, transpiration and transition layers of the soil engine.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn
+import hashlib
+import os
+import numpy as np
+from .constant import *
+from ..model.dtype import resolve_dtype, as_float_array
+
+
+# Standard depths of the OpenLandMap soil layers [cm]
+STANDARD_DEPTHS = (0, 10, 30, 60, 100, 200)
+
+# Bands of the standard depths
+STANDARD_BANDS = tuple(f"b{depth}" for depth in STANDARD_DEPTHS)
+
+# Hours in a day - the saturated hydraulic conductivity is in mm/h, the stages run in mm/day
+HOURS_PER_DAY = 24
+
+# Version of the layer parameters kept in the cache - changed when their names or units change
+PEDOTRANSFER_VERSION = 2
+
+
+
+def saxton_rawls(
+    sand : np.ndarray,
+    clay : np.ndarray,
+    organic_matter : np.ndarray,
+    dtype : Any = None
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    ------------
+    Moisture at wilting point and field capacity, saturation and saturated hydraulic
+    conductivity from the soil texture.
+    **Reference**: Saxton, K. E. and Rawls, W. J. (2006), Table 1, eq 1 to 3, 5 and 16.
+
+    Parameters
+    ------------
+    sand : np.ndarray
+        sand fraction [% w / 100]
+    clay : np.ndarray
+        clay fraction [% w / 100]
+    organic_matter : np.ndarray
+        organic matter [% w]
+    dtype : Any
+        dtype of the results - None to follow the inputs
+
+    Returns
+    ------------
+    properties : Dict[str, np.ndarray]
+        'wilting_point' (θ1500), 'field_capacity' (θ33), 'saturation' (θS) and
+        'available_water' (θ33 - θ1500) in percent (volume), and
+        'saturated_hydraulic_conductivity' (Ks) in mm/h
+    """
+
+    dtype = resolve_dtype(sand, clay, organic_matter, dtype = dtype)
+    s = as_float_array(sand, dtype)
+    c = as_float_array(clay, dtype)
+    om = as_float_array(organic_matter, dtype)
+
+    t1500 = -0.024 * s + 0.487 * c + 0.006 * om + 0.005 * s * om - 0.013 * c * om + 0.068 * s * c + 0.031
+    theta_1500 = t1500 + (0.14 * t1500 - 0.02)
+
+    t33 = -0.251 * s + 0.195 * c + 0.011 * om + 0.006 * s * om - 0.027 * c * om + 0.452 * s * c + 0.299
+    theta_33 = t33 + (1.283 * t33 ** 2 - 0.374 * t33 - 0.015)
+
+    ts33 = 0.278 * s + 0.034 * c + 0.022 * om - 0.018 * s * om - 0.027 * c * om - 0.584 * s * c + 0.078
+    theta_s33 = ts33 + (0.636 * ts33 - 0.107)
+    theta_s = theta_33 + theta_s33 - 0.097 * s + 0.043
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        b = (np.log(1500) - np.log(33)) / (np.log(theta_33) - np.log(theta_1500))
+        ksat = 1930 * np.maximum(theta_s - theta_33, 0) ** (3 - 1 / b)
+
+    return {
+        'wilting_point': (theta_1500 * 100).astype(dtype, copy = False),
+        'field_capacity': (theta_33 * 100).astype(dtype, copy = False),
+        'saturation': (theta_s * 100).astype(dtype, copy = False),
+        'available_water': ((theta_33 - theta_1500) * 100).astype(dtype, copy = False),
+        'saturated_hydraulic_conductivity': np.asarray(ksat).astype(dtype, copy = False)
+    }
+
+
+
+def hourly_to_daily(
+    values : np.ndarray
+) -> np.ndarray:
+    """
+    Description
+    ------------
+    Rate per hour (such as the saturated hydraulic conductivity in mm/h) as a rate per
+    day (mm/day), the unit of the stages.
+    """
+
+    values = np.asarray(values)
+
+    return (values * HOURS_PER_DAY).astype(values.dtype, copy = False)
+
+
+
+def depth_weights(
+    top : np.ndarray,
+    bottom : np.ndarray,
+    depths : Tuple[float, ...] = STANDARD_DEPTHS
+) -> np.ndarray:
+    """
+    Description
+    ------------
+    Weights of the standard depths in the mean of a layer. The profile is linear between
+    the standard depths and constant below the deepest one.
+
+    Parameters
+    ------------
+    top : np.ndarray
+        top of the layer [mm]
+    bottom : np.ndarray
+        bottom of the layer [mm]
+    depths : Tuple[float, ...]
+        standard depths [cm]
+
+    Returns
+    ------------
+    weights : np.ndarray
+        array of shape (depths, ...) - sum over the first axis is 1
+    """
+
+    nodes = np.asarray(depths, dtype = np.float64) * 10
+    top = np.asarray(top, dtype = np.float64)
+    bottom = np.asarray(bottom, dtype = np.float64)
+    if np.any(bottom <= top):
+        raise ValueError("bottom of a layer must be deeper than its top!")
+
+    shape = np.broadcast_shapes(top.shape, bottom.shape)
+    weights = np.zeros((len(nodes),) + shape)
+    for k in range(len(nodes) - 1):
+        d0, d1 = nodes[k], nodes[k + 1]
+        h = d1 - d0
+        lo = np.clip(top, d0, d1)
+        hi = np.clip(bottom, d0, d1)
+        weights[k] += ((d1 - lo) ** 2 - (d1 - hi) ** 2) / (2 * h)
+        weights[k + 1] += ((hi - d0) ** 2 - (lo - d0) ** 2) / (2 * h)
+    # constant below the deepest depth
+    weights[-1] += np.maximum(bottom, nodes[-1]) - np.maximum(top, nodes[-1])
+
+    return weights / (bottom - top)
+
+
+
+def layer_mean(
+    profile : np.ndarray,
+    top : np.ndarray,
+    bottom : np.ndarray,
+    depths : Tuple[float, ...] = STANDARD_DEPTHS
+) -> np.ndarray:
+    """
+    Description
+    ------------
+    Mean of a profile given at the standard depths over a layer.
+
+    Parameters
+    ------------
+    profile : np.ndarray
+        values of shape (depths, ...cells)
+    top : np.ndarray
+        top of the layer [mm] - scalar or one value per cell
+    bottom : np.ndarray
+        bottom of the layer [mm] - scalar or one value per cell
+    depths : Tuple[float, ...]
+        standard depths [cm]
+
+    Returns
+    ------------
+    mean : np.ndarray
+        array of shape (...cells)
+    """
+
+    profile = np.asarray(profile)
+    if profile.shape[0] != len(depths):
+        raise ValueError(f"profile must have {len(depths)} depths on the first axis: {profile.shape}")
+
+    weights = depth_weights(top, bottom, depths)
+    weights = weights.reshape(weights.shape + (1,) * (profile.ndim - weights.ndim))
+
+    return (weights * profile).sum(axis = 0).astype(profile.dtype, copy = False)
+
+
+
+def soil_layer_parameters(
+    sand : np.ndarray,
+    clay : np.ndarray,
+    organic_matter : np.ndarray,
+    z_transpiration_layer : np.ndarray,
+    depths : Tuple[float, ...] = STANDARD_DEPTHS,
+    cache : Optional[str] = None,
+    dtype : Any = None
+) -> Dict[str, np.ndarray]:
+    """
+    Description
+    ------------
+    Field capacity, wilting point and saturated hydraulic conductivity of the three
+    layers of the soil engine from texture profiles. The evaporation layer is at the
+    top, the transpiration layer below it and the transition layer below both. The
+    conductivity of Saxton and Rawls (mm/h) is converted to the daily step of the stages.
+
+    Parameters
+    ------------
+    sand : np.ndarray
+        sand fraction [% w / 100] - shape (depths, ...cells)
+    clay : np.ndarray
+        clay fraction [% w / 100] - shape (depths, ...cells)
+    organic_matter : np.ndarray
+        organic matter [% w] - shape (depths, ...cells)
+    z_transpiration_layer : np.ndarray
+        thickness of the transpiration layer [mm] - scalar or one value per cell
+    depths : Tuple[float, ...]
+        depths of the first axis [cm]
+    cache : str
+        directory where the result of each grid is kept - None for no cache
+    dtype : Any
+        dtype of the results - None to follow the inputs
+
+    Returns
+    ------------
+    parameters : Dict[str, np.ndarray]
+        fc_*, pwp_* (percent) and hydraulic_conductivity_* (mm/day) of the evaporation,
+        transpiration and transition layers, named as the parameters of the stages
+    """
+
+    path = None
+    if cache is not None:
+        digest = hashlib.blake2b(digest_size = 20)
+        digest.update(f"v{PEDOTRANSFER_VERSION}".encode())
+        for values in (sand, clay, organic_matter, z_transpiration_layer, depths,
+                       soil_depth.get('evaporation_layer'), soil_depth.get('transition_layer')):
+            values = np.ascontiguousarray(values)
+            digest.update(f"{values.dtype.str}{values.shape}".encode())
+            digest.update(values.tobytes())
+        os.makedirs(cache, exist_ok = True)
+        path = os.path.join(cache, f"pedotransfer_{digest.hexdigest()}.npz")
+        if os.path.exists(path):
+            with np.load(path) as stored:
+                return {name: stored[name] for name in stored.files}
+
+    properties = saxton_rawls(sand, clay, organic_matter, dtype = dtype)
+
+    z_e = soil_depth.get('evaporation_layer')
+    z_t = np.asarray(z_transpiration_layer, dtype = np.float64)
+    layers = {
+        'evaporation_layer': (0, z_e),
+        'transpiration_layer': (z_e, z_e + z_t),
+        'transition_layer': (z_e + z_t, z_e + z_t + soil_depth.get('transition_layer'))
+    }
+    names = {'fc': 'field_capacity', 'pwp': 'wilting_point', 'hydraulic_conductivity': 'saturated_hydraulic_conductivity'}
+    properties['saturated_hydraulic_conductivity'] = hourly_to_daily(properties['saturated_hydraulic_conductivity'])
+
+    parameters = {
+        f"{prefix}_{layer}": layer_mean(properties[name], top, bottom, depths)
+        for layer, (top, bottom) in layers.items()
+        for prefix, name in names.items()
+    }
+
+    if path is not None:
+        np.savez(path, **parameters)
+
+    return parameters
@@ -1,5 +1,6 @@
 
 from .constant import *
+from . import vectorized
 
 class SoilContent :
 
@@ -79,7 +80,8 @@ class SoilContent :
         """
         Description
         ------------
-        calculating soil water content of trans layer
+        calculating upward flux between the layers of one cell (scalar call of
+        vectorized.upward_flux)
         ------------
         coverd: bool
             corved yes(True) or not coverd no(False)
@@ -111,64 +113,46 @@ class SoilContent :
         Returns
         ------------
         upward_transpiration_to_evaporation: float
-            upward flux from transpiration to evaporation layer in milimeter
-        upward_transition_to_transpiration
-            upward flux from transition to transpiration layer in milimeter
-        upward_transition_to_evaporation
-            upward flux from transition to evaporation layer in milimeter
+            upward flux from transpiration to evaporation layer in milimeter (0 if not coverd)
+        upward_transition_to_transpiration: float
+            upward flux from transition to transpiration layer in milimeter (0 if not coverd)
+        upward_transition_to_evaporation: float
+            upward flux from transition to evaporation layer in milimeter (0 if coverd)
         """
 
-
-        evaporation_layer_soil_depth = soil_depth.get('evaporation_layer_covered')
-        transition_layer_soil_depth = soil_depth.get('transition_layer')
-
-        temp_1_fc = (field_capacity_soil_water_content_of_evaporation_layer / 100) * (evaporation_layer_soil_depth * 10)
-        temp_3_fc = (field_capacity_soil_water_content_of_transition_layer / 100) * (transition_layer_soil_depth * 10)
-
-        temp_1_pwp = (permanent_wilting_point_soil_water_content_of_evaporation_layer / 100) * (evaporation_layer_soil_depth * 10)
-        temp_3_pwp = (permanent_wilting_point_soil_water_content_of_transition_layer / 100) * (transition_layer_soil_depth * 10)
-
-        t1 = (soil_water_content_of_evaporation_layer_at_previous_step - temp_1_pwp) / (temp_1_fc - temp_1_pwp)
-        t3 = (soil_water_content_of_transition_layer_at_previous_step - temp_3_pwp) / (temp_3_fc - temp_3_pwp)
-
-        
-
-        if coverd == True :
-            if soil_water_content_of_transpiration_layer_at_previous_step >= soil_water_content_of_transition_layer_at_previous_step:
-                upward_transition_to_transpiration = 0
-
-
-            elif soil_water_content_of_evaporation_layer_at_previous_step >= soil_water_content_of_transpiration_layer_at_previous_step:
-                upward_transpiration_to_evaporation = 0
-
-            else:
-                
-                temp_2_fc = (field_capacity_soil_water_content_of_transpiration_layer / 100) * (root_depth * 10)
-                
-
-                
-                temp_2_pwp = (permanent_wilting_point_soil_water_content_of_transpiration_layer / 100) * (root_depth * 10)
-                
-
-                
-                t2 = (soil_water_content_of_transpiration_layer_at_previous_step - temp_2_pwp) / (temp_2_fc - temp_2_pwp)
-                
-
-                alpha_transpiration_to_evaporation = (t2 - t1)
-                alpha_transition_to_transpiration = (t3 - t2)
-
-                upward_transpiration_to_evaporation = alpha_transpiration_to_evaporation * hydraulic_conductivity_of_transpiration_layer
-                upward_transition_to_transpiration = alpha_transition_to_transpiration * hydraulic_conductivity_of_transition_layer
-                upward_transition_to_evaporation = None
-
-        else:
-            alpha_transition_to_evaporation = (t3 - t1)
-            upward_transition_to_evaporation = alpha_transition_to_evaporation * hydraulic_conductivity_of_transition_layer
-            upward_transition_to_transpiration = None
-            upward_transpiration_to_evaporation = None
-
-
-        return upward_transpiration_to_evaporation,upward_transition_to_transpiration,upward_transition_to_evaporation
+        def value(x):
+            return 0.0 if x is None else x
+
+        fluxes, _ = vectorized.upward_flux(
+            covered = coverd,
+            swc = {
+                'evaporation_layer': soil_water_content_of_evaporation_layer_at_previous_step,
+                'transpiration_layer': value(soil_water_content_of_transpiration_layer_at_previous_step),
+                'transition_layer': soil_water_content_of_transition_layer_at_previous_step
+            },
+            fc = {
+                'evaporation_layer': field_capacity_soil_water_content_of_evaporation_layer,
+                'transpiration_layer': value(field_capacity_soil_water_content_of_transpiration_layer),
+                'transition_layer': field_capacity_soil_water_content_of_transition_layer
+            },
+            pwp = {
+                'evaporation_layer': permanent_wilting_point_soil_water_content_of_evaporation_layer,
+                'transpiration_layer': value(permanent_wilting_point_soil_water_content_of_transpiration_layer),
+                'transition_layer': permanent_wilting_point_soil_water_content_of_transition_layer
+            },
+            hydraulic_conductivity = {
+                'transpiration_layer': value(hydraulic_conductivity_of_transpiration_layer),
+                'transition_layer': hydraulic_conductivity_of_transition_layer
+            },
+            z_transpiration_layer = value(root_depth) * 10,
+            dtype = float
+        )
+
+        return (
+            float(fluxes['upward_transpiration_to_evaporation']),
+            float(fluxes['upward_transition_to_transpiration']),
+            float(fluxes['upward_transition_to_evaporation'])
+        )
 
 
     def evaporation_layer(
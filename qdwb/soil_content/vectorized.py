@@ -0,0 +1,293 @@
+"""
+Batched Soil Engine.
+
+Array version of ``SoilContent.waterSoilContentCoverd`` and
+``SoilContent.waterSoilContentNotCoverd`` in ``soil.py``. Covered and not
+covered cells are handled in one pass with a mask: in covered cells the
+evaporation layer drains to the transpiration layer, in not covered cells it
+drains directly to the transition layer and the transpiration layer is left
+unchanged.
+"""
+
+from typing import List, Dict, Tuple, Set, Optional, Union, Any, NoReturn
+import numpy as np
+from .constant import *
+from ..model.dtype import resolve_dtype, as_float_array
+
+
+
+def layer_capacity(
+    percent : np.ndarray,
+    depth : np.ndarray
+) -> np.ndarray:
+    """
+    Description
+    ------------
+    Convert a volumetric soil water content in percent to a depth of water.
+
+    Parameters
+    ------------
+    percent : np.ndarray
+        soil water content in percent (volume)
+    depth : np.ndarray
+        thickness of the layer in milimeter
+
+    Returns
+    ------------
+    water : np.ndarray
+        soil water content in milimeter
+    """
+
+    return percent * depth / 100
+
+
+
+def water_soil_content(
+    covered : np.ndarray,
+    infiltration : np.ndarray,
+    evaporation : np.ndarray,
+    transpiration : np.ndarray,
+    init_swc_evaporation_layer : np.ndarray,
+    init_swc_transpiration_layer : np.ndarray,
+    init_swc_transition_layer : np.ndarray,
+    fc_evaporation_layer : np.ndarray,
+    fc_transpiration_layer : np.ndarray,
+    fc_transition_layer : np.ndarray,
+    pwp_evaporation_layer : np.ndarray,
+    pwp_transpiration_layer : np.ndarray,
+    pwp_transition_layer : np.ndarray,
+    z_transpiration_layer : np.ndarray,
+    stress_coefficient : np.ndarray = 1,
+    MAD : np.ndarray = 0,
+    dtype : Any = None
+) -> Tuple[np.ndarray, ...]:
+    """
+    Description
+    ------------
+    Soil water content of the evaporation, transpiration and transition layers for all cells at once
+
+    Parameters
+    ------------
+    covered : np.ndarray
+        corved yes(True) or not coverd no(False)
+    infiltration : np.ndarray
+        infiltration in milimeter
+    evaporation : np.ndarray
+        evaporation in milimeter
+    transpiration : np.ndarray
+        transpiration in milimeter - ignored in not covered cells
+    init_swc_evaporation_layer : np.ndarray
+        soil water content of evaporation layer at previous step in milimeter
+    init_swc_transpiration_layer : np.ndarray
+        soil water content of transpiration layer at previous step in milimeter
+    init_swc_transition_layer : np.ndarray
+        soil water content of transition layer at previous step in milimeter
+    fc_evaporation_layer, fc_transpiration_layer, fc_transition_layer : np.ndarray
+        field capacity of each layer in percent
+    pwp_evaporation_layer, pwp_transpiration_layer, pwp_transition_layer : np.ndarray
+        permanent wilting point of each layer in percent
+    z_transpiration_layer : np.ndarray
+        thickness of the transpiration layer in milimeter
+    stress_coefficient : np.ndarray
+        deficit irrigation - between 0 - 1 in unitless
+    MAD : np.ndarray
+        MAD(Maximum Allowable Depletion) between 0 to 1
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    ------------
+    current_swc_evaporation_layer : np.ndarray
+        soil water content of evaporation layer in milimeter
+    current_swc_transpiration_layer : np.ndarray
+        soil water content of transpiration layer in milimeter
+    current_swc_transition_layer : np.ndarray
+        soil water content of transition layer in milimeter
+    transpiration : np.ndarray
+        adjusted transpiration in milimeter
+    evaporation : np.ndarray
+        adjusted evaporation in milimeter
+    evaporation_layer_drainage : np.ndarray
+        flow out of the evaporation layer (to transpiration layer if covered, to transition layer otherwise) in milimeter
+    transpiration_layer_drainage : np.ndarray
+        flow from transpiration layer to transition layer in milimeter
+    irrigation_requirement : np.ndarray
+        irrigation requirement in milimeter
+    deep_percolation : np.ndarray
+        deep percolation out of the transition layer in milimeter
+    """
+
+    dtype = resolve_dtype(
+        infiltration, evaporation, transpiration,
+        init_swc_evaporation_layer, init_swc_transpiration_layer, init_swc_transition_layer,
+        dtype = dtype
+    )
+    covered = np.asarray(covered, dtype = bool)
+    infiltration = as_float_array(infiltration, dtype)
+    evaporation = as_float_array(evaporation, dtype)
+    transpiration = as_float_array(transpiration, dtype)
+    stress_coefficient = as_float_array(stress_coefficient, dtype)
+    MAD = as_float_array(MAD, dtype)
+
+    # current soil water content of Evaporation Layer:-------------------------------------------------------------------------------------------
+
+    fc_e = layer_capacity(as_float_array(fc_evaporation_layer, dtype), soil_depth.get('evaporation_layer'))
+    pwp_e = layer_capacity(as_float_array(pwp_evaporation_layer, dtype), soil_depth.get('evaporation_layer'))
+
+    temp_1 = np.maximum(as_float_array(init_swc_evaporation_layer, dtype), pwp_e) + infiltration - evaporation
+
+    above_fc = temp_1 >= fc_e
+    below_pwp = ~above_fc & (temp_1 <= pwp_e)
+
+    evaporation_layer_drainage = np.where(above_fc, temp_1 - fc_e, 0)
+    current_swc_evaporation_layer = np.where(above_fc, fc_e, np.where(below_pwp, pwp_e, temp_1))
+    evaporation = np.where(below_pwp, evaporation - (pwp_e - temp_1), evaporation)
+
+    # current soil water content of Transpiration Layer:-------------------------------------------------------------------------------------------
+
+    z_t = as_float_array(z_transpiration_layer, dtype)
+    fc_t = layer_capacity(as_float_array(fc_transpiration_layer, dtype), z_t)
+    pwp_t = layer_capacity(as_float_array(pwp_transpiration_layer, dtype), z_t)
+    init_t = as_float_array(init_swc_transpiration_layer, dtype)
+
+    temp_2 = np.maximum(init_t, pwp_t) + evaporation_layer_drainage - transpiration
+
+    fc_t_for_deficit_irrigation = fc_t * stress_coefficient
+    available_water = fc_t - pwp_t
+    swc_t_in_MAD = fc_t - (MAD * available_water)
+
+    above_fc = temp_2 >= fc_t
+    below_pwp = ~above_fc & (temp_2 <= pwp_t)
+    in_MAD = ~above_fc & ~below_pwp & (swc_t_in_MAD >= temp_2)
+
+    transpiration_layer_drainage = np.where(above_fc, temp_2 - fc_t, 0)
+    current_swc_transpiration_layer = np.where(
+        above_fc | in_MAD, fc_t, np.where(below_pwp, pwp_t, temp_2)
+    )
+    irrigation_requirement = np.where(
+        below_pwp, fc_t_for_deficit_irrigation - temp_2, np.where(in_MAD, fc_t - temp_2, 0)
+    )
+    transpiration = np.where(below_pwp, transpiration - (pwp_t - temp_2), transpiration)
+
+    # not covered cells skip the transpiration layer
+    transpiration_layer_drainage = np.where(covered, transpiration_layer_drainage, 0)
+    current_swc_transpiration_layer = np.where(covered, current_swc_transpiration_layer, init_t)
+    irrigation_requirement = np.where(covered, irrigation_requirement, 0)
+    transpiration = np.where(covered, transpiration, 0)
+
+    # current soil water content of Transition Layer:-------------------------------------------------------------------------------------------
+
+    fc_tr = layer_capacity(as_float_array(fc_transition_layer, dtype), soil_depth.get('transition_layer'))
+    pwp_tr = layer_capacity(as_float_array(pwp_transition_layer, dtype), soil_depth.get('transition_layer'))
+
+    temp_3 = np.maximum(as_float_array(init_swc_transition_layer, dtype), pwp_tr) + np.where(
+        covered, transpiration_layer_drainage, evaporation_layer_drainage
+    )
+
+    above_fc = temp_3 >= fc_tr
+    deep_percolation = np.where(above_fc, temp_3 - fc_tr, 0)
+    current_swc_transition_layer = np.where(above_fc, fc_tr, np.where(temp_3 <= pwp_tr, pwp_tr, temp_3))
+
+    return tuple(np.asarray(a).astype(dtype, copy = False) for a in (
+        current_swc_evaporation_layer,
+        current_swc_transpiration_layer,
+        current_swc_transition_layer,
+        transpiration,
+        evaporation,
+        evaporation_layer_drainage,
+        transpiration_layer_drainage,
+        irrigation_requirement,
+        deep_percolation
+    ))
+
+
+
+# Upward (capillary) fluxes in the order they are applied: (name, source layer, sink layer, cells)
+# cells is 'covered', 'not_covered' or 'all' - in not covered cells the evaporation layer lies on the transition layer
+UPWARD_FLUXES = (
+    ('upward_transition_to_transpiration', 'transition_layer', 'transpiration_layer', 'covered'),
+    ('upward_transpiration_to_evaporation', 'transpiration_layer', 'evaporation_layer', 'covered'),
+    ('upward_transition_to_evaporation', 'transition_layer', 'evaporation_layer', 'not_covered')
+)
+
+
+
+def upward_flux(
+    covered : np.ndarray,
+    swc : Dict[str, np.ndarray],
+    fc : Dict[str, np.ndarray],
+    pwp : Dict[str, np.ndarray],
+    hydraulic_conductivity : Dict[str, np.ndarray],
+    z_transpiration_layer : np.ndarray,
+    fluxes : Tuple[Tuple[str, str, str, str], ...] = UPWARD_FLUXES,
+    dtype : Any = None
+) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """
+    Description
+    ------------
+    Upward flux between soil layers for all cells at once (array version of
+    ``SoilContent.upward_flux``). Each flux is driven by the difference of the relative
+    wetness (swc - pwp) / (fc - pwp) of the source and sink layers and scaled by the
+    hydraulic conductivity of the source layer. It is limited by the water of the source
+    layer above its wilting point and by the deficit of the sink layer below its field
+    capacity. Fluxes are applied one after the other, each one from the contents left by
+    the previous ones.
+
+    Parameters
+    ------------
+    covered : np.ndarray
+        corved yes(True) or not coverd no(False)
+    swc : Dict[str, np.ndarray]
+        soil water content of each layer at previous step in milimeter - keys are the layer names
+        ('evaporation_layer', 'transpiration_layer', 'transition_layer')
+    fc : Dict[str, np.ndarray]
+        field capacity of each layer in percent
+    pwp : Dict[str, np.ndarray]
+        permanent wilting point of each layer in percent
+    hydraulic_conductivity : Dict[str, np.ndarray]
+        hydraulic conductivity of the source layers in milimeter per day
+    z_transpiration_layer : np.ndarray
+        thickness of the transpiration layer in milimeter
+    fluxes : Tuple[Tuple[str, str, str, str], ...]
+        flux terms (name, source layer, sink layer, cells) - UPWARD_FLUXES by default
+    dtype : Any
+        dtype of the result - None to follow the inputs
+
+    Returns
+    ------------
+    fluxes : Dict[str, np.ndarray]
+        every flux in milimeter
+    swc : Dict[str, np.ndarray]
+        soil water content of each layer after the fluxes in milimeter
+    """
+
+    dtype = resolve_dtype(*swc.values(), dtype = dtype)
+    covered = np.asarray(covered, dtype = bool)
+    depth = {
+        'evaporation_layer': soil_depth.get('evaporation_layer'),
+        'transpiration_layer': as_float_array(z_transpiration_layer, dtype),
+        'transition_layer': soil_depth.get('transition_layer')
+    }
+    cells = {'covered': covered, 'not_covered': ~covered, 'all': True}
+
+    swc = {layer: as_float_array(values, dtype) for layer, values in swc.items()}
+    fc = {layer: layer_capacity(as_float_array(fc[layer], dtype), depth[layer]) for layer in swc}
+    pwp = {layer: layer_capacity(as_float_array(pwp[layer], dtype), depth[layer]) for layer in swc}
+
+    def wetness(layer):
+        capacity = fc[layer] - pwp[layer]
+        return np.divide(swc[layer] - pwp[layer], capacity, out = np.zeros(np.broadcast_shapes(
+            np.shape(swc[layer]), np.shape(capacity))), where = capacity > 0)
+
+    result = {}
+    for name, source, sink, where in fluxes:
+        flux = as_float_array(hydraulic_conductivity[source], dtype) * np.maximum(wetness(source) - wetness(sink), 0)
+        flux = np.minimum(flux, np.maximum(swc[source] - pwp[source], 0))
+        flux = np.minimum(flux, np.maximum(fc[sink] - swc[sink], 0))
+        flux = np.where(cells[where], flux, 0).astype(dtype, copy = False)
+
+        swc[source] = swc[source] - flux
+        swc[sink] = swc[sink] + flux
+        result[name] = flux
+
+    return result, {layer: np.asarray(values).astype(dtype, copy = False) for layer, values in swc.items()}
@@ -23,7 +23,7 @@ setup(
     install_requires=[
         'numpy',
         'pandas',
-        'scipy',
+        'scipy>=1.12',
         'openpyxl',
         'xlrd',
         'xlsxwriter',
@@ -0,0 +1,44 @@
+"""
+Layout of arrays given with an active cell grid.
+"""
+
+import numpy as np
+import pytest
+from qdwb.coordinate.active_cell import ActiveCellGrid
+from qdwb.coordinate.aggregate import Aggregation
+
+
+
+def make_grid():
+    # 4 active cells on a 3 x 4 grid: a (3, n_cells) block has the grid shape
+    mask = np.zeros((3, 4), dtype = bool)
+    mask[[0, 1, 1, 2], [0, 1, 3, 2]] = True
+    return ActiveCellGrid(mask)
+
+
+
+def test_ambiguous_shape_needs_a_layout():
+    grid = make_grid()
+    block = np.arange(12.0).reshape(3, 4)
+
+    with pytest.raises(ValueError, match = 'layout'):
+        grid.gather_all({'precipitation': block})
+    np.testing.assert_array_equal(grid.gather_all({'precipitation': block}, layout = 'cells')['precipitation'], block)
+    np.testing.assert_array_equal(grid.gather_all({'precipitation': block}, layout = 'grid')['precipitation'], [0, 5, 7, 10])
+    # other shapes are not ambiguous
+    assert not grid.is_grid(np.zeros((5, 4)))
+    assert not grid.is_grid(np.zeros(4))
+
+
+
+def test_masks_follow_the_layout():
+    grid = make_grid()
+    masks = np.eye(3, 4)
+    with pytest.raises(ValueError, match = 'layout'):
+        Aggregation.from_masks(masks, grid = grid)
+
+    by_cells = Aggregation.from_masks(masks, grid = grid, layout = 'cells')
+    by_grid = Aggregation.from_masks(masks[np.newaxis], grid = grid, layout = 'grid')
+    np.testing.assert_array_equal(by_cells.matrix.toarray() * 1000, masks)
+    # the diagonal of the grid holds the active cells 0, 1 and 3
+    np.testing.assert_array_equal(by_grid.matrix.toarray() * 1000, [[1, 1, 0, 1]])
@@ -0,0 +1,108 @@
+"""
+Actual evapotranspiration of the QDWB approach and the available evaporable water.
+"""
+
+import numpy as np
+from qdwb.evapotranspiration.vectorized import actual_evapotranspiration
+from qdwb.evapotranspiration.et import ActualEvapotranspiration
+from qdwb.model.driver import Driver
+
+
+# transpiration layer of 500 mm between 60 mm (PWP) and 150 mm (FC), evaporation
+# layer of 100 mm between 12 mm and 30 mm: 18 mm of available water
+LAYERS = {
+    'fc_transpiration_layer': 30.0,
+    'pwp_transpiration_layer': 12.0,
+    'z_transpiration_layer': 500.0,
+    'fc_evaporation_layer': 30.0,
+    'pwp_evaporation_layer': 12.0,
+    'z_evaporation_layer': 100.0
+}
+
+
+
+def test_known_answers():
+    et_covered, e_noncovered, aew = actual_evapotranspiration(
+        reference_evapotranspiration = 5.0,
+        crop_coefficient = 1.2,
+        crop_cover = 0.6,
+        infiltration = np.array([4.0, 4.0, 4.0, 0.0]),
+        available_evaporable_water = np.array([9.0, np.nan, 30.0, 0.5]),
+        swc_transpiration_layer = np.array([105.0, 105.0, 200.0, 50.0]),
+        swc_evaporation_layer = np.array([12.0, 21.0, 12.0, 12.0]),
+        **LAYERS
+    )
+
+    # f = (105 - 60) / 90 = 0.5 and Ke = 9 / 18 = 0.5; the NaN cell starts from 21 - 12 = 9 mm
+    np.testing.assert_allclose(et_covered, [1.8, 1.8, 3.6, 0.0])
+    np.testing.assert_allclose(e_noncovered, [1.0, 1.0, 2.0, 2.0 * 0.5 / 18])
+    np.testing.assert_allclose(aew, [10.0, 10.0, 18.0, 0.5 - 2.0 * 0.5 / 18])
+
+    np.testing.assert_allclose(et_covered[0], ActualEvapotranspiration.et_covered(0.5, 1.2, 0.6, 5.0))
+    np.testing.assert_allclose(e_noncovered[0], ActualEvapotranspiration.e_noncovered(0.5, 0.6, 5.0))
+
+
+
+def test_results_are_written_to_the_given_arrays():
+    out = tuple(np.full(3, np.nan, dtype = np.float32) for _ in range(3))
+    result = actual_evapotranspiration(
+        reference_evapotranspiration = np.full(3, 5.0, dtype = np.float32),
+        crop_coefficient = 1.0,
+        crop_cover = 0.5,
+        infiltration = np.zeros(3, dtype = np.float32),
+        available_evaporable_water = np.array([0.0, 9.0, 18.0], dtype = np.float32),
+        swc_transpiration_layer = np.full(3, 150.0),
+        out = out,
+        **LAYERS
+    )
+
+    assert all(a is b for a, b in zip(result, out))
+    np.testing.assert_allclose(out[1], [0.0, 1.25, 2.5])
+    np.testing.assert_allclose(out[2], [0.0, 7.75, 15.5])
+
+
+
+def test_stage_carries_the_available_evaporable_water():
+    n, T = 2, 10
+    parameters = {
+        'latitude': np.full(n, 35.0),
+        'curve_number': np.full(n, 75.0),
+        'covered': np.zeros(n, dtype = bool),
+        'crop_cover': np.array([0.0, 0.5]),
+        'crop_coefficient': np.full(n, 1.0),
+        'fc_evaporation_layer': np.full(n, 30.0),
+        'fc_transpiration_layer': np.full(n, 30.0),
+        'fc_transition_layer': np.full(n, 30.0),
+        'pwp_evaporation_layer': np.full(n, 12.0),
+        'pwp_transpiration_layer': np.full(n, 12.0),
+        'pwp_transition_layer': np.full(n, 12.0),
+        'z_transpiration_layer': np.full(n, 500.0),
+        'geology_permeability': np.full(n, 0.3)
+    }
+    state = {
+        'swc_evaporation_layer': np.full(n, 30.0),
+        'swc_transpiration_layer': np.full(n, 100.0),
+        'swc_transition_layer': np.full(n, 200.0)
+    }
+    precipitation = np.zeros((T, n))
+    precipitation[4] = 20.0
+    forcing = {
+        'precipitation': precipitation,
+        'tmin': np.full((T, n), 10.0),
+        'tmax': np.full((T, n), 25.0),
+        'tmean': np.full((T, n), 17.5),
+        'julian_day': np.arange(150, 150 + T)
+    }
+
+    outputs = Driver(parameters, state).run_block(forcing)
+
+    # the first day starts from the water above PWP in the evaporation layer: 18 mm
+    previous = np.vstack([np.full((1, n), 18.0), outputs['available_evaporable_water'][:-1]])
+    eto = outputs['reference_evapotranspiration']
+    np.testing.assert_allclose(outputs['evaporation'], (1 - parameters['crop_cover']) * eto * previous / 18)
+    np.testing.assert_allclose(
+        outputs['available_evaporable_water'],
+        np.clip(previous + 0.5 * outputs['infiltration'] - outputs['evaporation'], 0, 18)
+    )
+    assert outputs['infiltration'][4].min() > 0
+    assert np.all(np.diff(outputs['available_evaporable_water'][:4], axis = 0) < 0)
@@ -0,0 +1,61 @@
+"""
+Aggregation of cell depths to volumes of targets.
+"""
+
+import numpy as np
+from qdwb.coordinate.active_cell import ActiveCellGrid
+from qdwb.coordinate.aggregate import Aggregation, cell_area, EARTH_RADIUS
+from qdwb.routing.flow import FlowNetwork
+
+
+
+def test_labels_give_volumes_and_mean_depths():
+    area = np.array([1000.0, 2000.0, 1000.0, 1000.0])
+    aggregation = Aggregation.from_labels([0, 0, 1, -1], area, names = ['north', 'south'])
+    depth = np.array([[10.0, 20.0, 30.0, 40.0], [0.0, 1.0, 0.0, 5.0]])
+
+    # 10 mm * 1000 m^2 + 20 mm * 2000 m^2 = 50 m^3
+    np.testing.assert_allclose(aggregation.volume(depth), [[50.0, 30.0], [2.0, 0.0]])
+    np.testing.assert_allclose(aggregation.mean(depth[0]), [50.0 / 3, 30.0])
+    np.testing.assert_allclose(aggregation.to_dict(aggregation.volume(depth))['south'], [30.0, 0.0])
+
+
+
+def test_masks_on_the_grid_match_the_cells():
+    mask = np.array([[True, True, False], [False, True, True]])
+    grid = ActiveCellGrid(mask)
+    targets = np.zeros((2,) + mask.shape)
+    targets[0, 0] = 1
+    targets[1, :, 1] = 0.5
+
+    aggregation = Aggregation.from_masks(targets, grid, area = 2000.0)
+    np.testing.assert_allclose(aggregation.matrix.toarray(), [[2, 2, 0, 0], [0, 1, 1, 0]])
+
+
+
+def test_contributing_areas_conserve_mass():
+    dem = np.add.outer(np.arange(6.0, 0, -1), np.abs(np.arange(5.0) - 2)) + np.random.default_rng(0).random((6, 5)) * 0.1
+    dem[-1, 2] = -1
+    rng = np.random.default_rng(1)
+    area = rng.uniform(500, 1500, dem.size)
+    depth = rng.random((3, dem.size))
+
+    for method in ['d8', 'mfd']:
+        network = FlowNetwork.from_dem(dem, method = method)
+        cells = [network.outlets[0], 12, 17, 7]
+        aggregation = Aggregation.from_network(network, cells, area)
+
+        # the volume through a target is the volume accumulated down to it
+        accumulated = network.accumulate(depth * area / 1000)
+        np.testing.assert_allclose(aggregation.volume(depth), accumulated[:, cells])
+        np.testing.assert_allclose(aggregation.volume(depth)[:, 0], (depth * area / 1000).sum(axis = 1))
+        np.testing.assert_allclose(Aggregation.from_network(network, cells, area, batch = 3).matrix.toarray(), aggregation.matrix.toarray())
+
+
+
+def test_global_grid_covers_the_sphere():
+    lat = np.arange(89.5, -90, -1.0)
+    lon = np.arange(-179.5, 180, 1.0)
+    grid = ActiveCellGrid(np.ones((lat.size, lon.size), dtype = bool), lat, lon)
+
+    np.testing.assert_allclose(cell_area(grid).sum(), 4 * np.pi * EARTH_RADIUS ** 2)
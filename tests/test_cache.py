@@ -0,0 +1,77 @@
+"""
+Stage cache keys.
+"""
+
+import os
+import numpy as np
+from qdwb.model.driver import Driver
+from qdwb.model.cache import StageCache, code_version
+from qdwb.model.stages import Stage, default_stages, free_water_stages
+from .test_water_balance import make_inputs
+
+
+
+def free_water_run(method, cache):
+    parameters, state, forcing = make_inputs()
+    parameters['water_fraction'] = np.ones(len(parameters['curve_number']))
+    # warm enough for positive evaporation with both radiation methods
+    forcing.update({name: forcing[name] + 25 for name in ('tmin', 'tmax', 'tmean')})
+    driver = Driver(parameters, state, stages = default_stages() + free_water_stages(method), cache = cache)
+
+    return driver.run_block(forcing)['free_water_evaporation']
+
+
+
+def test_closure_configuration_is_part_of_the_key(tmp_path):
+    cache = StageCache(str(tmp_path))
+    jensen = free_water_run('Jensen', cache)
+    stuart = free_water_run('Stuart', cache)
+
+    np.testing.assert_array_equal(stuart, free_water_run('Stuart', None))
+    assert not np.array_equal(jensen, stuart)
+
+
+
+def test_rerun_is_read_from_the_cache(tmp_path):
+    cache = StageCache(str(tmp_path))
+    first = free_water_run('Stuart', cache)
+    misses = cache.misses
+    second = free_water_run('Stuart', cache)
+
+    np.testing.assert_array_equal(first, second)
+    assert cache.misses == misses and cache.hits > 0
+
+
+
+def test_stages_capturing_unhashable_values_are_not_cached(tmp_path):
+    lock = open(tmp_path / 'lock', 'w')
+
+    def uses_file(data, dtype):
+        return {'value': np.asarray(data['tmin'], dtype = dtype) * (not lock.closed)}
+
+    stage = Stage(name = 'uses_file', function = uses_file, inputs = ('tmin',), outputs = ('value',))
+    assert code_version(stage) is None
+    assert StageCache(str(tmp_path / 'cache')).key(stage, {'tmin': np.zeros(3)}, np.float64) is None
+    lock.close()
+
+
+
+def test_eviction_keeps_the_recent_entries_without_scanning(tmp_path, monkeypatch):
+    result = {'runoff': np.zeros(1000)}
+    cache = StageCache(str(tmp_path), max_bytes = 3 * 8500)
+
+    def scandir(*args):
+        raise AssertionError("the cache directory is scanned again")
+
+    monkeypatch.setattr(os, 'scandir', scandir)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, result)
+    assert cache.get('a') is not None
+    cache.put('d', result)
+
+    assert cache.get('b') is None
+    assert all(cache.get(key) is not None for key in ('a', 'c', 'd'))
+    assert cache.nbytes() == sum(os.path.getsize(tmp_path / f"{key}.npz") for key in 'acd') <= cache.max_bytes
+
+    monkeypatch.undo()
+    assert StageCache(str(tmp_path)).nbytes() == cache.nbytes()
@@ -0,0 +1,69 @@
+"""
+Calibration history, shared memory and worker checks.
+"""
+
+import warnings
+import numpy as np
+import pytest
+from qdwb.calibration import calibration
+from qdwb.calibration.calibration import Calibration
+from qdwb.calibration.objective import StreamingObjective
+from qdwb.calibration.strategy import RandomSearch
+from qdwb.model.driver import Driver
+from qdwb.model.stages import default_stages, free_water_stages
+from .test_water_balance import make_inputs
+
+
+
+def make_calibration(**kwargs):
+    parameters, state, forcing = make_inputs()
+    observed = Driver(parameters, state).run_block(forcing)['runoff']
+    return Calibration(parameters, forcing, {'runoff': observed}, ['curve_number'], state = state, **kwargs)
+
+
+
+def test_history_is_capped():
+    with make_calibration(history = 2) as cal:
+        for _ in range(3):
+            cal.evaluate(np.random.default_rng(0).random((2, 1)))
+        assert len(cal.history) == 2
+    with make_calibration(history = 0) as cal:
+        cal.evaluate([[0.5]])
+        assert len(cal.history) == 0
+
+
+
+def test_close_detaches_shared_memory():
+    cal = make_calibration()
+    blocks = list(calibration._CONTEXT['blocks'].values())
+    cal.close()
+
+    assert calibration._CONTEXT is None
+    assert all(block.buf is None for block in blocks)
+
+
+
+def test_unpicklable_stages_fail_fast():
+    parameters, state, forcing = make_inputs()
+    stages = default_stages() + free_water_stages('Jensen')
+    with pytest.raises(ValueError, match = 'n_workers = 0'):
+        Calibration(parameters, forcing, {'runoff': forcing['precipitation']}, ['curve_number'],
+            state = state, stages = stages, n_workers = 2)
+
+
+
+def test_max_evaluations_is_a_hard_limit():
+    with make_calibration() as cal:
+        result = cal.run(RandomSearch(1, batch = 32, seed = 0), max_evaluations = 40)
+        assert result['evaluations'] == 40
+        assert sum(len(values) for values, _ in cal.history) == 40
+
+
+
+def test_constant_observations_warn_nothing():
+    objective = StreamingObjective(np.ones((10, 3)), objective = 'nse', n_members = 2)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        objective.update(np.random.default_rng(0).random((10, 2, 3)))
+        assert np.all(np.isnan(objective.loss()))
+        assert np.all(np.isnan(objective.lower_bound()))
@@ -0,0 +1,55 @@
+"""
+Unit conversions and the calendar of a time axis.
+"""
+
+import datetime
+from calendar import monthrange, isleap
+import numpy as np
+from qdwb.evapotranspiration.convert import calendar, julian_day, convert_units, convert_forcing
+from qdwb.model.driver import Driver
+from .test_water_balance import make_inputs
+
+
+
+def test_calendar_matches_the_standard_library():
+    time = np.arange('1899-12-25', '2101-01-05', 13, dtype = 'datetime64[D]')
+    fields = calendar(time)
+    for k, day in enumerate(time.astype(datetime.date)):
+        assert (fields['year'][k], fields['month'][k], fields['day'][k]) == (day.year, day.month, day.day)
+        assert fields['julian_day'][k] == day.timetuple().tm_yday
+        assert fields['days_in_month'][k] == monthrange(day.year, day.month)[1]
+        assert fields['is_leap'][k] == isleap(day.year)
+    np.testing.assert_array_equal(julian_day(time), fields['julian_day'])
+
+
+
+def test_units_convert_in_place():
+    kelvin = np.array([[273.15, 300.0]], dtype = np.float32)
+    celsius = convert_units(kelvin, 'kelvin', 'celsius', out = kelvin)
+    assert celsius is kelvin
+    np.testing.assert_allclose(celsius, [[0.0, 26.85]], rtol = 1e-6)
+    np.testing.assert_allclose(convert_units(convert_units(2.5, 'm', 'mm'), 'mm', 'm'), 2.5)
+
+
+
+def test_era5_forcing_to_model_units():
+    forcing = {'tmin': np.array([263.15, 283.15]), 'precipitation': np.array([0.002, 0.0]), 'wind_speed': np.array([3.0, 4.0])}
+    converted = convert_forcing(forcing, {'tmin': 'kelvin', 'precipitation': 'm', 'wind_speed': 'm/s'})
+
+    np.testing.assert_allclose(converted['tmin'], [-10.0, 10.0])
+    np.testing.assert_allclose(converted['precipitation'], [2.0, 0.0])
+    assert converted['wind_speed'] is forcing['wind_speed']
+    np.testing.assert_allclose(forcing['tmin'], [263.15, 283.15])
+
+
+
+def test_driver_takes_the_julian_day_from_time():
+    parameters, state, forcing = make_inputs()
+    reference = Driver(parameters, state).run_block(forcing)
+    n_days = len(forcing['julian_day'])
+    dated = {name: values for name, values in forcing.items() if name != 'julian_day'}
+    # day 100 of 2021
+    dated['time'] = np.datetime64('2021-04-10') + np.arange(n_days)
+
+    outputs = Driver(parameters, state).run_block(dated)
+    np.testing.assert_allclose(outputs['reference_evapotranspiration'], reference['reference_evapotranspiration'])
@@ -0,0 +1,30 @@
+"""
+Per cell method dispatch of the solar radiation.
+"""
+
+import numpy as np
+from qdwb.model.driver import Driver
+from qdwb.model.stages import default_stages, free_water_stages
+from qdwb.evapotranspiration.vectorized import MethodDispatch, RADIATION_METHODS
+from .test_water_balance import make_inputs
+
+
+
+def test_block_matches_step_with_shared_latitude():
+    parameters, state, forcing = make_inputs()
+    n = len(parameters['curve_number'])
+    parameters['latitude'] = 34.0
+    parameters['water_fraction'] = np.full(n, 0.5)
+    forcing = {name: values[:10] for name, values in forcing.items()}
+    forcing['measured_solar_radiation'] = np.where(np.arange(n) % 2 == 0, 20.0, np.nan) * np.ones((10, 1))
+
+    dispatch = MethodDispatch.from_data(RADIATION_METHODS, {**parameters, **forcing})
+    assert dispatch.counts() == {'measured': n // 2, 'Hargreaves': n - n // 2}
+    stages = default_stages() + free_water_stages('Jensen', radiation_methods = dispatch)
+
+    block = Driver(parameters, state, stages = stages).run_block(forcing)
+    driver = Driver(parameters, state, stages = stages)
+    steps = [driver.step({name: values[t] for name, values in forcing.items()}) for t in range(10)]
+
+    np.testing.assert_allclose(block['solar_radiation'][:, ::2], 20.0, rtol = 1e-6)
+    np.testing.assert_allclose(block['solar_radiation'], np.stack([s['solar_radiation'] for s in steps]), rtol = 1e-5)
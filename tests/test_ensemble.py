@@ -0,0 +1,40 @@
+"""
+Parameter ensembles of the driver.
+"""
+
+import numpy as np
+import pytest
+from qdwb.model.driver import Driver
+from qdwb.model.ensemble import ensemble_parameters
+from .test_water_balance import make_inputs
+
+
+
+def test_members_are_perturbed_on_a_leading_axis():
+    base = {'curve_number': np.array([60.0, 70.0, 80.0]), 'MAD': 0.5}
+    parameters, n_members = ensemble_parameters(
+        base, values = {'MAD': [0.2, 0.4]}, multipliers = {'curve_number': [0.9, 1.1]}
+    )
+
+    assert n_members == 2
+    np.testing.assert_allclose(parameters['MAD'], [[0.2] * 3, [0.4] * 3])
+    np.testing.assert_allclose(parameters['curve_number'], [[54, 63, 72], [66, 77, 88]])
+    with pytest.raises(ValueError, match = 'same time'):
+        ensemble_parameters(base, values = {'MAD': [0.2]}, multipliers = {'MAD': [1.0]})
+    with pytest.raises(ValueError, match = 'same number of members'):
+        ensemble_parameters(base, values = {'MAD': [0.2, 0.4]}, multipliers = {'curve_number': [1.0]})
+
+
+
+def test_every_member_matches_its_own_run():
+    parameters, state, forcing = make_inputs()
+    forcing = {name: values[:30] for name, values in forcing.items()}
+    factors = np.array([0.8, 1.0, 1.15])
+    members, n_members = ensemble_parameters(parameters, multipliers = {'curve_number': factors})
+
+    outputs = Driver(members, state, n_members = n_members).run_block(forcing)
+    assert outputs['runoff'].shape == (30, 3, len(parameters['curve_number']))
+    for k, factor in enumerate(factors):
+        single = Driver({**parameters, 'curve_number': parameters['curve_number'] * factor}, state).run_block(forcing)
+        for name in ('runoff', 'groundwater_storage'):
+            np.testing.assert_allclose(outputs[name][:, k], single[name], rtol = 1e-6, atol = 1e-9)
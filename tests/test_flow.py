@@ -0,0 +1,78 @@
+"""
+Flow accumulation and routing along a flow network.
+"""
+
+import numpy as np
+import pytest
+from qdwb.coordinate.active_cell import ActiveCellGrid
+from qdwb.routing.flow import FlowNetwork
+
+
+# 3 x 3 valley draining to the outlet at the bottom of the middle column - the cells
+# beside the middle one are steeper towards the outlet than towards the middle
+DEM = np.array([
+    [9.0, 8.0, 9.0],
+    [7.0, 5.0, 7.0],
+    [6.0, 1.0, 6.0],
+])
+
+
+
+def test_d8_accumulation_of_a_valley():
+    network = FlowNetwork.from_dem(DEM)
+
+    np.testing.assert_array_equal(network.outlets, [7])
+    np.testing.assert_array_equal(network.upstream_cells(), [1, 1, 1, 1, 4, 1, 1, 9, 1])
+
+    runoff = np.arange(1.0, 10.0)
+    expected = runoff.copy()
+    expected[4] = runoff[[0, 1, 2, 4]].sum()
+    expected[7] = runoff.sum()
+    np.testing.assert_allclose(network.accumulate(runoff), expected)
+
+
+
+def test_d8_raster_gives_the_same_network():
+    # E = 1, SE = 2, S = 4, SW = 8, W = 16
+    directions = np.array([
+        [2, 4, 8],
+        [2, 4, 8],
+        [1, 0, 16],
+    ])
+    network = FlowNetwork.from_d8(directions, ActiveCellGrid(np.ones((3, 3), dtype = bool)))
+
+    np.testing.assert_array_equal(network.upstream_cells(), FlowNetwork.from_dem(DEM).upstream_cells())
+
+
+
+def test_mfd_conserves_mass():
+    dem = np.add.outer(np.arange(6.0, 0, -1), np.abs(np.arange(5.0) - 2)) + np.random.default_rng(0).random((6, 5)) * 0.1
+    dem[-1, 2] = -1
+    network = FlowNetwork.from_dem(dem, method = 'mfd')
+    runoff = np.random.default_rng(1).random((4, network.n_cells))
+
+    assert network.weight.min() > 0
+    np.testing.assert_allclose(np.bincount(network.source, network.weight, network.n_cells)[network.source], 1)
+    accumulated = network.accumulate(runoff)
+    np.testing.assert_allclose(accumulated[:, network.outlets].sum(axis = 1), runoff.sum(axis = 1))
+    np.testing.assert_allclose(accumulated[2], network.accumulate(runoff[2]))
+
+
+
+def test_linear_reservoirs_conserve_mass():
+    network = FlowNetwork.from_dem(DEM)
+    runoff = np.zeros((30, 9))
+    runoff[0] = 10
+
+    outflow, storage = network.route(runoff, k = 2.0)
+
+    # a single reservoir releases 1 - exp(-1/2) of its storage on the first day
+    np.testing.assert_allclose(outflow[0, 0], 10 * -np.expm1(-0.5))
+    np.testing.assert_allclose(outflow[:, network.outlets].sum() + storage.sum(), runoff.sum())
+    np.testing.assert_allclose(network.route(runoff)[0], network.accumulate(runoff))
+
+
+
+def test_cycle_is_rejected():
+    with pytest.raises(ValueError):
+        FlowNetwork([0, 1, 2], [1, 2, 0], np.ones(3), 3)
@@ -0,0 +1,97 @@
+"""
+Evaporation from a shallow water table and its place in the water balance.
+"""
+
+import numpy as np
+from qdwb.groundwater.vectorized import groundwater_evaporation
+from qdwb.model.stages import capillary_supply
+from qdwb.model.driver import Driver
+
+
+
+def test_extinction_depth_curve():
+    depth = np.array([0.0, 2.5, 2.5, 5.0, 7.0, np.inf, np.nan, -1.0])
+    exponent = np.array([1.0, 1.0, 2.0, 1.0, 1.0, 1.0, 1.0, 1.0])
+
+    evaporation = groundwater_evaporation(depth, 4.0, extinction_depth = 5.0, exponent = exponent)
+
+    np.testing.assert_allclose(evaporation, [4.0, 2.0, 1.0, 0.0, 0.0, 0.0, 0.0, 4.0])
+    np.testing.assert_allclose(groundwater_evaporation(1.0, -3.0), 0.0)
+    assert groundwater_evaporation(np.ones(2, dtype = np.float32), 4.0).dtype == np.float32
+
+
+
+def test_capillary_supply_fills_the_transition_layer_up_to_field_capacity():
+    data = {
+        'reference_evapotranspiration': np.array([5.0, 5.0, 5.0]),
+        'crop_coefficient': np.array([1.0, 1.0, 0.4]),
+        'actual_transpiration': np.array([1.0, 1.0, 1.0]),
+        'actual_evaporation': np.array([1.0, 1.0, 1.0]),
+        'water_table_depth': np.array([1.0, 1.0, 1.0]),
+        'extinction_depth': np.array([2.0, 2.0, 2.0]),
+        'extinction_exponent': np.array([1.0, 1.0, 1.0]),
+        # 30 % of the 1000 mm transition layer = 300 mm at field capacity
+        'fc_transition_layer': np.array([30.0, 30.0, 30.0]),
+        'swc_transition_layer': np.array([200.0, 299.0, 200.0])
+    }
+
+    result = capillary_supply(data, np.float64)
+
+    # demand 5 - 2 = 3 mm, half of it from a water table at half the extinction depth
+    np.testing.assert_allclose(result['groundwater_evaporation'], [1.5, 1.0, 0.0])
+    np.testing.assert_allclose(result['swc_transition_layer'], [201.5, 300.0, 200.0])
+
+
+
+def test_groundwater_pays_for_the_capillary_supply():
+    n, T = 3, 30
+    parameters = {
+        'latitude': np.full(n, 35.0),
+        'curve_number': np.full(n, 75.0),
+        'covered': np.ones(n, dtype = bool),
+        'crop_cover': np.full(n, 0.8),
+        'crop_coefficient': np.full(n, 1.1),
+        'fc_evaporation_layer': np.full(n, 30.0),
+        'fc_transpiration_layer': np.full(n, 30.0),
+        'fc_transition_layer': np.full(n, 30.0),
+        'pwp_evaporation_layer': np.full(n, 12.0),
+        'pwp_transpiration_layer': np.full(n, 12.0),
+        'pwp_transition_layer': np.full(n, 12.0),
+        'z_transpiration_layer': np.full(n, 500.0),
+        'geology_permeability': np.full(n, 0.3),
+        'water_table_depth': np.array([0.5, 3.0, np.inf])
+    }
+    state = {
+        'swc_evaporation_layer': np.full(n, 13.0),
+        'swc_transpiration_layer': np.full(n, 70.0),
+        'swc_transition_layer': np.full(n, 150.0),
+        'groundwater_storage': np.full(n, 100.0)
+    }
+    # a dry and warm month: the soil can not meet the demand
+    forcing = {
+        'precipitation': np.zeros((T, n)),
+        'tmin': np.full((T, n), 15.0),
+        'tmax': np.full((T, n), 32.0),
+        'tmean': np.full((T, n), 23.5),
+        'julian_day': np.arange(180, 180 + T)
+    }
+
+    outputs = Driver(parameters, state).run_block(forcing)
+
+    supplied = outputs['groundwater_evaporation'].sum(axis = 0)
+    assert supplied[0] > supplied[1] > 0
+    assert supplied[2] == 0
+    np.testing.assert_allclose(
+        outputs['groundwater_storage'][-1],
+        100.0 + outputs['recharge'].sum(axis = 0) - supplied
+    )
+
+    soil = sum(outputs[f"swc_{layer}"][-1] - state[f"swc_{layer}"]
+               for layer in ('evaporation_layer', 'transpiration_layer', 'transition_layer'))
+    outflow = sum(outputs[name].sum(axis = 0) for name in (
+        'interception', 'runoff', 'late_runoff', 'actual_transpiration', 'actual_evaporation'))
+    np.testing.assert_allclose(
+        outputs['irrigation_requirement'].sum(axis = 0),
+        soil + outputs['groundwater_storage'][-1] - 100.0 + outflow,
+        atol = 1e-9
+    )
@@ -0,0 +1,34 @@
+"""
+Hourly reference evapotranspiration.
+"""
+
+import numpy as np
+from qdwb.evapotranspiration.hourly import HourlyReferenceET, cloudiness_function
+
+
+
+def test_cloudiness_function_is_bounded():
+    ratio = np.linspace(-0.5, 1.5, 41)
+    fcd = cloudiness_function(ratio)
+
+    np.testing.assert_allclose(fcd.min(), 0.055)
+    np.testing.assert_allclose(fcd.max(), 1.0)
+    np.testing.assert_allclose(cloudiness_function(0.6), 0.46)
+
+
+
+def test_overcast_day_carries_the_lower_bound():
+    time = np.arange('2020-01-15T00', '2020-01-16T00', dtype = 'datetime64[h]')
+    forcing = {
+        'temperature': np.full((24, 2), 10.0),
+        'wind_speed': np.full((24, 2), 2.0),
+        'relative_humidity': np.full((24, 2), 100.0),
+        'solar_radiation': np.zeros((24, 2))
+    }
+    et = HourlyReferenceET(latitude = np.array([35.0, 45.0]), longitude = np.array([10.0, 10.0]), night_radiation_ratio = 0.0)
+    assert np.all(et.radiation_ratio == 0.3)
+
+    eto = et.hourly(time, forcing)
+    np.testing.assert_allclose(et.radiation_ratio, 0.3)
+    # saturated air: only the net radiation is left, a longwave loss even under full cloud cover
+    assert np.all(eto[:6] < 0)
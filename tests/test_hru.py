@@ -0,0 +1,55 @@
+"""
+Hydrologic response units of the driver.
+"""
+
+import numpy as np
+import pytest
+from qdwb.model.driver import Driver
+from qdwb.model.hru import HRU
+from qdwb.coordinate.active_cell import ActiveCellGrid
+from .test_water_balance import make_inputs
+
+
+
+def test_grid_latitude_must_match_the_groups():
+    grid = ActiveCellGrid(np.ones((4, 5), dtype = bool), lat = np.linspace(30, 36, 4), lon = np.linspace(50, 58, 5))
+    parameters, state, _ = make_inputs()
+    parameters = {name: np.full(grid.n_cells, values[0]) for name, values in parameters.items() if name != 'latitude'}
+    state = {name: np.full(grid.n_cells, values[0]) for name, values in state.items()}
+
+    # grouped without latitude: one group for cells of four latitudes
+    with pytest.raises(ValueError, match = 'latitude'):
+        Driver(parameters, state, grid = grid, hru = HRU(parameters, state = state))
+
+    with_latitude = {**parameters, 'latitude': grid.coordinates()[0]}
+    driver = Driver(parameters, state, grid = grid, hru = HRU(with_latitude, state = state))
+    assert driver.n_cells == 4
+
+
+
+def test_hru_run_matches_cells():
+    parameters, state, forcing = make_inputs()
+    n = len(parameters['curve_number'])
+    parameters = {name: values[np.arange(n) % 5] for name, values in parameters.items()}
+    state = {name: values[np.arange(n) % 5] for name, values in state.items()}
+    forcing = {name: values if np.ndim(values) == 1 else values[:, np.arange(n) % 5] for name, values in forcing.items()}
+
+    hru = HRU(parameters, state = state)
+    grouped = Driver(parameters, state, hru = hru)
+    outputs = grouped.to_cells(grouped.run_block(forcing))
+    reference = Driver(parameters, state).run_block(forcing)
+
+    np.testing.assert_allclose(outputs['groundwater_storage'], reference['groundwater_storage'])
+
+
+
+def test_cells_with_different_forcing_are_not_merged():
+    parameters, state, forcing = make_inputs()
+    n = len(parameters['curve_number'])
+    parameters = {name: values[np.arange(n) % 5] for name, values in parameters.items()}
+    state = {name: values[np.arange(n) % 5] for name, values in state.items()}
+
+    # parameters repeat every 5 cells but the forcing of every cell is its own
+    driver = Driver(parameters, state, hru = HRU(parameters, state = state))
+    with pytest.raises(ValueError, match = 'precipitation'):
+        driver.run_block(forcing)
@@ -0,0 +1,40 @@
+"""
+Lateral groundwater flow.
+"""
+
+import numpy as np
+import pytest
+from qdwb.coordinate.active_cell import ActiveCellGrid
+from qdwb.groundwater.lateral import LateralGroundwater
+
+
+
+@pytest.mark.parametrize('solver', ['direct', 'cg'])
+def test_step_conserves_mass(solver):
+    rng = np.random.default_rng(0)
+    mask = rng.random((8, 10)) < 0.8
+    grid = ActiveCellGrid(mask)
+    n = grid.n_cells
+    drain_elevation = np.where(rng.random(n) < 0.2, 95.0, np.nan)
+    aquifer = LateralGroundwater(
+        grid,
+        transmissivity = rng.uniform(50, 500, n),
+        specific_yield = rng.uniform(0.05, 0.2, n),
+        cell_size = (500.0, 400.0),
+        drain_elevation = drain_elevation,
+        drain_conductance = 100.0,
+        solver = solver,
+        tolerance = 1e-12
+    )
+
+    head = rng.uniform(90, 110, (3, n))
+    new, fluxes = aquifer.step(head, recharge = rng.uniform(0, 5, n), withdrawal = rng.uniform(0, 200, (3, n)))
+
+    storage_change = aquifer.storage * (new - head)
+    np.testing.assert_allclose(fluxes['lateral'].sum(axis = -1), 0, atol = 1e-6)
+    np.testing.assert_allclose(
+        storage_change,
+        fluxes['recharge'] - fluxes['withdrawal'] - fluxes['drain'] + fluxes['lateral'],
+        rtol = 1e-6, atol = 1e-4
+    )
+    assert np.any(fluxes['drain'] > 0)
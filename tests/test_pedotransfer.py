@@ -0,0 +1,22 @@
+"""
+Layer parameters from the soil texture.
+"""
+
+import numpy as np
+from qdwb.model.stages import PARAMETER_DEFAULTS
+from qdwb.soil_content.pedotransfer import saxton_rawls, soil_layer_parameters, STANDARD_DEPTHS
+
+
+
+def test_layer_conductivity_is_daily():
+    shape = (len(STANDARD_DEPTHS), 4)
+    sand, clay, organic_matter = np.full(shape, 0.4), np.full(shape, 0.2), np.full(shape, 2.5)
+    parameters = soil_layer_parameters(sand, clay, organic_matter, z_transpiration_layer = 500.0)
+    hourly = saxton_rawls(sand[0], clay[0], organic_matter[0])['saturated_hydraulic_conductivity']
+
+    assert set(parameters) >= {'hydraulic_conductivity_transpiration_layer', 'hydraulic_conductivity_transition_layer'}
+    assert not any(name.startswith('ksat') for name in parameters)
+    for layer in ('transpiration_layer', 'transition_layer'):
+        name = f"hydraulic_conductivity_{layer}"
+        assert name in PARAMETER_DEFAULTS
+        np.testing.assert_allclose(parameters[name], 24 * hourly)
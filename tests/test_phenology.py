@@ -0,0 +1,42 @@
+"""
+Packed growing season flags.
+"""
+
+import numpy as np
+from qdwb.model.phenology import GrowingSeason
+
+
+
+def test_blocks_across_byte_boundaries():
+    flags = np.random.default_rng(0).random((45, 3)) < 0.5
+    season = GrowingSeason.from_flags(flags, '2001-01-01')
+
+    assert season.nbytes == 6 * 3
+    for first in range(45):
+        np.testing.assert_array_equal(season.day(first), flags[first])
+        for n_days in range(1, 45 - first + 1):
+            np.testing.assert_array_equal(season.block(first, n_days), flags[first:first + n_days])
+    np.testing.assert_allclose(season.fraction(), flags.mean(axis = 0))
+    np.testing.assert_array_equal(season.block('2001-01-09', 3), flags[8:11])
+
+
+
+def test_crop_calendar_runs_over_the_new_year():
+    season = GrowingSeason.from_crop_calendar('2001-01-01', 365, sowing = [100, 300], harvest = [200, 60])
+    doy = np.arange(1, 366)
+    expected = np.column_stack([(doy >= 100) & (doy <= 200), (doy >= 300) | (doy <= 60)])
+
+    np.testing.assert_array_equal(season.block(0, 365), expected)
+
+
+
+def test_temperature_blocks_match_the_running_mean():
+    rng = np.random.default_rng(1)
+    tmean = rng.normal(6, 4, (100, 4))
+    window = 6
+    whole = GrowingSeason.from_temperature(tmean, '2001-01-01', threshold = 5, window = window)
+    parts = GrowingSeason.from_temperature(np.split(tmean, [13, 14, 61]), '2001-01-01', threshold = 5, window = window)
+
+    expected = np.array([tmean[max(t - window + 1, 0):t + 1].mean(axis = 0) > 5 for t in range(100)])
+    np.testing.assert_array_equal(whole.block(0, 100), expected)
+    np.testing.assert_array_equal(parts.bits, whole.bits)
@@ -0,0 +1,68 @@
+"""
+Block and recurrent stages of the execution plan.
+"""
+
+import numpy as np
+from qdwb.model.driver import Driver
+from qdwb.model.plan import ExecutionPlan
+from qdwb.model.stages import Stage
+from .test_water_balance import make_inputs
+
+
+
+def double(data, dtype):
+    return {'doubled': (2 * np.asarray(data['precipitation'])).astype(dtype)}
+
+
+def bucket(data, dtype):
+    return {'storage': (data['storage'] + data['doubled']).astype(dtype)}
+
+
+def half(data, dtype):
+    return {'half_storage': (data['storage'] / 2).astype(dtype)}
+
+
+STAGES = [
+    Stage('double', double, inputs = ('precipitation',), outputs = ('doubled',)),
+    Stage('bucket', bucket, inputs = ('doubled',), outputs = ('storage',), state = {'storage': 0.0}),
+    Stage('half', half, inputs = ('storage',), outputs = ('half_storage',))
+]
+
+
+
+def test_plan_splits_the_stages():
+    plan = ExecutionPlan(STAGES, {'precipitation'})
+    assert [s.name for s in plan.block] == ['double']
+    # stateless, but reads the state of the day
+    assert [s.name for s in plan.recurrent] == ['bucket', 'half']
+
+    given = ExecutionPlan(STAGES, {'precipitation', 'doubled'})
+    assert [s.name for s in given.given] == ['double']
+
+
+
+def test_block_gives_the_known_answer():
+    precipitation = np.arange(12.0).reshape(4, 3)
+    driver = Driver({}, state = {'storage': np.zeros(3)}, stages = STAGES)
+    outputs = driver.run_block({'precipitation': precipitation})
+
+    np.testing.assert_allclose(outputs['storage'], np.cumsum(2 * precipitation, axis = 0))
+    np.testing.assert_allclose(outputs['half_storage'], np.cumsum(precipitation, axis = 0))
+    np.testing.assert_allclose(driver.state['storage'], 2 * precipitation.sum(axis = 0))
+
+
+
+def test_block_matches_steps():
+    parameters, state, forcing = make_inputs()
+    forcing = {name: values[:20] for name, values in forcing.items()}
+    block = Driver(parameters, state).run_block(forcing)
+    driver = Driver(parameters, state)
+    steps = [driver.step({name: values[t] for name, values in forcing.items()}) for t in range(20)]
+
+    for name in ('reference_evapotranspiration', 'runoff', 'swc_transition_layer', 'groundwater_storage'):
+        np.testing.assert_allclose(block[name], np.stack([s[name] for s in steps]), rtol = 1e-6, atol = 1e-9)
+
+    prepared = Driver(parameters, state).prepare_block(forcing, exclude = ['curve_number'])
+    assert 'reference_evapotranspiration' in prepared and 'runoff' not in prepared
+    again = Driver(parameters, state).run_block(prepared, prepared = True)
+    np.testing.assert_allclose(again['groundwater_storage'], block['groundwater_storage'])
@@ -0,0 +1,68 @@
+"""
+Recession constants of springs fitted from synthetic records.
+"""
+
+import numpy as np
+from qdwb.groundwater.recession import recession_days, fit_maillet, fit_two_reservoir, SpringRecession
+
+
+ALPHA_FAST = np.array([0.30, 0.50, 0.20])
+ALPHA_SLOW = np.array([0.02, 0.05, 0.01])
+
+
+
+def make_records(alpha_fast, alpha_slow, n_days = 40):
+    # three recessions of every spring separated by a rise of the discharge
+    t = np.arange(n_days)[:, np.newaxis]
+    recessions = [
+        q_fast * np.exp(-alpha_fast * t) + q_slow * np.exp(-alpha_slow * t)
+        for q_fast, q_slow in [(50.0, 20.0), (80.0, 30.0), (60.0, 70.0)]
+    ]
+    return np.vstack(recessions)
+
+
+
+def test_recession_days_of_a_short_record():
+    q = np.array([1.0, 5.0, 4.0, 3.0, 2.5, 2.0, 1.5, 1.2, 3.0, 2.0, 1.0, np.nan, 0.5])
+    expected = np.zeros(12, dtype = bool)
+    # the fall from day 1 to day 7, without its first two steps
+    expected[3:7] = True
+
+    np.testing.assert_array_equal(recession_days(q, min_length = 6, skip = 2)[:, 0], expected)
+
+
+
+def test_maillet_constants_are_recovered():
+    q = make_records(ALPHA_SLOW, ALPHA_SLOW) / 2
+    fit = fit_maillet(q)
+
+    np.testing.assert_allclose(fit['alpha'], ALPHA_SLOW)
+    np.testing.assert_allclose(fit['residual'], 0, atol = 1e-12)
+    np.testing.assert_array_equal(fit['n_steps'], 3 * 37)
+
+
+
+def test_two_reservoir_constants_are_recovered():
+    fit = fit_two_reservoir(make_records(ALPHA_FAST, ALPHA_SLOW))
+
+    assert fit['two_reservoir'].all()
+    np.testing.assert_allclose(fit['alpha_fast'], ALPHA_FAST, rtol = 1e-6)
+    np.testing.assert_allclose(fit['alpha_slow'], ALPHA_SLOW, rtol = 1e-6)
+
+
+
+def test_single_reservoir_falls_back_to_maillet():
+    fit = fit_two_reservoir(make_records(ALPHA_SLOW, ALPHA_SLOW))
+
+    assert not fit['two_reservoir'].any()
+    np.testing.assert_allclose(fit['alpha_fast'], ALPHA_SLOW)
+    np.testing.assert_allclose(fit['alpha_slow'], ALPHA_SLOW)
+
+
+
+def test_fitted_recession_continues_the_record():
+    q = make_records(ALPHA_FAST, ALPHA_SLOW, n_days = 50)
+    recession = SpringRecession.fit(q[:-10])
+
+    np.testing.assert_allclose(recession.run(10), q[-10:], rtol = 1e-6)
+    np.testing.assert_allclose(recession.withdrawal(np.array([1.0])), [86.4])
@@ -0,0 +1,57 @@
+"""
+Batched raster sampling.
+"""
+
+import numpy as np
+import rasterio
+from affine import Affine
+from qdwb.coordinate.sample import points_to_pixels, grid_points, sample_array, sample_raster
+
+
+
+def window_means(values, rows, cols, buffer):
+    means = []
+    for r, c in zip(rows, cols):
+        window = values[:, max(r - buffer, 0):r + buffer + 1, max(c - buffer, 0):c + buffer + 1]
+        means.append(np.nanmean(window, axis = (1, 2)) if r >= 0 and c >= 0 else np.full(len(values), np.nan))
+    return np.array(means).T
+
+
+
+def test_window_means_match_a_loop():
+    rng = np.random.default_rng(0)
+    values = rng.random((2, 20, 30))
+    values[values < 0.1] = np.nan
+    values[0, 5, 5] = -9999
+    rows, cols = rng.integers(0, 20, 50), rng.integers(0, 30, 50)
+
+    np.testing.assert_allclose(sample_array(values, rows, cols), values[:, rows, cols])
+    clean = np.where(values == -9999, np.nan, values)
+    np.testing.assert_allclose(sample_array(values, rows, cols, buffer = 2, nodata = -9999), window_means(clean, rows, cols, 2))
+    assert np.isnan(sample_array(values[0], [-1, 20], [0, 0])).all()
+
+
+
+def test_points_to_pixels():
+    transform = Affine(0.5, 0, 50.0, 0, -0.25, 38.0)
+    x, y = grid_points(50.25 + 0.5 * np.arange(4), 37.875 - 0.25 * np.arange(3))
+    rows, cols = points_to_pixels(x, y, transform)
+
+    np.testing.assert_array_equal(rows, np.repeat(np.arange(3), 4))
+    np.testing.assert_array_equal(cols, np.tile(np.arange(4), 3))
+
+
+
+def test_raster_tiles_match_the_array(tmp_path):
+    rng = np.random.default_rng(1)
+    values = rng.random((3, 40, 50)).astype(np.float32)
+    transform = Affine(0.01, 0, 50.0, 0, -0.01, 38.0)
+    path = str(tmp_path / 'soil.tif')
+    with rasterio.open(path, 'w', driver = 'GTiff', height = 40, width = 50, count = 3, dtype = 'float32', transform = transform) as dst:
+        dst.write(values)
+
+    x, y = 50.0 + rng.random(100) * 0.55, 38.0 - rng.random(100) * 0.45
+    rows, cols = points_to_pixels(x, y, transform)
+    samples = sample_raster(path, x, y, bands = [1, 3], buffer = 1, tile = 16)
+
+    np.testing.assert_allclose(samples, sample_array(values[[0, 2]], rows, cols, buffer = 1), rtol = 1e-6)
@@ -0,0 +1,45 @@
+"""
+Sobol and Morris sensitivity analysis.
+"""
+
+import numpy as np
+from qdwb.calibration.sensitivity import RunningMoments, SobolAnalysis, MorrisAnalysis
+
+
+
+def linear(points):
+    # Var = 1/12 + 4/12: S1 = ST = 0.2, 0.8 and 0 for the third parameter
+    return points[:, 0] + 2 * points[:, 1]
+
+
+
+def test_running_moments_match_numpy():
+    samples = np.random.default_rng(0).normal(3, 2, (1000, 2))
+    moments = RunningMoments((2,))
+    for batch in np.array_split(samples, 7):
+        moments.update(batch)
+
+    np.testing.assert_allclose(moments.mean, samples.mean(axis = 0))
+    np.testing.assert_allclose(moments.variance, samples.var(axis = 0, ddof = 1))
+
+
+
+def test_sobol_indices_of_a_linear_model():
+    analysis = SobolAnalysis(['a', 'b', 'c'], seed = 0)
+    indices = analysis.run(linear, batch = 256, max_evaluations = 40000, tolerance = 0.02)
+
+    for name, expected in zip('abc', (0.2, 0.8, 0.0)):
+        assert abs(indices[name]['S1'] - expected) < 0.05
+        assert abs(indices[name]['ST'] - expected) < 0.05
+    assert indices['c']['ST'] == 0
+
+
+
+def test_morris_effects_of_a_linear_model():
+    analysis = MorrisAnalysis(['a', 'b', 'c'], levels = 4, seed = 0)
+    indices = analysis.run(lambda points: 3 * points[:, 0] + points[:, 1], batch = 8, max_evaluations = 200)
+
+    np.testing.assert_allclose([indices[name]['mu_star'] for name in 'abc'], [3, 1, 0], atol = 1e-12)
+    np.testing.assert_allclose([indices[name]['sigma'] for name in 'abc'], 0, atol = 1e-12)
+    points, _, _ = analysis.design(4)
+    assert points.min() >= 0 and points.max() <= 1
@@ -0,0 +1,44 @@
+"""
+Upward flux between the soil layers.
+"""
+
+import numpy as np
+from qdwb.soil_content.soil_content import SoilContent
+from qdwb.soil_content.vectorized import upward_flux
+
+
+
+def test_scalar_upward_flux_matches_the_arrays():
+    # transition layer wet, the two upper layers dry
+    scalar = dict(
+        field_capacity_soil_water_content_of_evaporation_layer = 30.0,
+        field_capacity_soil_water_content_of_transition_layer = 30.0,
+        permanent_wilting_point_soil_water_content_of_evaporation_layer = 10.0,
+        permanent_wilting_point_soil_water_content_of_transition_layer = 10.0,
+        soil_water_content_of_evaporation_layer_at_previous_step = 12.0,
+        soil_water_content_of_transition_layer_at_previous_step = 280.0,
+        hydraulic_conductivity_of_transition_layer = 5.0,
+        field_capacity_soil_water_content_of_transpiration_layer = 30.0,
+        permanent_wilting_point_soil_water_content_of_transpiration_layer = 10.0,
+        soil_water_content_of_transpiration_layer_at_previous_step = 60.0,
+        hydraulic_conductivity_of_transpiration_layer = 2.0,
+        root_depth = 50.0
+    )
+    arrays, _ = upward_flux(
+        covered = np.array([True, False]),
+        swc = {'evaporation_layer': 12.0, 'transpiration_layer': 60.0, 'transition_layer': 280.0},
+        fc = {'evaporation_layer': 30.0, 'transpiration_layer': 30.0, 'transition_layer': 30.0},
+        pwp = {'evaporation_layer': 10.0, 'transpiration_layer': 10.0, 'transition_layer': 10.0},
+        hydraulic_conductivity = {'transpiration_layer': 2.0, 'transition_layer': 5.0},
+        z_transpiration_layer = 500.0
+    )
+
+    covered = SoilContent.upward_flux(coverd = True, **scalar)
+    not_covered = SoilContent.upward_flux(coverd = False, **scalar)
+
+    order = ('upward_transpiration_to_evaporation', 'upward_transition_to_transpiration', 'upward_transition_to_evaporation')
+    np.testing.assert_allclose(covered, [arrays[name][0] for name in order])
+    np.testing.assert_allclose(not_covered, [arrays[name][1] for name in order])
+    # wetness 0.9 of the transition layer - 0.1 of the transpiration layer, times its conductivity
+    np.testing.assert_allclose(covered[1], 0.8 * 5.0)
+    assert covered[2] == 0 and not_covered[:2] == (0.0, 0.0) and not_covered[2] > 0
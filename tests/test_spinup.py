@@ -0,0 +1,22 @@
+"""
+Spin-up of the model state.
+"""
+
+import numpy as np
+from qdwb.model.driver import Driver
+from qdwb.model.spinup import SpinUp
+from .test_water_balance import make_inputs
+
+
+
+def test_accumulators_are_not_spun_up():
+    parameters, state, forcing = make_inputs()
+    driver = Driver(parameters, state)
+    spinup = SpinUp(driver, forcing, max_cycles = 3)
+    checkpoint = spinup.run()
+
+    assert 'groundwater_storage' not in spinup.variables
+    assert 'swc_transition_layer' in spinup.variables
+    np.testing.assert_array_equal(driver.state['groundwater_storage'], 0.0)
+    np.testing.assert_array_equal(checkpoint['groundwater_storage'], 0.0)
+    np.testing.assert_array_equal(checkpoint['swc_transition_layer'], driver.state['swc_transition_layer'])
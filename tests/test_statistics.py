@@ -0,0 +1,56 @@
+"""
+Streaming statistics of the outputs.
+"""
+
+import numpy as np
+from qdwb.model.statistics import P2Quantile, PeriodStatistics, period_key
+
+
+
+def test_p2_quantile_is_close_to_numpy():
+    rng = np.random.default_rng(0)
+    values = np.column_stack([rng.normal(0, 1, 5000), rng.exponential(2, 5000), rng.uniform(0, 10, 5000)])
+    values[::7, 2] = np.nan
+    for p in (0.1, 0.5, 0.9):
+        quantile = P2Quantile(p, 3)
+        for row in values:
+            quantile.update(row)
+        expected = np.nanquantile(values, p, axis = 0)
+        spread = np.nanquantile(values, 0.75, axis = 0) - np.nanquantile(values, 0.25, axis = 0)
+        assert np.all(np.abs(quantile.value() - expected) < 0.05 * spread)
+
+
+
+def test_p2_quantile_is_exact_below_five_values():
+    quantile = P2Quantile(0.5, 2)
+    for row in ([1.0, np.nan], [3.0, np.nan], [2.0, 4.0]):
+        quantile.update(row)
+    np.testing.assert_allclose(quantile.value(), [2.0, 4.0])
+
+
+
+def test_periods_match_a_grouped_reduction():
+    time = np.arange('2001-01-01', '2002-03-01', dtype = 'datetime64[D]')
+    values = np.random.default_rng(1).gamma(1, 3, (len(time), 4))
+    statistics = PeriodStatistics(['runoff'], period = 'month')
+
+    # one block split anywhere gives the same periods
+    closed = statistics.update(time[:40], {'runoff': values[:40]})
+    for t in range(40, len(time)):
+        closed += statistics.update(time[t], {'runoff': values[t]})
+    closed += statistics.flush()
+
+    months = time.astype('datetime64[M]')
+    assert [key for key, _ in closed] == [str(m) for m in np.unique(months)]
+    for key, result in closed:
+        rows = months == np.datetime64(key)
+        np.testing.assert_allclose(result['runoff']['sum'], values[rows].sum(axis = 0))
+        np.testing.assert_allclose(result['runoff']['max'], values[rows].max(axis = 0))
+        np.testing.assert_array_equal(result['runoff']['count'], rows.sum())
+
+
+
+def test_december_belongs_to_the_next_winter():
+    assert period_key(np.datetime64('2001-12-15'), 'season') == '2002-DJF'
+    assert period_key(np.datetime64('2002-02-15'), 'season') == '2002-DJF'
+    assert period_key(np.datetime64('2002-03-01'), 'season', climatology = True) == 'MAM'
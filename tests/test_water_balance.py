@@ -0,0 +1,85 @@
+"""
+Water balance of the default stages: nothing is created or lost between the
+precipitation and the stores and outflows of every cell.
+"""
+
+import numpy as np
+from qdwb.model.driver import Driver
+
+
+N_CELLS = 50
+N_DAYS = 60
+
+
+
+def make_inputs(seed : int = 0):
+    rng = np.random.default_rng(seed)
+    n, T = N_CELLS, N_DAYS
+    parameters = {
+        'latitude': rng.uniform(30, 38, n),
+        'curve_number': rng.uniform(60, 90, n),
+        'covered': rng.random(n) < 0.5,
+        'crop_cover': rng.random(n),
+        'crop_coefficient': np.full(n, 1.0),
+        'fc_evaporation_layer': np.full(n, 30.0),
+        'fc_transpiration_layer': np.full(n, 30.0),
+        'fc_transition_layer': np.full(n, 30.0),
+        'pwp_evaporation_layer': np.full(n, 12.0),
+        'pwp_transpiration_layer': np.full(n, 12.0),
+        'pwp_transition_layer': np.full(n, 12.0),
+        'z_transpiration_layer': np.full(n, 500.0),
+        'geology_permeability': np.full(n, 0.3),
+        'water_table_depth': rng.uniform(0, 8, n)
+    }
+    state = {
+        'swc_evaporation_layer': np.full(n, 20.0),
+        'swc_transpiration_layer': np.full(n, 100.0),
+        'swc_transition_layer': np.full(n, 200.0)
+    }
+    tmin = rng.uniform(-10, 10, (T, n))
+    tmax = tmin + rng.uniform(2, 15, (T, n))
+    forcing = {
+        'precipitation': rng.gamma(0.5, 5, (T, n)) * (rng.random((T, n)) < 0.4),
+        'tmin': tmin,
+        'tmax': tmax,
+        'tmean': (tmin + tmax) / 2,
+        'julian_day': np.arange(100, 100 + T)
+    }
+
+    return parameters, state, forcing
+
+
+
+def storage(
+    values : dict
+) -> np.ndarray:
+
+    return (values['snowpack'] + values['swc_evaporation_layer'] + values['swc_transpiration_layer'] +
+            values['swc_transition_layer'] + values['groundwater_storage'])
+
+
+
+def test_water_balance_closes():
+    parameters, state, forcing = make_inputs()
+    driver = Driver(parameters, state)
+    before = storage({**{'snowpack': 0.0, 'groundwater_storage': 0.0}, **state})
+
+    outputs = driver.run_block(forcing)
+    after = storage({name: outputs[name][-1] for name in ('snowpack', 'swc_evaporation_layer',
+        'swc_transpiration_layer', 'swc_transition_layer', 'groundwater_storage')})
+
+    inflow = (forcing['precipitation'] + outputs['irrigation_requirement']).sum(axis = 0)
+    outflow = sum(outputs[name].sum(axis = 0) for name in (
+        'interception', 'runoff', 'late_runoff', 'actual_transpiration', 'actual_evaporation'))
+
+    np.testing.assert_allclose(inflow, after - before + outflow, atol = 1e-8)
+
+
+
+def test_rain_below_initial_abstraction_infiltrates():
+    parameters, state, forcing = make_inputs()
+    outputs = Driver(parameters, state).run_block(forcing)
+
+    water = outputs['throughfall'] + outputs['snow_melt']
+    np.testing.assert_allclose(outputs['infiltration'] + outputs['runoff'], water, atol = 1e-10)
+    assert np.all(outputs['infiltration'][(water > 0) & (outputs['runoff'] == 0)] > 0)
@@ -0,0 +1,64 @@
+"""
+Wet cell evaluation of the runoff and interception stages.
+"""
+
+import numpy as np
+from qdwb.model.driver import Driver
+from qdwb.model.cache import StageCache
+from qdwb.model.dtype import DtypePolicy
+from qdwb.model.stages import default_stages, free_water_stages
+from .test_water_balance import make_inputs
+
+
+
+def test_skip_fraction_counts_cached_days_once(tmp_path):
+    parameters, state, forcing = make_inputs()
+    days = [{name: values[t] for name, values in forcing.items()} for t in range(10)]
+    cache = StageCache(str(tmp_path))
+
+    first = Driver(parameters, state, cache = cache)
+    for day in days:
+        first.step(day)
+    second = Driver(parameters, state, cache = cache)
+    for day in days:
+        second.step(day)
+
+    assert first.skip_fraction()['runoff'] > 0
+    # every day of the second run is read from the cache - nothing was evaluated or skipped
+    assert 'runoff' not in second.skip_fraction()
+    for name, (skipped, total) in first._skipped.items():
+        assert total == 10 * len(parameters['curve_number'])
+
+
+
+def test_validation_shadow_evaluates_dry_cells():
+    parameters, state, forcing = make_inputs()
+    driver = Driver(parameters, state, policy = DtypePolicy.float32(validate = True))
+    driver.run_block(forcing)
+
+    assert driver._shadow._dense
+    assert driver._shadow.skip_fraction().get('runoff', 0.0) == 0.0
+    assert driver.skip_fraction()['runoff'] > 0
+    assert driver.drift_report()['runoff']['max_abs'] < 1e-3
+
+
+
+def test_free_water_only_on_water_cells():
+    parameters, state, forcing = make_inputs()
+    n = len(parameters['curve_number'])
+    parameters['water_fraction'] = np.where(np.arange(n) % 3 == 0, 0.5, 0.0)
+    forcing = {name: values[:10] for name, values in forcing.items()}
+    forcing['tmin'], forcing['tmax'], forcing['tmean'] = (forcing[k] + 25 for k in ('tmin', 'tmax', 'tmean'))
+    stages = default_stages() + free_water_stages('Jensen')
+
+    sparse = Driver(parameters, state, stages = stages)
+    outputs = sparse.run_block(forcing)
+    dense = Driver(parameters, state, stages = stages, policy = DtypePolicy.float32(validate = True))
+    dense.run_block(forcing)
+
+    dry = parameters['water_fraction'] == 0
+    assert np.all(outputs['free_water_evaporation'][:, dry] == 0)
+    assert np.all(outputs['free_water_evaporation'][:, ~dry].max(axis = 0) > 0)
+    assert sparse.skip_fraction()['free_water_evaporation'] == dry.mean()
+    assert dense._shadow.skip_fraction().get('free_water_evaporation', 0.0) == 0.0
+    assert dense.drift_report()['water_body_evaporation']['max_abs'] < 1e-3